@@ -1,39 +1,44 @@
-import re
 import sys
 import os
-import time
-import serial
 import threading
+import time
 from datetime import datetime
 
-import matplotlib
-matplotlib.use("Qt5Agg")
-import matplotlib.pyplot as plt
+from app.core.startup import clock # first import, the start clock runs from here
+import serial
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-
-from PyQt5.QtCore import Qt, pyqtSignal, pyqtSlot
+from matplotlib.figure import Figure
+
+from app.core.control_metrics import ControlMetrics, WindowStats
+from app.core.digital_twin import DigitalTwin
+from app.core.JSON_Handler import JsonHandler
+from app.core.latency import CommandTracker, LatencyTracker, export_latency
+from app.core.plate_transmission import Plate, plate_kwargs
+from app.core.ring_buffer import RingBuffer, RollingExtrema
+from app.core.run_catalog import RunCatalog
+from app.core.run_writer import RunWriter, read_run
+from app.core.serial_ingest import SerialIngest
+from app.core.telemetry import TelemetryDispatcher, TelemetryRecord, parse_line, has_value, pwm_to_command
+
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal, pyqtSlot
 from PyQt5.QtGui import QIcon
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout,
-    QPushButton, QLabel, QLineEdit, QPlainTextEdit
+    QPushButton, QLabel, QLineEdit, QPlainTextEdit, QCheckBox
 )
 
 ################################################################################
-# ExcelRecorder (unchanged from before, adapted for your new line format)
+# ExcelRecorder (streams to a run file, Excel written at stop)
 ################################################################################
 class ExcelRecorder:
     """ Class to record data in an Excel file.
-    This class is responsible for creating a copy of the template file and writing data to it.
-    It uses openpyxl to handle Excel files.
+    The rows are first streamed to a run file (app.core.run_writer) next to the Excel file: the reader thread
+    only fills a row, a background thread writes them to disk in batches, so a long session costs nothing per line
+    and a crash loses at most the last second. The Excel file is written from the run file once, at stop,
+    in the format of the template (openpyxl).
 
     """
-    regex_time_s  = re.compile(r"([\d\.]+)\s*s")   
-    regex_pwm     = re.compile(r"PWM\s*:\s*([\d]+)\s*/\s*([\d]+)")
-    regex_t1      = re.compile(r"t1:\s*([\d\.]+)")
-    regex_t2      = re.compile(r"t2:\s*([\d\.]+)")
-    regex_t3      = re.compile(r"t3:\s*([\d\.]+)")
-    regex_t3_est  = re.compile(r"t3\s*est:\s*([\d\.]+)")
-    regex_t4      = re.compile(r"t4:\s*([\d\.]+)")
+    COLUMNS = ["time", "consigne", "u", "t1", "t2", "t3", "t3_est", "t4", "t3_moy"]
 
     def __init__(self, template_path, sheet_name="data"):
         """ Initialize the ExcelRecorder with the template path and sheet name.
@@ -44,33 +49,28 @@ class ExcelRecorder:
         """
         self.template_path = template_path
         self.sheet_name = sheet_name
-        self.workbook = None
-        self.sheet = None
+        self.writer = None
         self.current_path = None
-        self.row_index = 2
+        self.run_path = None
         self.base_time = None
-        self.t3_values = []
+        self.t3_sum = 0.0
+        self.t3_count = 0
         self.consigne = 25.0
 
     def create_copy_and_open(self, new_path):
-        """ Create a copy of the template file and open it for writing.
-        This method will copy the template file to a new path and open it using openpyxl.
-        It will also reset the row index and clear the t3 values.
+        """ Start a recording whose Excel file will be new_path.
+        This method will open the run file the rows are streamed to and reset the time origin and the t3 average.
 
         Args:
             new_path (String): Path to the new Excel file to create.
         """
-        import shutil
-        from openpyxl import load_workbook
-
-        shutil.copyfile(self.template_path, new_path)
+        os.makedirs(os.path.dirname(new_path), exist_ok=True)
         self.current_path = new_path
-
-        self.workbook = load_workbook(new_path)
-        self.sheet = self.workbook[self.sheet_name]
-        self.row_index = 2
+        self.run_path = os.path.splitext(new_path)[0] + ".d2run"
+        self.writer = RunWriter(self.run_path, self.COLUMNS, params={"excel": os.path.basename(new_path)})
         self.base_time = None
-        self.t3_values.clear()
+        self.t3_sum = 0.0
+        self.t3_count = 0
 
     def set_consigne(self, value):
         """ Set the consigne value for the Excel file.
@@ -82,154 +82,293 @@ class ExcelRecorder:
 
     def parse_and_write(self, line):
         """ Parse the line received from the serial port and write data to the Excel file.
-        This method will extract the relevant data from the line and write it to the Excel file.
-        It will also calculate the time difference from the base time and update the row index.
-
 
         Args:
-            line (_type_): Line received from the serial port.
+            line (string): Line received from the serial port.
         """
-        m_s = self.regex_time_s.search(line)
-        print(line)
-        if not m_s:
-            return
-        time_s = float(m_s.group(1))
+        record = parse_line(line)
+        if record is not None:
+            self.write_record(record)
 
-        pwm_m = self.regex_pwm.search(line)
-        if not pwm_m:
+    def write_record(self, record):
+        """ Add a telemetry record to the recording.
+        It will also calculate the time difference from the base time and the running t3 average.
+
+        Args:
+            record (TelemetryRecord): Record parsed from the serial line.
+        """
+        if self.writer is None:
             return
-        duty_val = float(pwm_m.group(1))
-        duty_max = float(pwm_m.group(2))
-        fraction = duty_val / duty_max if duty_max else 0.0
+        fraction = record.pwm / record.pwm_max if record.pwm_max else 0.0
         U = fraction * 10.0 - 5.0
 
-        mt1 = self.regex_t1.search(line)
-        mt2 = self.regex_t2.search(line)
-        mt3 = self.regex_t3.search(line)
-        mt4 = self.regex_t4.search(line)
-        if not (mt1 and mt2 and mt3 and mt4):
-            return
+        if self.base_time is None:
+            self.base_time = record.time
 
-        t1_val = float(mt1.group(1))
-        t2_val = float(mt2.group(1))
-        t3_val = float(mt3.group(1))
-        t4_val = float(mt4.group(1))
+        temps = record.time - self.base_time
+        self.t3_sum += record.t3
+        self.t3_count += 1
+        t3_moy = self.t3_sum / self.t3_count
 
-        mt3e = self.regex_t3_est.search(line)
-        t3_est_val = float(mt3e.group(1)) if mt3e else None
+        self.writer.append(temps, self.consigne, U, record.t1, record.t2, record.t3, record.t3_est, record.t4, t3_moy)
 
-        if self.base_time is None:
-            self.base_time = time_s
-
-        temps = time_s - self.base_time
-        self.t3_values.append(t3_val)
-        t3_moy = sum(self.t3_values) / len(self.t3_values)
-
-        # Write row
-        row = self.row_index
-        self.sheet.cell(row=row, column=1).value = temps
-        self.sheet.cell(row=row, column=2).value = self.consigne
-        self.sheet.cell(row=row, column=3).value = U
-        self.sheet.cell(row=row, column=4).value = t1_val
-        self.sheet.cell(row=row, column=5).value = t2_val
-        self.sheet.cell(row=row, column=6).value = t3_val
-        self.sheet.cell(row=row, column=7).value = t3_est_val if t3_est_val else ""
-        self.sheet.cell(row=row, column=8).value = t4_val
-        self.sheet.cell(row=row, column=9).value = t3_moy
-
-        self.row_index += 1
+    def recorded_arrays(self):
+        """ Read back the time and thermistance columns written to the run file so far.
+
+        Returns:
+            tuple: Arrays (time, t1, t2, t3), empty when nothing was recorded.
+        """
+        if self.run_path is None or not os.path.exists(self.run_path):
+            return tuple([] for _ in range(4))
+        _, data = read_run(self.run_path, mmap=False)
+        columns = [self.COLUMNS.index(name) for name in ("time", "t1", "t2", "t3")]
+        return tuple(data[:, i] for i in columns)
 
     def save_and_close(self):
-        """ Save the Excel file and close it.
-        This method will save the current workbook and close it. It will also reset the workbook and sheet attributes.
+        """ Close the run file and write the Excel file from it.
+        This method does nothing when no recording is open.
 
         """
-        if self.workbook:
-            self.workbook.save(self.current_path)
-            self.workbook = None
-            self.sheet = None
+        if self.writer is None:
+            return
+        writer, self.writer = self.writer, None
+        writer.close()
+        try:
+            run_to_excel(self.run_path, self.template_path, self.current_path, self.sheet_name)
+        except Exception as e:
+            print(f"[ERROR] Could not write {self.current_path}, the data is kept in {self.run_path}: {e}")
+
+
+def run_to_excel(run_path, template_path, xlsx_path, sheet_name="data"):
+    """ Write a recording run file to a copy of the Excel template, one row per sample from row 2.
+    Also recovers the recordings of a session that crashed before the conversion.
+
+    Args:
+        run_path (String): Run file written by ExcelRecorder.
+        template_path (String): Path to the template Excel file.
+        xlsx_path (String): Path of the Excel file to create.
+        sheet_name (str, optional): Name of the sheet to write data to. Defaults to "data".
+    """
+    import shutil
+    from openpyxl import load_workbook
+
+    _, data = read_run(run_path, mmap=False)
+    shutil.copyfile(template_path, xlsx_path)
+    workbook = load_workbook(xlsx_path)
+    sheet = workbook[sheet_name]
+    t3_est_column = ExcelRecorder.COLUMNS.index("t3_est")
+    for row in data.tolist():
+        # Missing (or zero) t3_est is left empty, as before
+        if not row[t3_est_column] or row[t3_est_column] != row[t3_est_column]:
+            row[t3_est_column] = ""
+        sheet.append(row)
+    workbook.save(xlsx_path)
 
 
 ################################################################################
-# Thread for reading data from the serial port
+# Live plot base: new data only marks the plot dirty, a timer redraws it
 ################################################################################
-class SerialReadThread(threading.Thread):
-    """ Thread to read data from the serial port.
-    This thread will continuously read lines from the serial port and emit a signal with the line data.
+class LivePlotWidget(QWidget):
+    """ Base of the live plots.
+    Records only append data and mark the plot dirty. A QTimer redraws at most redraw_hz times per second:
+    the lines are animated artists blitted over a cached background, and the full figure is only redrawn
+    when the data leaves the axis limits (which grow with some headroom) or when the widget is resized.
+    The GUI time spent per second is then bounded whatever the line rate.
+    Only the last `window` samples are kept (ring buffer), with their y range tracked incrementally,
+    so the cost of a sample does not grow with the length of the session. The whole session is archived
+    by the SerialMonitor.
 
     Args:
-        threading (Thread): Thread class from the threading module.
+        QWidget (QWidget): QWidget class from the PyQt5 module.
     """
-    def __init__(self, ser, callback):
-        """ Initialize the SerialReadThread with the serial port and callback function.
-        This method will set the serial port and callback function, and initialize the running flag.
+    def __init__(self, columns, parent=None, window=3600, redraw_hz=20, y_margin=1.0):
+        """ Initialize the figure, the canvas, the history and the redraw timer.
+
+        Args:
+            columns (list): Name of the values of a sample, the first one is the time.
+            parent (QWidget, optional): Parent widget. Defaults to None.
+            window (int, optional): Number of samples shown. Defaults to 3600.
+            redraw_hz (int, optional): Maximum redraw rate [Hz]. Defaults to 20.
+            y_margin (float, optional): Space kept above and below the data on the y axis. Defaults to 1.0.
+        """
+        super().__init__(parent)
+        self.figure = Figure()
+        self.ax = self.figure.add_subplot(111)
+        self.canvas = FigureCanvas(self.figure)
+        self.lines = {}
+        self.y_margin = y_margin
+
+        self.columns = list(columns)
+        self.history = RingBuffer(window, len(self.columns))
+        self.y_low = RollingExtrema(window)
+        self.y_high = RollingExtrema(window)
+        self.x_range = None
+        self.y_range = None
+
+        self.dirty = False
+        self.needs_full_draw = True
+        self.background = None
+        self.canvas.mpl_connect("draw_event", self.on_draw)
 
+        # Arrival of the oldest sample not drawn yet, for the "screen" latency
+        self.latency = None
+        self.pending_arrival = None
+
+        self.redraw_timer = QTimer(self)
+        self.redraw_timer.timeout.connect(self.redraw)
+        self.redraw_timer.start(int(1000 / redraw_hz))
+
+        layout = QVBoxLayout()
+        layout.addWidget(self.canvas)
+        self.setLayout(layout)
+
+    def add_line(self, column, label):
+        """ Add an animated line, drawn by blitting.
 
         Args:
-            ser (serial.Serial):  serial.Serial object: Serial port to read data from.
-            callback (function): Callback function to call with the line data.
+            column (string): Column plotted against the time.
+            label (string): Label of the line in the legend.
+
+        Returns:
+            Line2D: The line.
         """
-        super().__init__()
-        self.ser = ser
-        self.callback = callback
-        self.running = True
+        line, = self.ax.plot([], [], label=label, animated=True)
+        self.lines[self.columns.index(column)] = line
+        return line
+
+    def values(self, column):
+        """ Values of a column in the visible window.
+
+        Args:
+            column (string): Name of the column.
+
+        Returns:
+            np.array: Values, oldest first.
+        """
+        return self.history.column(self.columns.index(column))
+
+    def append(self, row, y_low, y_high):
+        """ Add a sample, drawn at the next redraw.
+
+        Args:
+            row (list): Values of the sample, in the order of the columns.
+            y_low (float): Lowest plotted value of the sample.
+            y_high (float): Highest plotted value of the sample.
+        """
+        self.history.append(row)
+        self.y_low.append(y_low)
+        self.y_high.append(y_high)
+        self.dirty = True
+
+    def note_arrival(self, arrival):
+        """ Remember the arrival of samples added since the last redraw, the latency is measured when they are drawn.
 
-    def run(self):
-        """ Run the thread to read data from the serial port.
+        Args:
+            arrival (float): time.monotonic() of the arrival of the oldest sample added.
         """
-        while self.running:
-            try:
-                line = self.ser.readline().decode('ascii', errors='ignore').strip()
-                if line:
-                    self.callback(line)
-            except Exception as e:
-                print("Serial error:", e)
-                break
-        print("Serial reading thread terminated.")
+        if self.pending_arrival is None:
+            self.pending_arrival = arrival
 
-    def stop(self):
-        """ Stop the thread and close the serial port.
+    def reset_plot(self):
+        """ Reset the plot data and clear the lines.
         """
-        self.running = False
+        self.history.clear()
+        self.y_low.clear()
+        self.y_high.clear()
+        self.x_range = None
+        self.y_range = None
+        self.needs_full_draw = True
+        self.dirty = True
+
+    def update_limits(self):
+        """ Follow the window on the x axis and the data range on the y axis.
+        The limits move by steps, with headroom, so that the full redraws stay rare.
+        """
+        if len(self.history) == 0:
+            return
+        times = self.history.column(0)
+        x_first, x_last = times[0], times[-1]
+        if self.x_range is None or x_last > self.x_range[1] or x_first < self.x_range[0]:
+            self.x_range = [x_first, x_last + max(0.25 * (x_last - x_first), 10.0)]
+            self.needs_full_draw = True
+
+        low, high = self.y_low.min(), self.y_high.max()
+        if low != low:
+            return
+        if self.y_range is None:
+            self.y_range = [low, high]
+            self.needs_full_draw = True
+            return
+        slack = 0.25 * (self.y_range[1] - self.y_range[0] + 2 * self.y_margin)
+        if (low < self.y_range[0] or high > self.y_range[1]
+                or low > self.y_range[0] + slack or high < self.y_range[1] - slack):
+            self.y_range = [low, high]
+            self.needs_full_draw = True
+
+    def on_draw(self, event):
+        """ Keep the background of a full draw and draw the animated lines over it.
+
+        Args:
+            event (DrawEvent): Matplotlib draw event.
+        """
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+        for line in self.lines.values():
+            self.ax.draw_artist(line)
+
+    def redraw(self):
+        """ Redraw the plot if new data arrived since the last redraw.
+        """
+        if not self.dirty:
+            return
+        self.dirty = False
+        times = self.history.column(0)
+        for index, line in self.lines.items():
+            line.set_data(times, self.history.column(index))
+        self.update_limits()
+
+        if self.needs_full_draw or self.background is None:
+            self.needs_full_draw = False
+            if self.x_range is not None:
+                self.ax.set_xlim(self.x_range[0], self.x_range[1])
+            if self.y_range is not None:
+                self.ax.set_ylim(self.y_range[0] - self.y_margin, self.y_range[1] + self.y_margin)
+            self.canvas.draw()
+        else:
+            self.canvas.restore_region(self.background)
+            for line in self.lines.values():
+                self.ax.draw_artist(line)
+            self.canvas.blit(self.ax.bbox)
+        if self.latency is not None and self.pending_arrival is not None:
+            self.latency.mark("screen", self.pending_arrival)
+        self.pending_arrival = None
 
 
 ################################################################################
 # Live Plot #1: Temperatures (T1..T4 + T3_est) [no stability text here]
 ################################################################################
-class TempPlotWidget(QWidget):
+class TempPlotWidget(LivePlotWidget):
     """ Widget to plot the temperatures in real-time.
 
     Args:
-        QWidget (QWidget): QWidget class from the PyQt5 module.
+        LivePlotWidget (LivePlotWidget): Base of the live plots.
     """
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, window=3600):
         """
         Initialize the TempPlotWidget with the parent widget.
 
         Args:
             parent (_type_, optional): Parent widget. Defaults to None.
+            window (int, optional): Number of samples shown. Defaults to 3600.
         """
-        super().__init__(parent)
-
-        # Data arrays
-        self.time_values     = []
-        self.consigne_values = []
-        self.t1_values       = []
-        self.t2_values       = []
-        self.t3_values       = []
-        self.t4_values       = []
-        self.t3_est_values   = []
-
-
-        self.figure, self.ax = plt.subplots()
-        self.canvas = FigureCanvas(self.figure)
+        super().__init__(["time", "consigne", "t1", "t2", "t3", "t4", "t3_est"], parent, window)
 
-        self.line_consigne,     = self.ax.plot([], [], label="Consigne")
-        self.line_t1,     = self.ax.plot([], [], label="T1")
-        self.line_t2,     = self.ax.plot([], [], label="T2")
-        self.line_t3,     = self.ax.plot([], [], label="T3")
-        self.line_t4,     = self.ax.plot([], [], label="T4")
-        self.line_t3_est, = self.ax.plot([], [], label="T3_est")
+        self.line_consigne = self.add_line("consigne", "Consigne")
+        self.line_t1 = self.add_line("t1", "T1")
+        self.line_t2 = self.add_line("t2", "T2")
+        self.line_t3 = self.add_line("t3", "T3")
+        self.line_t4 = self.add_line("t4", "T4")
+        self.line_t3_est = self.add_line("t3_est", "T3_est")
+        self.t3_average = WindowStats(30)
 
         self.ax.set_xlabel("Time (s)")
         self.ax.set_ylabel("Temperature (°C)")
@@ -237,9 +376,20 @@ class TempPlotWidget(QWidget):
         self.ax.grid(True)
         self.ax.legend()
 
-        layout = QVBoxLayout()
-        layout.addWidget(self.canvas)
-        self.setLayout(layout)
+    def reset_plot(self):
+        """ Reset the plot data and clear the lines.
+        """
+        super().reset_plot()
+        self.t3_average.clear()
+
+    # Values in the visible window, missing consigne and t3_est are NaN
+    time_values = property(lambda self: self.values("time"))
+    consigne_values = property(lambda self: self.values("consigne"))
+    t1_values = property(lambda self: self.values("t1"))
+    t2_values = property(lambda self: self.values("t2"))
+    t3_values = property(lambda self: self.values("t3"))
+    t4_values = property(lambda self: self.values("t4"))
+    t3_est_values = property(lambda self: self.values("t3_est"))
 
     def get_moyt3_est(self):
         """ Get the average of the last 30 T3_est values.
@@ -247,142 +397,57 @@ class TempPlotWidget(QWidget):
         Returns:
             float:  Average of the last 30 T3_est values or 0 if no values are available.
         """
-        
-        if  len(self.t3_values) > 30:
-            t3_moy = sum(self.t3_values[-30:]) / 30
-
-        elif len(self.t3_values) == 0:
-            t3_moy = 0
-        else:
-            t3_moy = sum(self.t3_values) / len(self.t3_values)
-
-        return t3_moy
+        if len(self.t3_average) == 0:
+            return 0
+        return self.t3_average.mean()
 
 
     @pyqtSlot(str)
     def parse_and_update(self, line):
         """ Parse the line received from the serial port and update the plot.
-        This method will extract the relevant data from the line and update the plot with the new data.
-        It will also adjust the y-axis limits based on the data.
-
 
         Args:
-            line (_type_):  Line received from the serial port.
-        """
-        match_s = re.search(r"([\d\.]+)\s*s", line)
-        if not match_s:
-            return
-        time_s = float(match_s.group(1))
-   
-
-        # t1..t4
-        mt1 = re.search(r"t1:\s*([\d\.]+)", line)
-        mt2 = re.search(r"t2:\s*([\d\.]+)", line)
-        mt3 = re.search(r"t3:\s*([\d\.]+)", line)
-        mt4 = re.search(r"t4:\s*([\d\.]+)", line)
-        if not (mt1 and mt2 and mt3 and mt4):
-            return
-        
-        t1_val = float(mt1.group(1))
-        t2_val = float(mt2.group(1))
-        t3_val = float(mt3.group(1))
-        t4_val = float(mt4.group(1))
-
-        # t3 est (optional)
-        mt3e = re.search(r"t3\s*est:\s*([\d\.]+)", line)
-        t3_est_val = float(mt3e.group(1)) if mt3e else None
-
-        consigne = re.search(r"consigne:\s*([\d\.]+)", line)
-        consigne_val = float(consigne.group(1)) if consigne else None
-        
-        # Append
-        self.time_values.append(time_s)
-        self.t1_values.append(t1_val)
-        self.t2_values.append(t2_val)
-        self.t3_values.append(t3_val)
-        self.t4_values.append(t4_val)
-
-        if t3_est_val is not None:
-            self.t3_est_values.append(t3_est_val)
-        else:
-            self.t3_est_values.append(None)
-            
-        if consigne_val is not None:
-            self.consigne_values.append(consigne_val)
-        else:
-            self.consigne_values.append(None)
-
-        all_y = self.t1_values + self.t2_values + self.t3_est_values + self.t3_values + self.t4_values + self.consigne_values
-        all_y = [x for x in all_y if x is not None]
-        y_min, y_max = min(all_y), max(all_y)
-        self.ax.set_ylim(y_min-1, y_max+1)
-
-        # Update lines
-        self.line_consigne.set_xdata(self.time_values)
-        self.line_consigne.set_ydata([val if val is not None else float("nan") for val in self.consigne_values])
-        self.line_t1.set_xdata(self.time_values)
-        self.line_t1.set_ydata(self.t1_values)
-        self.line_t2.set_xdata(self.time_values)
-        self.line_t2.set_ydata(self.t2_values)
-        self.line_t3.set_xdata(self.time_values)
-        self.line_t3.set_ydata(self.t3_values)
-
-        # T3_est -> None => NaN
-        t3_est_y = [val if val is not None else float("nan") for val in self.t3_est_values]
-        self.line_t3_est.set_xdata(self.time_values)
-        self.line_t3_est.set_ydata(t3_est_y)
-
-        self.ax.relim()
-        self.ax.autoscale_view()
-        self.canvas.draw()
-
-    def reset_plot(self):
-        """ Reset the plot data and clear the lines.
+            line (string):  Line received from the serial port.
         """
-        self.time_values.clear()
-        self.consigne_values.clear()
-        self.t1_values.clear()
-        self.t2_values.clear()
-        self.t3_values.clear()
-        self.t4_values.clear()
-        self.t3_est_values.clear()
+        record = parse_line(line)
+        if record is not None:
+            self.update_record(record)
 
-        self.line_consigne.set_data([], [])
-        self.line_t1.set_data([], [])
-        self.line_t2.set_data([], [])
-        self.line_t3.set_data([], [])
-        self.line_t4.set_data([], [])
-        self.line_t3_est.set_data([], [])
+    @pyqtSlot(object)
+    def update_record(self, record):
+        """ Add a telemetry record to the plot, drawn at the next redraw.
 
-        self.ax.relim()
-
-        self.canvas.draw()
+        Args:
+            record (TelemetryRecord): Record parsed from the serial line.
+        """
+        self.t3_average.append(record.t3)
+        values = [v for v in record[3:9] if has_value(v)] # consigne, t1..t4 and t3_est
+        self.append(
+            (record.time, record.consigne, record.t1, record.t2, record.t3, record.t4, record.t3_est),
+            min(values), max(values)
+        )
 
 
 ################################################################################
 # Live Plot #2: Command (U)
 ################################################################################
-class CommandPlotWidget(QWidget):
+class CommandPlotWidget(LivePlotWidget):
     """ Widget to plot the command U in real-time.
 
 
     Args:
-        QWidget (QWidget): QWidget class from the PyQt5 module.
+        LivePlotWidget (LivePlotWidget): Base of the live plots.
     """
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, window=3600):
         """_summary_
 
         Args:
             parent (QWidget, optional): Parent widget. Defaults to None.
+            window (int, optional): Number of samples shown. Defaults to 3600.
         """
-        super().__init__(parent)
-        self.time_values = []
-        self.u_values    = []
-
-        self.figure, self.ax = plt.subplots()
-        self.canvas = FigureCanvas(self.figure)
+        super().__init__(["time", "u"], parent, window, y_margin=5.0)
 
-        self.line_u, = self.ax.plot([], [], label="U (%)")
+        self.line_u = self.add_line("u", "U (%)")
 
         self.ax.set_xlabel("Time (s)")
         self.ax.set_ylabel("Command U (%)")
@@ -390,57 +455,68 @@ class CommandPlotWidget(QWidget):
         self.ax.grid(True)
         self.ax.legend()
 
-        layout = QVBoxLayout()
-        layout.addWidget(self.canvas)
-        self.setLayout(layout)
+    time_values = property(lambda self: self.values("time"))
+    u_values = property(lambda self: self.values("u"))
 
     @pyqtSlot(str)
     def parse_and_update(self, line):
         """ Parse the line received from the serial port and update the plot.
-        This method will extract the relevant data from the line and update the plot with the new data.
-        It will also adjust the y-axis limits based on the data.
 
+        Args:
+            line (string):  Line received from the serial port.
+        """
+        record = parse_line(line)
+        if record is not None:
+            self.update_record(record)
+
+    @pyqtSlot(object)
+    def update_record(self, record):
+        """ Add a telemetry record to the plot, drawn at the next redraw.
 
         Args:
-            line (_type_):  Line received from the serial port.
+            record (TelemetryRecord): Record parsed from the serial line.
         """
-        match_s = re.search(r"([\d\.]+)\s*s", line)
-        if not match_s:
-            return
-        time_s = float(match_s.group(1))
+        u_val = pwm_to_command(record)
+        self.append((record.time, u_val), u_val, u_val)
 
 
-        pwm_m = re.search(r"PWM\s*:\s*([\d]+)\s*/\s*([\d]+)", line)
-        if not pwm_m:
-            return
-        duty_val = float(pwm_m.group(1))
-        duty_max = float(pwm_m.group(2))
-        ratio = duty_val/duty_max if duty_max else 0.0
-        u_val = -ratio * 200 + 100
+################################################################################
+# Live Plot #3: Digital twin (measured T1..T3 against the simulated plate)
+################################################################################
+class TwinPlotWidget(LivePlotWidget):
+    """ Widget to plot the thermistors next to the prediction of the digital twin.
 
-        self.time_values.append(time_s)
-        self.u_values.append(u_val)
+    Args:
+        LivePlotWidget (LivePlotWidget): Base of the live plots.
+    """
+    def __init__(self, parent=None, window=3600):
+        """ Initialize the TwinPlotWidget with the parent widget.
 
-        self.line_u.set_xdata(self.time_values)
-        self.line_u.set_ydata(self.u_values)
+        Args:
+            parent (QWidget, optional): Parent widget. Defaults to None.
+            window (int, optional): Number of samples shown. Defaults to 3600.
+        """
+        super().__init__(["time", "t1", "t2", "t3", "twin_t1", "twin_t2", "twin_t3"], parent, window)
 
-        self.ax.autoscale_view()
+        for k in range(1, 4):
+            line = self.add_line(f"t{k}", f"T{k}")
+            self.add_line(f"twin_t{k}", f"T{k} twin").set(color=line.get_color(), linestyle="--")
 
-        self.ax.relim()
+        self.ax.set_xlabel("Time (s)")
+        self.ax.set_ylabel("Temperature (°C)")
+        self.ax.set_title("Digital twin")
+        self.ax.grid(True)
+        self.ax.legend(ncol=3)
 
-        self.canvas.draw()
+    def update_sample(self, sample):
+        """ Add a sample of the twin, drawn at the next redraw.
 
-    def reset_plot(self):
-        """
-        Reset the plot data and clear the lines.
+        Args:
+            sample (TwinSample): Measured and predicted temperatures.
         """
-        self.time_values.clear()
-        self.u_values.clear()
-
-        self.line_u.set_data([], [])
-        self.ax.relim()
-        self.ax.autoscale_view()
-        self.canvas.draw()
+        values = [v for v in sample[1:] if has_value(v)]
+        if values:
+            self.append(sample, min(values), max(values))
 
 
 ################################################################################
@@ -455,29 +531,27 @@ class SerialMonitor(QWidget):
     Args:
         QWidget (QWidget):  QWidget class from the PyQt5 module.
 
-    Raises:
-        RuntimeError: Could not open port.
-
     """
-    lineReceivedText = pyqtSignal(str)
-    lineReceivedPlot = pyqtSignal(str)
+    recordReceived = pyqtSignal(object)
+    portOpened = pyqtSignal(object)
+    portFailed = pyqtSignal(str)
 
-    def __init__(self, port="COM4", baudrate=115200, parent=None):
+    def __init__(self, port="COM4", baudrate=115200, parent=None, plot_window=3600):
         """ Initialize the SerialMonitor with the given port and baudrate.
         This method will set the port and baudrate, and initialize the serial port.
         It will also create the UI elements and connect the signals to the slots.
         It will also create the ExcelRecorder object to record data in an Excel file.
         It will also create the stability tracking variables and connect the signals to the slots.
+        The port is opened on a thread (with the 2 s reset of the board), the window shows meanwhile.
 
         Args:
             port (str, optional): Port to open. Defaults to "COM4".
             baudrate (int, optional): Baudrate for the serial port. Defaults to 115200.
             parent (_type_, optional): Parent widget. Defaults to None.
-
-        Raises:
-            RuntimeError: Could not open port.
+            plot_window (int, optional): Number of samples shown by the plots. Defaults to 3600.
         """
         super().__init__(parent)
+        self.plot_window = plot_window
         self.setWindowTitle("Design 2 Prototype serial monitor")
         self.setWindowIcon(QIcon("icon.png"))
 
@@ -497,22 +571,92 @@ class SerialMonitor(QWidget):
         self.in_precise_zone   = False
         self.enter_time       = None
         self.time_counting = False
+        # Streaming metrics of t3_est: stability window, step response to each setpoint sent
+        self.metrics = ControlMetrics(band=self.allowable_error)
+        # Latency of every stage from the arrival of the bytes, and round trip of the commands
+        self.latency = LatencyTracker()
+        self.commands = CommandTracker()
+        self.current_arrival = None
+        self.twin = None
+        self.twin_config = os.path.join(os.getcwd(), "app/Configs/latest.json")
 
         self._build_ui()
 
-        self.lineReceivedText.connect(self.append_line)
-        self.lineReceivedPlot.connect(self.temp_plot.parse_and_update)
-        self.lineReceivedPlot.connect(self.cmd_plot.parse_and_update)
+        self.recordReceived.connect(self.temp_plot.update_record)
+        self.recordReceived.connect(self.cmd_plot.update_record)
+        self.temp_plot.latency = self.latency
+
+        # Every line is parsed once (by the reading thread), the record is handed to all the consumers on the GUI thread
+        self.dispatcher = TelemetryDispatcher()
+        self.dispatcher.subscribe(self.recordReceived.emit)
+        self.dispatcher.subscribe(self.check_stability_zone)
+        self.dispatcher.subscribe(self.record_if_recording)
+
+        # The plots only keep their visible window, the whole session is archived here
+        # (read it with app.core.run_writer.read_run or the replay viewer)
+        history_dir = os.path.join(self.data_dir, "History")
+        os.makedirs(history_dir, exist_ok=True)
+        history_path = os.path.join(history_dir, f"monitor_{datetime.now().strftime('%Y%m%d_%H%M%S')}.d2run")
+        self.history_writer = RunWriter(history_path, TelemetryRecord._fields, params={"port": port, "baudrate": baudrate})
+        self.dispatcher.subscribe(self.archive_record)
+
+        # The reading thread queues the received lines, the GUI takes them in batches. It starts when the port is open.
+        self.port = port
+        self.ser = None
+        self.read_thread = None
+        self.closing = False
+        self.gui_time = 0.0
+        self.gui_items = 0
+        self.ingest_timer = QTimer(self)
+        self.ingest_timer.timeout.connect(self.process_received)
+        self.ingest_timer.start(50)
+
+        # Open serial on a thread, a port name or a pyserial URL (socket://127.0.0.1:5760 attaches to a running Serial_recorder.py)
+        self.portOpened.connect(self.on_port_opened)
+        self.portFailed.connect(self.on_port_failed)
+        self.append_line(f"Opening port {port}...")
+        threading.Thread(target=self.open_port, args=(port, baudrate), daemon=True).start()
+
+    def open_port(self, port, baudrate):
+        """ Open the serial port, on the opening thread. The result is signalled to the GUI thread.
 
-        # Try open serial
+        Args:
+            port (str): Port name or pyserial URL.
+            baudrate (int): Baudrate for the serial port.
+        """
         try:
-            self.ser = serial.Serial(port, baudrate, timeout=1)
-            time.sleep(2)
+            ser = serial.serial_for_url(port, baudrate=baudrate, timeout=1 if "://" not in port else 0.02)
+            if "://" not in port:
+                time.sleep(2) # the board resets when the port opens
         except Exception as e:
-            raise RuntimeError(f"Could not open port {port}: {e}")
+            self.portFailed.emit(str(e))
+            return
+        self.portOpened.emit(ser)
+
+    @pyqtSlot(object)
+    def on_port_opened(self, ser):
+        """ Start reading the port once it is open.
 
-        self.read_thread = SerialReadThread(self.ser, self.on_line_received)
+        Args:
+            ser (serial.Serial): Open port.
+        """
+        if self.closing:
+            ser.close()
+            return
+        self.ser = ser
+        self.read_thread = SerialIngest(self.ser, min_read=1 if "://" not in self.port else 4096)
         self.read_thread.start()
+        self.append_line(f"[INFO] Port {self.port} open ({clock.mark('port open'):.0f} ms after start)")
+
+    @pyqtSlot(str)
+    def on_port_failed(self, message):
+        """ Report a port that could not be opened.
+
+        Args:
+            message (str): Error of pyserial.
+        """
+        print(f"[ERROR] Could not open port {self.port}: {message}")
+        self.append_line(f"[ERROR] Could not open port {self.port}: {message}")
 
     def _build_ui(self):
         """ Build the UI for the main window.
@@ -567,6 +711,23 @@ class SerialMonitor(QWidget):
         param_layout.addWidget(self.input_f)
         control_layout.addLayout(param_layout)
 
+        self.chk_binary = QCheckBox("Binary telemetry")
+        self.chk_binary.toggled.connect(self.set_binary_telemetry)
+        control_layout.addWidget(self.chk_binary)
+
+        # Digital twin, plate of the simulator config driven by the measured PWM
+        twin_layout = QHBoxLayout()
+        self.chk_twin = QCheckBox("Digital twin")
+        self.chk_twin.toggled.connect(self.toggle_twin)
+        twin_layout.addWidget(self.chk_twin)
+        twin_layout.addWidget(QLabel("Power at U=100% [W]:"))
+        self.input_twin_power = QLineEdit()
+        self.input_twin_power.setPlaceholderText("from config")
+        twin_layout.addWidget(self.input_twin_power)
+        control_layout.addLayout(twin_layout)
+        self.lbl_twin = QLabel("Twin: off")
+        self.lbl_twin.setWordWrap(True)
+        control_layout.addWidget(self.lbl_twin)
 
         self.lbl_precision = QLabel("Precision: unknown")
         self.lbl_precision.setStyleSheet("color: red;")
@@ -580,17 +741,37 @@ class SerialMonitor(QWidget):
         self.lbl_timer.setStyleSheet("color: red;")
         control_layout.addWidget(self.lbl_timer)
 
-        # Text area
+        self.lbl_metrics = QLabel("Metrics: no setpoint sent")
+        self.lbl_metrics.setWordWrap(True)
+        control_layout.addWidget(self.lbl_metrics)
+
+        self.lbl_ingest = QLabel("RX: -")
+        control_layout.addWidget(self.lbl_ingest)
+
+        latency_layout = QHBoxLayout()
+        self.lbl_latency = QLabel("Latency p50/p95 [ms]: -\nCommand RTT: - | lost 0")
+        self.lbl_latency.setWordWrap(True)
+        self.btn_latency = QPushButton("Export latency")
+        self.btn_latency.clicked.connect(self.export_latency)
+        latency_layout.addWidget(self.lbl_latency, 1)
+        latency_layout.addWidget(self.btn_latency)
+        control_layout.addLayout(latency_layout)
+
+        # Text area, only the last lines are kept
         self.text_area = QPlainTextEdit()
         self.text_area.setReadOnly(True)
+        self.text_area.setMaximumBlockCount(2000)
         control_layout.addWidget(self.text_area)
 
         # Plots
-        self.temp_plot = TempPlotWidget()
-        self.cmd_plot  = CommandPlotWidget()
+        self.temp_plot = TempPlotWidget(window=self.plot_window)
+        self.cmd_plot  = CommandPlotWidget(window=self.plot_window)
+        self.twin_plot = TwinPlotWidget(window=self.plot_window)
+        self.twin_plot.hide()
 
         plot_layout.addWidget(self.temp_plot)
         plot_layout.addWidget(self.cmd_plot)
+        plot_layout.addWidget(self.twin_plot)
 
         main_layout.addLayout(control_layout, 1)
         main_layout.addLayout(plot_layout, 2)
@@ -599,21 +780,126 @@ class SerialMonitor(QWidget):
     #############################################
     # BACKGROUND DATA HANDLER
     #############################################
-    def on_line_received(self, line):
-        """ Handle the line received from the serial port.
-        This method will emit a signal with the line data and parse it to update the plots.
+    def process_received(self):
+        """ Handle the lines and frames received since the last call, on the GUI thread.
+        The console gets the batch in one append and the records go to the consumers of the dispatcher.
+        The samples of the digital twin, computed on its own thread, are plotted here too.
+        """
+        if self.twin is not None:
+            self.process_twin()
+        if self.read_thread is None:
+            return
+        items = self.read_thread.drain(5000)
+        if not items:
+            return
+        start = time.perf_counter()
+        drained = time.monotonic()
+        for item in items:
+            self.latency.mark("parse", item.arrival, item.parsed)
+            self.latency.mark("queue", item.arrival, drained)
+            if item.line is not None:
+                self.commands.on_line(item.line, item.arrival)
+        # Lines past the console block count would be dropped right away
+        text = [f"[RX] {item.line}" for item in items if item.line is not None][-self.text_area.maximumBlockCount():]
+        if text:
+            self.append_line("\n".join(text))
+        for item in items:
+            if item.record is not None:
+                self.current_arrival = item.arrival
+                self.dispatcher.dispatch(item.record)
+                self.temp_plot.note_arrival(item.arrival)
+        self.gui_time += time.perf_counter() - start
+        self.gui_items += len(items)
+        self.update_ingest_label()
+
+    def ingest_stats(self):
+        """ Counters of the serial ingestion.
+
+        Returns:
+            dict: Counters of the reading thread and the GUI time per 1000 items [ms].
+        """
+        stats = self.read_thread.stats() if self.read_thread is not None else {}
+        stats["gui_ms_per_1000"] = 1e6 * self.gui_time / self.gui_items if self.gui_items else 0.0
+        return stats
+
+    def update_ingest_label(self):
+        """ Show the ingestion counters.
+        """
+        stats = self.ingest_stats()
+        self.lbl_ingest.setText(
+            f"RX: {stats['lines']} lines, {stats['frames']} frames | queue {stats['depth']} (max {stats['max_depth']})"
+            f" | dropped {stats['dropped']} | GUI {stats['gui_ms_per_1000']:.1f} ms / 1000"
+        )
+        self.lbl_latency.setText(f"{self.latency.status_text()}\n{self.commands.status_text()}")
+
+    def toggle_twin(self, enabled):
+        """ Start or stop the digital twin. The plate is built from the latest simulator config.
+
+        Args:
+            enabled (bool): Run the twin.
+        """
+        if self.twin is not None:
+            self.dispatcher.unsubscribe(self.twin.feed)
+            self.twin.stop()
+            self.twin.join()
+            self.twin = None
+        if not enabled:
+            self.twin_plot.hide()
+            self.lbl_twin.setText("Twin: off")
+            return
+
+        json_handler = JsonHandler()
+        if not json_handler.read_json_file(self.twin_config):
+            self.chk_twin.setChecked(False)
+            return
+        try:
+            plate = Plate(**plate_kwargs(json_handler.get_data()["plate"]))
+            power = self.input_twin_power.text().strip()
+            self.twin = DigitalTwin(plate, float(power) if power else None)
+        except Exception as e:
+            print(f"[ERROR] Could not start the digital twin: {e}")
+            self.chk_twin.setChecked(False)
+            return
+        self.twin_plot.reset_plot()
+        self.twin_plot.show()
+        self.twin.start()
+        self.dispatcher.subscribe(self.twin.feed)
+
+    def process_twin(self):
+        """ Plot the samples computed by the twin since the last call.
+        """
+        for sample in self.twin.drain():
+            self.twin_plot.update_sample(sample)
+        self.lbl_twin.setText(self.twin.status_text())
+
+    def export_latency(self):
+        """ Write the latency histograms, command round trips and ingestion counters to data/latency_<timestamp>.json.
+        """
+        file_path = os.path.join(self.data_dir, f"latency_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+        try:
+            export_latency(file_path, self.latency, self.commands, {"ingest": self.ingest_stats()})
+            self.append_line(f"[INFO] Latency exported to {file_path}")
+        except Exception as e:
+            print(f"[ERROR] Could not export the latency: {e}")
+
+    def archive_record(self, record):
+        """ Add the record to the archive of the session.
 
         Args:
-            line (_type_): Line received from the serial port.
+            record (TelemetryRecord): Record parsed from the serial line.
         """
-        self.lineReceivedText.emit(f"[RX] {line}")
-        self.lineReceivedPlot.emit(line)
+        self.history_writer.append(*record)
 
-        # Check stability each time we see T3
-        self.check_stability_zone(line)
+    def record_if_recording(self, record):
+        """ Write the record to the Excel file while recording.
 
+        Args:
+            record (TelemetryRecord): Record parsed from the serial line.
+        """
         if self.recording:
-            self.excel_recorder.parse_and_write(line)
+            self.excel_recorder.write_record(record)
+            if self.current_arrival is not None:
+                self.latency.mark("record", self.current_arrival)
 
     def append_line(self, text):
         """ Append a line to the text area.
@@ -627,19 +913,18 @@ class SerialMonitor(QWidget):
     #############################################
     # STABILITY LOGIC
     #############################################
-    def check_stability_zone(self, line):
+    def check_stability_zone(self, record):
         """ Check if the T3 value is within the stability zone.
-        This method will parse the line to extract the T3 value and check if it is within the stability zone.
+        This method will check if the estimated T3 of the record is within the stability zone.
         It will also update the labels in the UI to indicate the stability status.
 
         Args:
-            line (_type_):  Line received from the serial port.
+            record (TelemetryRecord):  Record parsed from the serial line.
         """
-        
-        mt3e = re.search(r"t3\s*est:\s*([\d\.]+)", line)
-        if not mt3e:
+        if not has_value(record.t3_est):
             return
-        t3_val = float(mt3e.group(1))
+        t3_val = record.t3_est
+        self.metrics.update(record.time, t3_val)
 
         lower = self.current_setpoint - self.allowable_error
         upper = self.current_setpoint + self.allowable_error
@@ -651,42 +936,41 @@ class SerialMonitor(QWidget):
         if in_zone_now:
             # just entered
             self.in_precise_zone = True
-            self.lbl_precision.setStyleSheet("color: green;")
+            self.set_label_style(self.lbl_precision, "color: green;")
             self.lbl_precision.setText(f"Precision: in zone.")
 
         else:
             self.lbl_precision.setText(f"Precision: Bad, need to be between : {lower} and {upper}.")
             self.in_precise_zone = False
             self.time_counting = False
-            self.lbl_precision.setStyleSheet("color: red;")
+            self.set_label_style(self.lbl_precision, "color: red;")
 
 
 
-        if len(self.temp_plot.t3_est_values) > 20:
-            last_values_t3_est = self.temp_plot.t3_est_values[-20:]
-            diff = max(last_values_t3_est) -min(last_values_t3_est)
+        if self.metrics.stability.count > 20:
+            diff = self.metrics.stability.spread()
 
             if diff < 0.1:
                 self.lbl_stabilite.setText(f"Stabilite: Stable, ecart < 0.1 depuis plus de 20 secondes :)")
-                self.lbl_stabilite.setStyleSheet("color: green;")
+                self.set_label_style(self.lbl_stabilite, "color: green;")
                 self.in_stable_zone = True
 
             else:
                 self.lbl_stabilite.setText(f"Stabilite: instable :(   Ecart: {diff}")   
-                self.lbl_stabilite.setStyleSheet("color: red;")
+                self.set_label_style(self.lbl_stabilite, "color: red;")
                 self.in_stable_zone = False
                 self.time_counting = False
                 
         else:
             self.lbl_stabilite.setText(f"Stabilite: calibrating")   
-            self.lbl_stabilite.setStyleSheet("color: orange;")
+            self.set_label_style(self.lbl_stabilite, "color: orange;")
             self.in_stable_zone = False
             self.time_counting = False
             
 
         if self.in_stable_zone and self.in_precise_zone and not self.time_counting:
             self.enter_time = now - 20
-            self.lbl_timer.setStyleSheet("color: green;")
+            self.set_label_style(self.lbl_timer, "color: green;")
             self.time_counting = True
             
         elif self.in_stable_zone and self.in_precise_zone and self.time_counting:
@@ -694,10 +978,22 @@ class SerialMonitor(QWidget):
             self.lbl_timer.setText(f"In zones :) : elapsed: {elapsed}")
         else:
             self.enter_time = now + 20
-            self.lbl_timer.setStyleSheet("color: red;")
+            self.set_label_style(self.lbl_timer, "color: red;")
             self.lbl_timer.setText(f"N/A")
 
-                    
+        self.lbl_metrics.setText(self.metrics.status_text())
+        if self.current_arrival is not None:
+            self.latency.mark("metrics", self.current_arrival)
+
+    def set_label_style(self, label, style):
+        """ Change the style sheet of a label only when it differs, restyling a widget is slow.
+
+        Args:
+            label (QLabel): Label to style.
+            style (string): Style sheet.
+        """
+        if label.styleSheet() != style:
+            label.setStyleSheet(style)
 
     def get_current_t3_est(self):
         """ Get the current T3_est value.
@@ -706,8 +1002,8 @@ class SerialMonitor(QWidget):
         Returns:
             float:  Current T3_est value or 25.0 if no values are available.
         """
-        if len(self.temp_plot.t3_est_values) > 0:
-            return self.temp_plot.t3_est_values[-1]
+        if has_value(self.metrics.last_value):
+            return self.metrics.last_value
         return 25.0
 
     #############################################
@@ -735,8 +1031,17 @@ class SerialMonitor(QWidget):
         self.send_reset()
         self.temp_plot.reset_plot()
         self.cmd_plot.reset_plot()
+        self.metrics.reset()
         self.lbl_precision.setText("Stability: reset.")
 
+    def set_binary_telemetry(self, binary):
+        """ Ask the firmware for binary frames ("B") or text lines ("A").
+
+        Args:
+            binary (bool): Use the binary telemetry.
+        """
+        self._send_line("B" if binary else "A")
+
     def send_reset(self):
         """ Send the reset command to the serial port.
         This method will send the reset command to the serial port and reset the plot data.
@@ -754,6 +1059,8 @@ class SerialMonitor(QWidget):
 
 
         self.current_setpoint = con
+        self.metrics.band = self.allowable_error
+        self.metrics.set_setpoint(con)
 
         # 2) reset timer
         self.enter_time = None
@@ -780,6 +1087,7 @@ class SerialMonitor(QWidget):
         if self.ser and self.ser.is_open:
             line = data_str + "\n"
             self.ser.write(line.encode('ascii', errors='ignore'))
+            self.commands.sent(data_str)
             self.text_area.appendPlainText(f"[TX] {data_str}")
 
     #############################################
@@ -792,6 +1100,8 @@ class SerialMonitor(QWidget):
         if self.recording:
             self.recording = False
             self.excel_recorder.save_and_close()
+            arrays = self.excel_recorder.recorded_arrays()
+            self.catalog_recording(arrays)
             self.text_area.appendPlainText("Stopped recording to Excel.")
             self.btn_record.setText("Start Recording")
             self.btn_record.setStyleSheet("background-color: green; color: white;")
@@ -805,6 +1115,26 @@ class SerialMonitor(QWidget):
             self.btn_record.setText("Recording")
             self.btn_record.setStyleSheet("background-color: red; color: white;")
 
+    def catalog_recording(self, arrays):
+        """ Add the recording that just stopped to the run catalog.
+
+        Args:
+            arrays (tuple): Recorded (time, t1, t2, t3).
+        """
+        try:
+            catalog = RunCatalog(os.path.join(os.getcwd(), "Data", "run_catalog.sqlite"))
+            gains = {}
+            for name, field in (("p", self.input_p), ("i", self.input_i), ("d", self.input_d), ("f", self.input_f)):
+                try:
+                    gains[name] = float(field.text().strip())
+                except ValueError:
+                    gains[name] = None
+            catalog.add_monitor_recording([self.excel_recorder.current_path], self.current_setpoint, gains, *arrays,
+                                          band=self.allowable_error)
+            catalog.close()
+        except Exception as e:
+            print("Catalog error:", e)
+
     #############################################
     # Cleanup
     #############################################
@@ -815,19 +1145,26 @@ class SerialMonitor(QWidget):
         Args:
             event (event): event object for the close event.
         """
-        if hasattr(self, 'read_thread') and self.read_thread:
+        self.closing = True
+        self.ingest_timer.stop()
+        if self.twin is not None:
+            self.twin.stop()
+        if self.read_thread:
             self.read_thread.stop()
             self.read_thread.join()
-        if hasattr(self, 'ser') and self.ser and self.ser.is_open:
+        if self.ser and self.ser.is_open:
             self.ser.close()
 
+        self.history_writer.close()
         self.excel_recorder.save_and_close()
         event.accept()
 
 
 def main():
+    clock.mark("imports")
     app = QApplication(sys.argv) #create the application
-    window = SerialMonitor(port="COM9", baudrate=115200) #create the main window
+    port = sys.argv[1] if len(sys.argv) > 1 else "COM9" # port name or pyserial URL
+    window = SerialMonitor(port=port, baudrate=115200) #create the main window
 
     screen = app.primaryScreen().availableGeometry() # Get the screen geometry
     w = int(screen.width() * 0.95) # Set the width to 95% of the screen width
@@ -837,6 +1174,8 @@ def main():
     window.setGeometry(x, y, w, h) # Set the window geometry
 
     window.show() #show the main window
+    clock.mark("shown")
+    print(f"[INFO] Started: {clock.status_text()}")
     sys.exit(app.exec_()) #run the application
 
 
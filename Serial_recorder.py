@@ -0,0 +1,53 @@
+import argparse
+import os
+import signal
+import sys
+import threading
+import time
+
+from app.core.headless_recorder import HeadlessRecorder
+
+
+def main(argv=None):
+    """Record a bench without GUI until Ctrl+C
+
+    Args:
+        argv (list, optional): Command line arguments. Defaults to sys.argv[1:].
+    """
+    parser = argparse.ArgumentParser(description="Headless recorder of the Design 2 prototype serial port")
+    parser.add_argument("port", help='Serial port ("COM9", "/dev/ttyACM0" or pyserial URL)')
+    parser.add_argument("--baudrate", type=int, default=115200)
+    parser.add_argument("--out", default=os.path.join(os.getcwd(), "data", "Recorder"), help="Directory of the segments")
+    parser.add_argument("--max-mb", type=float, default=64, help="Raw megabytes per segment")
+    parser.add_argument("--max-minutes", type=float, default=60, help="Minutes per segment")
+    parser.add_argument("--live-port", type=int, default=5760,
+                        help="TCP port of the live feed, 0 to disable. Attach with: python Serial_monitor.py socket://127.0.0.1:5760")
+    parser.add_argument("--allow-commands", action="store_true", help="Forward the commands of the live viewers to the port")
+    parser.add_argument("--status", type=float, default=60, help="Seconds between two status lines")
+    args = parser.parse_args(argv)
+
+    recorder = HeadlessRecorder(
+        args.port, args.out, baudrate=args.baudrate, max_bytes=int(args.max_mb * (1 << 20)),
+        max_seconds=args.max_minutes * 60, live_port=args.live_port or None, allow_commands=args.allow_commands,
+    )
+    signal.signal(signal.SIGINT, lambda *_: recorder.stop())
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, lambda *_: recorder.stop())
+    if recorder.live is not None:
+        print(f"[INFO] Live feed on socket://{recorder.live.address[0]}:{recorder.live.address[1]}")
+
+    thread = threading.Thread(target=recorder.run)
+    thread.start()
+    start = time.monotonic()
+    while thread.is_alive():
+        thread.join(args.status)
+        if thread.is_alive():
+            stats = recorder.stats()
+            elapsed = time.monotonic() - start
+            print(f"[INFO] {stats['bytes']} bytes, {stats['records']} records, {stats['segments']} segments, "
+                  f"{stats['disconnects']} disconnects, {stats['viewers']} viewers, "
+                  f"CPU {100 * stats['cpu_time'] / elapsed:.2f} %")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -8,7 +8,13 @@ from PyQt5.QtCore import QTimer
 from app.ui.main_window import MainWindow
 from app.core.JSON_Handler import JsonHandler
 from app.core.plate_transmission import Plate
-from app.ui.plate_canvas import PlateCanvas
+from app.core.layered_plate import FACES, LayeredPlate, build_plate, layered_kwargs, solver_mode
+from app.core.sim_pacer import SimulationPacer
+from app.core.profiler import Profiler
+from app.core.run_writer import RunWriter, export_text
+from app.core.field_recorder import FieldRecorder, COMPRESSIONS
+from app.core.result_cache import ResultCache, cache_key
+from app.core.run_catalog import RunCatalog
 
  
 
@@ -21,7 +27,16 @@ class AppController:
         self.json_handler = JsonHandler()
         self.config_dir = "app/Configs"
         self.canvas = None
+        self.replay = None
         self.working = False
+        self.profiler = Profiler()
+        self.run_writer = None
+        self.field_recorder = None
+        self.run_timestamp = None
+        self.data_dir = "Data"
+        self.result_cache = ResultCache(os.path.join(self.data_dir, "cache"))
+        self.pending_cache_key = None
+        self.run_params = None
         self.cwd = os.getcwd()
         screen = self.app.primaryScreen()
         available_rect = screen.availableGeometry()
@@ -104,6 +119,17 @@ class AppController:
                 "Stop perturbation time [s]:": ui.zone_stop_perturbation_time.toPlainText(),
                 "Position perturbation [(X, Y)]:": ui.zone_position_perturbation.toPlainText(),
                 "Perturbation [W]:": ui.zone_power_perturbation.toPlainText()
+            },
+            "recording": {
+                "Snapshot interval [s]:": ui.zone_snapshot_interval.toPlainText(),
+                "Snapshot format:": ui.zone_snapshot_format.toPlainText()
+            },
+            "solver": {
+                "Mode:": ui.zone_solver_mode.toPlainText(),
+                "Layers:": ui.zone_layers.toPlainText(),
+                "Time step [s]:": ui.zone_solver_dt.toPlainText(),
+                "Thermistor faces:": ui.zone_thermistor_faces.toPlainText(),
+                "Heater face:": ui.zone_heater_face.toPlainText()
             }
         }
 
@@ -153,6 +179,15 @@ class AppController:
                 ui.zone_stop_perturbation_time.setPlainText(str(p.get("Stop perturbation time [s]:", "")))
                 ui.zone_position_perturbation.setPlainText(str(p.get("Position perturbation [(X, Y)]:", "")))
                 ui.zone_power_perturbation.setPlainText(str(p.get("Perturbation [W]:", "")))
+                r = self.json_handler.get_data().get("recording", {})
+                ui.zone_snapshot_interval.setPlainText(str(r.get("Snapshot interval [s]:", "")))
+                ui.zone_snapshot_format.setPlainText(str(r.get("Snapshot format:", "")))
+                s = self.json_handler.get_data().get("solver", {})
+                ui.zone_solver_mode.setPlainText(str(s.get("Mode:", "")))
+                ui.zone_layers.setPlainText(str(s.get("Layers:", "")))
+                ui.zone_solver_dt.setPlainText(str(s.get("Time step [s]:", "")))
+                ui.zone_thermistor_faces.setPlainText(str(s.get("Thermistor faces:", "")))
+                ui.zone_heater_face.setPlainText(str(s.get("Heater face:", "")))
 
         except Exception as e:
             print(f"[CRITICAL] Failed to load params: {e}")
@@ -263,12 +298,37 @@ class AppController:
             raise Exception("Stop perturbation time must be between Start Perturbation Time and Total Time")
         if perturbation < 0:
             raise Exception("Perturbation must be positive")
+
+        r = self.__fetch_params()["recording"]
+        if r["Snapshot interval [s]:"].strip():
+            if float(r["Snapshot interval [s]:"]) <= 0:
+                raise Exception("Snapshot interval must be positive")
+            if (r["Snapshot format:"].strip() or "float16") not in COMPRESSIONS:
+                raise Exception(f"Snapshot format must be one of {', '.join(COMPRESSIONS)}")
+
+        config = self.__fetch_params()
+        mode = solver_mode(config)
+        if mode not in (Plate.solver_mode, LayeredPlate.solver_mode):
+            raise Exception(f"Solver mode must be {Plate.solver_mode} or {LayeredPlate.solver_mode}")
+        if mode == LayeredPlate.solver_mode:
+            try:
+                layered = layered_kwargs(config["solver"], config["plate"])
+            except (ValueError, SyntaxError):
+                raise Exception("Layers must be a number or a list of (thickness [mm], k, rho, cp)")
+            if layered["dt"] <= 0:
+                raise Exception("Solver time step must be positive")
+            if len(layered["thermistor_faces"]) != 3:
+                raise Exception("Thermistor faces must list the face of the 3 thermistances")
+            for face in layered["thermistor_faces"] + [layered["heater_face"]]:
+                if face not in FACES:
+                    raise Exception(f"Faces must be {' or '.join(FACES)}")
         
         if n > 100:
             reply = QMessageBox.question(
                 self.main_window,
                 "Maillage élevé ?",
-                "Un maillage supérieur à 100 peut entraîner des problèmes de performances. Voulez‑vous procéder ?",
+                "Un maillage supérieur à 100 peut entraîner des problèmes de performances. "
+                "Le N nécessaire pour une précision donnée est indiqué par: python -m app.core.convergence. Voulez‑vous procéder ?",
                 QMessageBox.Yes | QMessageBox.No,
                 QMessageBox.Yes
             )
@@ -283,34 +343,9 @@ class AppController:
         
         try:
             self.__verify_param()
-            p = self.__fetch_params()["plate"]
-            plate = Plate(
-                total_time=float(p["Total Time [s]:"]),
-                lx=float(p["Length X [mm]:"])/1000,
-                ly=float(p["Length Y [mm]:"])/1000,
-                thickness=float(p["Thickness [mm]:"])/1000,
-                n=int(p["N:"]),
-                k=float(p["Thermal Conductivity [W/mK]:"]),
-                rho=float(p["Density [kg/m3]:"]),
-                cp=float(p["Heat Capacity [J/kgK]:"]),
-                h_convection=float(p["Convection Coeff [W/m2K]:"]),
-                amp_in=float(p["Amperage Input [A]:"]),
-                power_transfer=float(p["Power transfert :"]),
-                ambient_temp=float(p["Ambient Temp [°C]:"]),
-                initial_plate_temp=float(p["Initial Temp [°C]:"]),
-                position_heat_source=ast.literal_eval(p["Position heat source [(X, Y)]:"]),
-                positions_thermistances=[
-                    ast.literal_eval(p["Position thermistance 1 [(X, Y)]:"]),
-                    ast.literal_eval(p["Position thermistance 2 [(X, Y)]:"]),
-                    ast.literal_eval(p["Position thermistance 3 [(X, Y)]:"])
-                ],
-                start_heat_time=float(p["Start heat time [s]:"]),
-                stop_heat_time=float(p["Stop heat time [s]:"]),
-                start_perturbation=float(p["Start perturbation time [s]:"]),
-                stop_perturbation=float(p["Stop perturbation time [s]:"]),
-                position_perturbation=ast.literal_eval(p["Position perturbation [(X, Y)]:"]),
-                perturbation=float(p["Perturbation [W]:"])
-            )
+            config = self.__fetch_params()
+            p = config["plate"]
+            plate = build_plate(config)
             
             if self.canvas:
                 self.main_window.layout().removeWidget(self.canvas)
@@ -318,39 +353,238 @@ class AppController:
             self.main_window.set_secondary_layout()
 
 
-            self.canvas = PlateCanvas(controller=self, step_sim_time=float(p["step time [s]:"]))
+            self.profiler.reset()
+            self.__open_run_writer(plate)
+            # matplotlib and its 3D toolkit are imported with the first simulation, not at start
+            from app.ui.plate_canvas import PlateCanvas
+            self.canvas = PlateCanvas(controller=self, step_sim_time=float(p["step time [s]:"]), profiler=self.profiler)
+            self.canvas.run_writer = self.run_writer
+            self.canvas.set_target_rtf(self.__parse_rtf(self.main_window.cb_rtf.currentText()))
             self.main_window.layout().addWidget(self.canvas)
-            self.canvas.start_simulation(plate)
             self.working = True
 
+            # Snapshots are not cached, a run recording them is always simulated
+            key = cache_key(p, plate.solver_mode, config["solver"] if plate.solver_mode != Plate.solver_mode else None)
+            cached = None
+            if self.field_recorder is None and self.main_window.chk_cache.isChecked():
+                cached = self.result_cache.get(key)
+            if cached is not None:
+                print(f"[INFO] Result loaded from cache {key[:12]}")
+                self.pending_cache_key = None
+                self.run_writer.extend(np.transpose([cached[c] for c in self.run_writer.columns]))
+                self.canvas.show_result(plate, cached)
+            else:
+                self.pending_cache_key = key
+                self.canvas.start_simulation(plate)
+
         except Exception as e:
             QMessageBox.critical(None, "Error", f"Failed to start simulation:\n{e}")
 
+    def simulation_finished(self):
+        """Called by the canvas when the total time is reached, stores the result in the cache
+        """
+        if self.pending_cache_key is None:
+            return
+        try:
+            self.result_cache.put(self.pending_cache_key, self.canvas.result_arrays(),
+                                  meta={"plate": self.__fetch_params()["plate"]})
+        except Exception as e:
+            print(f"[WARN] Failed to store the result in the cache: {e}")
+        self.pending_cache_key = None
+
     def reset_view(self):
         self.canvas.reset_view()
 
+    def __pick_runs(self):
+        """Ask the user for recorded run files
+
+        Returns:
+            list: Paths of the selected .d2run files
+        """
+        files, _ = QFileDialog.getOpenFileNames(
+        None,
+        "Ouvrir un enregistrement",
+        os.path.join(self.cwd, self.data_dir),
+        "Runs (*.d2run);;All Files (*)"
+        )
+        return files
+
+    def open_replay(self):
+        """Open one or several recorded runs in the replay viewer
+        """
+        files = self.__pick_runs()
+        if not files:
+            return
+        try:
+            self.main_window.set_replay_layout()
+            from app.ui.replay_canvas import ReplayCanvas
+            self.replay = ReplayCanvas(controller=self)
+            self.main_window.layout().addWidget(self.replay)
+            for file_path in files:
+                self.replay.add_run(file_path)
+            self.seek_replay(self.main_window.replay_slider.value())
+        except Exception as e:
+            QMessageBox.critical(None, "Error", f"Failed to open the recording:\n{e}")
+
+    def add_replay_run(self):
+        """Overlay other recorded runs on the thermistance plot of the replay viewer
+        """
+        for file_path in self.__pick_runs():
+            try:
+                self.replay.add_run(file_path)
+            except Exception as e:
+                QMessageBox.critical(None, "Error", f"Failed to open the recording:\n{e}")
+
+    def seek_replay(self, value):
+        """Move the replay viewer along its timeline
+
+        Args:
+            value (int): Position of the slider, from 0 to 1000
+        """
+        if self.replay:
+            self.replay.seek(value / 1000 * self.replay.duration())
+
+    def __parse_rtf(self, text):
+        """Convert the real-time factor combo box text to a pacing target
+
+        Args:
+            text (string): "Pas fixe", "max" or a factor such as "10x"
+
+        Returns:
+            float or str: Target real-time factor, SimulationPacer.MAX or None for the fixed step per tick
+        """
+        if text == "max":
+            return SimulationPacer.MAX
+        if text.endswith("x"):
+            return float(text[:-1])
+        return None
+
+    def set_target_rtf(self, text):
+        """Change the pacing of the running simulation
+
+        Args:
+            text (string): Text of the real-time factor combo box
+        """
+        if self.canvas:
+            self.canvas.set_target_rtf(self.__parse_rtf(text))
+        if text == "Pas fixe":
+            self.main_window.lbl_pacing.setText("Facteur temps réel: N/A")
+
+    def set_profiling(self, enabled):
+        """Switch the timing of the simulation stages on or off
+
+        Args:
+            enabled (bool): New state of the profiler
+        """
+        self.profiler.set_enabled(enabled)
+
+    def set_profiling_overlay(self, enabled):
+        """Show or hide the profiling summary on the plots
+
+        Args:
+            enabled (bool): New state of the overlay
+        """
+        self.profiler.overlay = bool(enabled)
+
+    def __export_profile(self, timestamp):
+        """Write the profiling counters of the run next to the data, if any were collected
+
+        Args:
+            timestamp (string): Timestamp of the run files
+        """
+        if not self.profiler.stages:
+            return
+        base = os.path.join(os.getcwd(), f"Data/profile_{timestamp}")
+        self.profiler.export_json(base + ".json")
+        self.profiler.export_csv(base + ".csv")
+
+    def show_pacing_status(self, text):
+        """Display the achieved pacing of the simulation
+
+        Args:
+            text (string): Status text from the pacer
+        """
+        self.main_window.lbl_pacing.setText(text)
+
+    def __open_run_writer(self, plate):
+        """Create the binary file where the samples of the new run are streamed
+
+        Args:
+            plate (Plate): Plate of the run, its discretisation is stored with the parameters
+        """
+        self.__close_run_writer()
+        os.makedirs(self.data_dir, exist_ok=True)
+        self.run_timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        params = self.__fetch_params()
+        params["discretisation"] = {"nx": plate.nx, "ny": plate.ny, "nz": getattr(plate, "nz", 1), "dt": plate.dt}
+        self.run_params = params
+        base = os.path.join(os.getcwd(), self.data_dir, f"sim_data_{self.run_timestamp}")
+        r = params["recording"]
+        if r["Snapshot interval [s]:"].strip():
+            self.field_recorder = FieldRecorder(
+                base + ".field", plate.temps.shape, plate.total_time,
+                float(r["Snapshot interval [s]:"]), r["Snapshot format:"].strip() or "float16"
+            )
+            plate.attach_field_recorder(self.field_recorder)
+            params["field_snapshots"] = os.path.basename(base) + ".field"
+        self.run_writer = RunWriter(base + ".d2run", ["time", "power", "perturbation", "t1", "t2", "t3"], params=params)
+
+    def __close_run_writer(self):
+        """Write the remaining samples and snapshots and close the run files
+
+        Returns:
+            string: Path of the closed run file, None if no run was open
+        """
+        if self.field_recorder is not None:
+            if self.canvas:
+                self.canvas.plate.attach_field_recorder(None)
+            self.field_recorder.close()
+            self.field_recorder = None
+        if self.run_writer is None:
+            return None
+        with self.profiler.section("save"):
+            self.run_writer.close()
+        file_path = self.run_writer.file_path
+        self.run_writer = None
+        if self.canvas:
+            self.canvas.run_writer = None
+        return file_path
+
+    def __catalog_run(self, files):
+        """Add the stopped run to the run catalog
+
+        Args:
+            files (list): Files produced by the run
+        """
+        try:
+            catalog = RunCatalog(os.path.join(self.data_dir, "run_catalog.sqlite"))
+            catalog.add_simulation(self.run_params, files, self.canvas.times, self.canvas.t1, self.canvas.t2, self.canvas.t3)
+            catalog.close()
+        except Exception as e:
+            print(f"[WARN] Failed to add the run to the catalog: {e}")
+
     def stop(self):
-        """Stop and save the data to a txt file
+        """Stop the simulation and close the run file, optionally converted to a txt file
         """
         try:
             self.working = False
+            file_path = self.__close_run_writer()
+            if file_path is None:
+                return
+            files = [file_path]
+            if "field_snapshots" in self.run_params:
+                files.append(os.path.join(os.path.dirname(file_path), self.run_params["field_snapshots"]))
+            if self.main_window.chk_export_text.isChecked():
+                with self.profiler.section("savetxt"):
+                    files.append(export_text(file_path))
+            self.__export_profile(self.run_timestamp)
+            self.__catalog_run(files)
 
-            times = [x for x in self.canvas.times]
-            power = self.canvas.power
-            pert = self.canvas.perturbation
-            t1 = [x for x in self.canvas.t1]
-            t2 = [x for x in self.canvas.t2]
-            t3 = [x for x in self.canvas.t3]
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            new_file = os.path.join(os.getcwd(), f"Data/sim_data_{timestamp}.txt")
-            np.savetxt(new_file, np.transpose([times, power, pert, t1, t2, t3]))
-            
         except Exception as e:
                 QMessageBox.critical(None, "Error", f"Failed to save data:\n{e}")
-                print("times:", times,"power:", power, "perturbation:", pert, "t1:", t1,"t2:", t2, "t3:", t3)
 
     def quit(self):
-        """Stop and save the data to a txt file then quit the app
+        """Stop and save the data then quit the app
         """
         self.stop()
         self.app.quit()
\ No newline at end of file
@@ -0,0 +1,262 @@
+import os
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from app.core.control_metrics import ControlMetrics
+from app.core.ring_buffer import RingBuffer
+from app.core.run_writer import RunWriter
+from app.core.serial_ingest import MultiSerialIngest
+from app.core.telemetry import TelemetryDispatcher, TelemetryRecord, synthetic_lines
+
+# Columns of the history of a bench, "arrival" is the time since the start of the monitor [s], shared by all the benches
+HISTORY_COLUMNS = ["arrival", "time", "consigne", "t1", "t2", "t3", "t4", "t3_est", "pwm"]
+
+
+class Bench:
+    """One test bench: the reader of its port, its own dispatcher, control metrics, plot history and recording
+    """
+    def __init__(self, name, reader, origin, history=3600, record_dir=None):
+        """Initialize the bench
+
+        Args:
+            name (string): Name of the bench
+            reader (PortReader): Reader of its serial port
+            origin (float): time.monotonic() of the start of the monitor, origin of the shared time axis
+            history (int, optional): Number of samples kept for the plots. Defaults to 3600.
+            record_dir (string, optional): Directory of the recordings, None to not record. Defaults to None.
+        """
+        self.name = name
+        self.reader = reader
+        self.origin = origin
+        self.dispatcher = TelemetryDispatcher()
+        self.metrics = ControlMetrics()
+        self.history = RingBuffer(history, len(HISTORY_COLUMNS))
+        self.console = deque(maxlen=200)
+        self.arrival = 0.0
+
+        self.writer = None
+        if record_dir is not None:
+            os.makedirs(record_dir, exist_ok=True)
+            safe_name = "".join(c if c.isalnum() else "_" for c in name)
+            path = os.path.join(record_dir, f"bench_{safe_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.d2run")
+            self.writer = RunWriter(path, list(TelemetryRecord._fields) + ["arrival"], params={"bench": name})
+
+        self.dispatcher.subscribe(self.__on_record)
+
+    def process(self, items):
+        """Handle the items drained from the reader
+
+        Args:
+            items (list): IngestItem of this bench
+        """
+        for item in items:
+            if item.line is not None:
+                self.console.append(item.line)
+            if item.record is not None:
+                self.arrival = item.arrival - self.origin
+                self.dispatcher.dispatch(item.record)
+
+    def __on_record(self, record):
+        """Update the metrics, the history and the recording with a record
+        """
+        self.metrics.update(record.time, record.t3_est)
+        self.history.append((self.arrival, record.time, record.consigne, record.t1, record.t2,
+                             record.t3, record.t4, record.t3_est, record.pwm))
+        if self.writer is not None:
+            self.writer.append(*record, self.arrival)
+
+    def values(self, column):
+        """Values of a history column, oldest first
+
+        Args:
+            column (string): Name in HISTORY_COLUMNS
+
+        Returns:
+            np.array: View of the values
+        """
+        return self.history.column(HISTORY_COLUMNS.index(column))
+
+    def send(self, line):
+        """Send a command line to the bench
+
+        Args:
+            line (string): Command, without line ending
+        """
+        self.reader.ser.write((line + "\n").encode("ascii", errors="ignore"))
+        if line.startswith("PARAM"):
+            for token in line.split()[1:]:
+                if token.startswith("C="):
+                    self.metrics.set_setpoint(float(token[2:]))
+
+    def close(self):
+        """Close the recording
+        """
+        if self.writer is not None:
+            self.writer.close()
+
+
+class BenchMonitor:
+    """Monitoring of several benches at once. A single MultiSerialIngest thread reads every port,
+    the GUI calls process to hand the received items to their bench.
+    """
+    def __init__(self, history=3600, record_dir=None):
+        """Initialize the monitor, add the benches then call start
+
+        Args:
+            history (int, optional): Number of samples kept per bench for the plots. Defaults to 3600.
+            record_dir (string, optional): Directory of the recordings, None to not record. Defaults to None.
+        """
+        self.history = history
+        self.record_dir = record_dir
+        self.origin = time.monotonic()
+        self.io = MultiSerialIngest()
+        self.benches = {}
+        self.process_time = 0.0
+
+    def add_bench(self, name, ser):
+        """Monitor an open serial port
+
+        Args:
+            name (string): Name of the bench
+            ser (serial.Serial): Open serial port
+
+        Returns:
+            Bench: The new bench
+        """
+        reader = self.io.add_port(ser, name)
+        bench = Bench(name, reader, self.origin, self.history, self.record_dir)
+        self.benches[name] = bench
+        return bench
+
+    def open_bench(self, name, url, baudrate=115200):
+        """Open a serial port (name like "COM4", "/dev/ttyACM0" or pyserial URL) and monitor it
+
+        Args:
+            name (string): Name of the bench
+            url (string): Port to open
+            baudrate (int, optional): Baudrate of the port. Defaults to 115200.
+
+        Returns:
+            Bench: The new bench
+        """
+        import serial
+        return self.add_bench(name, serial.serial_for_url(url, baudrate=baudrate, timeout=0))
+
+    def start(self):
+        """Start the reading thread
+        """
+        self.io.start()
+
+    def process(self, max_items=5000):
+        """Hand the received items to their bench, on the calling (GUI) thread
+
+        Args:
+            max_items (int, optional): Maximum number of items handled per bench. Defaults to 5000.
+
+        Returns:
+            int: Number of items handled
+        """
+        start = time.thread_time()
+        count = 0
+        for bench in self.benches.values():
+            items = bench.reader.drain(max_items)
+            if items:
+                bench.process(items)
+                count += len(items)
+        self.process_time += time.thread_time() - start
+        return count
+
+    def now(self):
+        """Current time on the shared axis [s]
+        """
+        return time.monotonic() - self.origin
+
+    def stats(self):
+        """Counters of the reading thread and of every port
+
+        Returns:
+            dict: MultiSerialIngest.stats with the CPU time of process under "process"
+        """
+        stats = self.io.stats()
+        stats["process"] = {"cpu_time": self.process_time}
+        return stats
+
+    def close(self):
+        """Stop the reading thread, close the recordings and the ports
+        """
+        self.io.stop()
+        if self.io.is_alive():
+            self.io.join()
+        for bench in self.benches.values():
+            bench.close()
+            bench.reader.ser.close()
+
+
+def benchmark_benches(counts=(1, 2, 4, 8), rate=200, duration=2.0):
+    """Feed several pseudo terminals at once and measure the CPU spent reading and processing them
+
+    Args:
+        counts (tuple, optional): Numbers of benches to try. Defaults to (1, 2, 4, 8).
+        rate (int, optional): Lines per second sent to each bench. Defaults to 200.
+        duration (float, optional): Length of each try [s]. Defaults to 2.0.
+
+    Returns:
+        list: Dict per try with benches, lines received, CPU time [ms] per second and per bench per second, wakeups
+    """
+    from app.core.serial_ingest import open_loopback
+
+    results = []
+    for count in counts:
+        monitor = BenchMonitor()
+        loopbacks = [open_loopback() for _ in range(count)]
+        for k, (port, _, _) in enumerate(loopbacks):
+            port.timeout = 0
+            monitor.add_bench(f"bench{k}", port)
+        lines = [(line + "\n").encode("ascii") for line in synthetic_lines(int(rate * duration) + 1)]
+        stop = threading.Event()
+
+        def feed(write):
+            period = 0.02
+            per_tick = max(1, int(rate * period))
+            position = 0
+            while not stop.is_set() and position < len(lines):
+                write(b"".join(lines[position:position + per_tick]))
+                position += per_tick
+                time.sleep(period)
+
+        writers = [threading.Thread(target=feed, args=(write,), daemon=True) for _, write, _ in loopbacks]
+        monitor.start()
+        for writer in writers:
+            writer.start()
+        start = time.perf_counter()
+        while time.perf_counter() - start < duration:
+            time.sleep(0.05)
+            monitor.process()
+        stop.set()
+        for writer in writers:
+            writer.join()
+        time.sleep(0.1)
+        monitor.process()
+        elapsed = time.perf_counter() - start
+        stats = monitor.stats()
+        monitor.close()
+        for _, _, close in loopbacks:
+            close()
+
+        cpu = stats["io_thread"]["cpu_time"] + stats["process"]["cpu_time"]
+        results.append({
+            "benches": count,
+            "lines": sum(bench.reader.lines for bench in monitor.benches.values()),
+            "cpu_ms_per_s": 1000 * cpu / elapsed,
+            "cpu_ms_per_s_per_bench": 1000 * cpu / elapsed / count,
+            "wakeups": stats["io_thread"]["wakeups"],
+        })
+    return results
+
+
+if __name__ == "__main__":
+    for result in benchmark_benches(rate=int(sys.argv[1]) if len(sys.argv) > 1 else 200):
+        print(", ".join(f"{k}: {v:.3f}" if isinstance(v, float) else f"{k}: {v}" for k, v in result.items()))
@@ -0,0 +1,308 @@
+import sys
+import time
+
+import numpy as np
+
+from app.core.telemetry import TelemetryRecord
+
+SYNC = b"\xA5\x5A"
+PWM_TOP = 4095
+PAYLOAD_LENGTH = 27
+
+# Frame sent by CodeArduino.ino in binary mode (packed, little endian), see sendBinaryTelemetry
+FRAME_DTYPE = np.dtype([
+    ("sync", "u1", 2),
+    ("length", "u1"),
+    ("time", "<f4"),
+    ("adc", "<u2", 4), # ADC0..3 raw: t2, t4, t1, t3
+    ("pwm", "<u2"),
+    ("consigne", "<f4"),
+    ("t3_est", "<f4"),
+    ("error", "<f4"),
+    ("flags", "u1"), # bit 0: control loop on
+    ("crc", "<u2"),
+])
+FRAME_SIZE = FRAME_DTYPE.itemsize
+# The CRC covers the length byte and the payload
+CRC_START = 2
+CRC_END = FRAME_SIZE - 2
+
+
+def _crc_table():
+    """Table of the CRC-16/CCITT-FALSE (polynomial 0x1021) for every byte value
+    """
+    table = np.zeros(256, dtype=np.uint16)
+    for byte in range(256):
+        crc = byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else (crc << 1)
+        table[byte] = crc & 0xFFFF
+    return table
+
+
+CRC_TABLE = _crc_table()
+
+
+def crc16(rows):
+    """CRC-16/CCITT-FALSE of many byte strings of the same length at once
+
+    Args:
+        rows (np.array): uint8 array of shape (n, length)
+
+    Returns:
+        np.array: uint16 CRC of each row
+    """
+    crc = np.full(len(rows), 0xFFFF, dtype=np.uint16)
+    for column in rows.T:
+        crc = (crc << 8) ^ CRC_TABLE[(crc >> 8) ^ column]
+    return crc
+
+
+def voltage_to_temp_t1(volt):
+    """Steinhart-Hart conversion of the t1/t2 channels, same as voltage_to_tempt1 in the firmware
+
+    Args:
+        volt (np.array): ADC voltage [V]
+
+    Returns:
+        np.array: Temperature [°C]
+    """
+    return _steinhart_hart(volt * 0.32709 + 1.65306)
+
+
+def voltage_to_temp_t3(volt):
+    """Steinhart-Hart conversion of the t3/t4 channels, same as voltage_to_tempt3 in the firmware
+
+    Args:
+        volt (np.array): ADC voltage [V]
+
+    Returns:
+        np.array: Temperature [°C]
+    """
+    return _steinhart_hart(volt * 0.1599 + 2.0406)
+
+
+def _steinhart_hart(volt):
+    """Thermistor temperature from the conditioned voltage (10 kOhm NTC)
+    """
+    res = 5 * (10000 - 2000 * volt) / volt
+    log_val = np.log(10000.0 / res)
+    return 1.0 / (0.00335401643468053 + 0.000256523550896126 * log_val
+                  + 0.00000260597012072052 * log_val**2 + 0.000000063292612648746 * log_val**3) - 273.15
+
+
+def adc_to_volt(raw):
+    """ADC counts to volts, 10 bit ADC with a 5 V reference
+
+    Args:
+        raw (np.array): ADC counts
+
+    Returns:
+        np.array: Voltage [V]
+    """
+    return np.asarray(raw, dtype=np.float64) * (5.0 / 1023.0)
+
+
+def decode_frames(frames):
+    """Convert frames to physical values, vectorised over all the frames
+
+    Args:
+        frames (np.array): Structured array of FRAME_DTYPE
+
+    Returns:
+        dict: Columns "time", "pwm", "consigne", "t1", "t2", "t3", "t4", "t3_est", "error", "control_on"
+    """
+    volts = adc_to_volt(frames["adc"])
+    control_on = (frames["flags"] & 1).astype(bool)
+    return {
+        "time": frames["time"].astype(np.float64),
+        "pwm": frames["pwm"].astype(np.int64),
+        "consigne": np.where(control_on, frames["consigne"], np.nan),
+        "t1": voltage_to_temp_t1(volts[:, 2]),
+        "t2": voltage_to_temp_t1(volts[:, 0]),
+        "t3": voltage_to_temp_t3(volts[:, 3]),
+        "t4": voltage_to_temp_t3(volts[:, 1]),
+        "t3_est": frames["t3_est"].astype(np.float64),
+        "error": np.where(control_on, frames["error"], np.nan),
+        "control_on": control_on,
+    }
+
+
+def to_records(columns):
+    """Convert decoded columns to TelemetryRecord, to feed the same consumers as the text lines
+
+    Args:
+        columns (dict): Output of decode_frames
+
+    Returns:
+        list: TelemetryRecord per frame
+    """
+    names = ("time", "pwm", "consigne", "t1", "t2", "t3", "t4", "t3_est", "error", "control_on")
+    return [
+        TelemetryRecord(t, int(pwm), PWM_TOP, c, t1, t2, t3, t4, est, err, bool(on))
+        for t, pwm, c, t1, t2, t3, t4, est, err, on in zip(*(columns[n].tolist() for n in names))
+    ]
+
+
+def encode_frames(time_s, adc, pwm, consigne, t3_est, error, control_on):
+    """Build frames exactly like the firmware, used by the emulator and the tests
+
+    Args:
+        time_s (array): Time of each sample [s]
+        adc (array): Raw ADC counts, shape (n, 4) in channel order (t2, t4, t1, t3)
+        pwm (array): PWM compare value
+        consigne (array): Setpoint [°C]
+        t3_est (array): Estimated t3 [°C]
+        error (array): Control error [°C]
+        control_on (array): Control loop state
+
+    Returns:
+        bytes: Concatenated frames
+    """
+    time_s = np.atleast_1d(time_s)
+    frames = np.zeros(len(time_s), dtype=FRAME_DTYPE)
+    frames["sync"] = np.frombuffer(SYNC, dtype=np.uint8)
+    frames["length"] = PAYLOAD_LENGTH
+    frames["time"] = time_s
+    frames["adc"] = np.reshape(adc, (len(time_s), 4))
+    frames["pwm"] = pwm
+    frames["consigne"] = consigne
+    frames["t3_est"] = t3_est
+    frames["error"] = error
+    frames["flags"] = np.asarray(control_on, dtype=np.uint8)
+    raw = frames.view(np.uint8).reshape(len(frames), FRAME_SIZE)
+    frames["crc"] = crc16(raw[:, CRC_START:CRC_END])
+    return frames.tobytes()
+
+
+class BinaryFrameDecoder:
+    """Find and check the binary frames in a byte stream. The firmware still sends text in binary mode
+    (command echoes such as "New P parameter received"), the bytes outside the frames are returned as text lines.
+    Partial frames and lines are kept until the next feed.
+    """
+    def __init__(self):
+        self.buffer = b""
+        self.frames_ok = 0
+        self.crc_errors = 0
+
+    def feed(self, data):
+        """Add received bytes and extract the complete frames and text lines
+
+        Args:
+            data (bytes): Bytes read from the serial port
+
+        Returns:
+            tuple: (structured array of FRAME_DTYPE, list of text lines)
+        """
+        buf = self.buffer + data
+        raw = np.frombuffer(buf, dtype=np.uint8)
+        starts = np.flatnonzero((raw[:-1] == 0xA5) & (raw[1:] == 0x5A))
+        complete = starts[starts + FRAME_SIZE <= len(raw)]
+        complete = complete[raw[complete + 2] == PAYLOAD_LENGTH]
+
+        invalid = complete[:0]
+        if len(complete):
+            rows = raw[complete[:, None] + np.arange(FRAME_SIZE)]
+            crc = rows[:, CRC_END].astype(np.uint16) | (rows[:, CRC_END + 1].astype(np.uint16) << 8)
+            valid = crc16(rows[:, CRC_START:CRC_END]) == crc
+            self.crc_errors += int(np.count_nonzero(~valid))
+            invalid = complete[~valid]
+            complete = complete[valid]
+            rows = rows[valid]
+            # A valid frame cannot start inside the previous one
+            keep = np.ones(len(complete), dtype=bool)
+            keep[1:] = np.diff(complete) >= FRAME_SIZE
+            complete = complete[keep]
+            rows = rows[keep]
+        else:
+            rows = np.empty((0, FRAME_SIZE), dtype=np.uint8)
+
+        # Candidates with a bad CRC are not frames, resynchronise after their sync bytes
+        boundaries = sorted([(s, FRAME_SIZE) for s in complete.tolist()] + [(s, 2) for s in invalid.tolist()])
+        lines = []
+        position = 0
+        for start, size in boundaries:
+            if start < position:
+                continue
+            lines.extend(self.__text_lines(buf[position:start]))
+            position = start + size
+
+        # The tail may hold the beginning of a frame or of a line
+        tail = buf[position:]
+        pending = [s - position for s in starts.tolist() if s >= position and s + FRAME_SIZE > len(raw)]
+        if pending:
+            lines.extend(self.__text_lines(tail[:pending[0]]))
+            self.buffer = tail[pending[0]:]
+        else:
+            if tail.endswith(b"\xA5"):
+                tail, last = tail[:-1], b"\xA5"
+            else:
+                last = b""
+            cut = tail.rfind(b"\n") + 1
+            lines.extend(self.__text_lines(tail[:cut]))
+            self.buffer = tail[cut:] + last
+
+        self.frames_ok += len(rows)
+        frames = np.frombuffer(rows.tobytes(), dtype=FRAME_DTYPE) if len(rows) else np.empty(0, dtype=FRAME_DTYPE)
+        return frames, lines
+
+    def __text_lines(self, data):
+        """Split the text bytes between frames into lines, lines holding binary garbage are dropped
+        """
+        if not data:
+            return []
+        text = data.decode("ascii", errors="ignore")
+        lines = (line.strip() for line in text.splitlines())
+        return [line for line in lines if line and line.replace("\t", " ").isprintable()]
+
+
+def benchmark_decoder(n=100000, chunk=4096, port_url="loop://"):
+    """Send frames through a loopback serial port and decode them
+
+    Args:
+        n (int, optional): Number of frames. Defaults to 100000.
+        chunk (int, optional): Bytes read at once. Defaults to 4096.
+        port_url (str, optional): pyserial URL of the loopback device. Defaults to "loop://".
+
+    Returns:
+        dict: Frames decoded, decoded frames per second (decoding time only, the loopback itself is slow)
+            and the largest temperature difference to the reference conversion
+    """
+    import serial
+
+    rng = np.random.default_rng(0)
+    adc = rng.integers(300, 700, size=(n, 4))
+    data = encode_frames(np.arange(n) * 1e-3, adc, rng.integers(0, PWM_TOP, n), 25.0, 25.0, 0.0, True)
+    # Command echoes mixed with the frames
+    data = data[:len(data) // 2] + b"New P parameter received: 1.0\r\n" + data[len(data) // 2:]
+
+    decoder = BinaryFrameDecoder()
+    port = serial.serial_for_url(port_url, timeout=0)
+    received = []
+    texts = []
+    elapsed = 0.0
+    for offset in range(0, len(data), chunk):
+        port.write(data[offset:offset + chunk])
+        received_bytes = port.read(port.in_waiting)
+        start = time.perf_counter()
+        frames, lines = decoder.feed(received_bytes)
+        received.append(decode_frames(frames)["t1"])
+        elapsed += time.perf_counter() - start
+        texts.extend(lines)
+    port.close()
+
+    t1 = np.concatenate(received)
+    reference = voltage_to_temp_t1(adc_to_volt(adc[:, 2]))
+    return {
+        "frames": len(t1),
+        "frames_per_s": len(t1) / elapsed,
+        "text_lines": texts,
+        "crc_errors": decoder.crc_errors,
+        "max_error": float(np.max(np.abs(t1 - reference))) if len(t1) == n else float("nan"),
+    }
+
+
+if __name__ == "__main__":
+    result = benchmark_decoder(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
+    for name, value in result.items():
+        print(f"{name}: {value}")
@@ -0,0 +1,264 @@
+import math
+from collections import deque
+
+from app.core.ring_buffer import RollingExtrema
+
+NAN = float("nan")
+
+
+class WindowStats:
+    """Minimum, maximum and mean of the last `window` values, O(1) per value
+    (monotonic deques for the extrema, running sum for the mean)
+    """
+    def __init__(self, window):
+        """Initialize the statistics
+
+        Args:
+            window (int): Number of values in the window
+        """
+        self.window = window
+        self.extrema = RollingExtrema(window)
+        self.values = deque()
+        self.total = 0.0
+        self.count = 0 # values added since the last clear
+
+    def append(self, value):
+        """Add a value, the oldest one leaves the window when it is full
+
+        Args:
+            value (float): New value
+        """
+        self.extrema.append(value)
+        self.values.append(value)
+        self.total += value
+        self.count += 1
+        if len(self.values) > self.window:
+            self.total -= self.values.popleft()
+
+    def __len__(self):
+        return len(self.values)
+
+    def min(self):
+        """Smallest value of the window
+        """
+        return self.extrema.min()
+
+    def max(self):
+        """Largest value of the window
+        """
+        return self.extrema.max()
+
+    def spread(self):
+        """Difference between the largest and smallest value of the window
+        """
+        return self.extrema.max() - self.extrema.min()
+
+    def mean(self):
+        """Average of the window
+        """
+        return self.total / len(self.values) if self.values else NAN
+
+    def clear(self):
+        """Remove every value
+        """
+        self.extrema.clear()
+        self.values.clear()
+        self.total = 0.0
+        self.count = 0
+
+
+class StepResponse:
+    """Performance of the response to one setpoint change, updated one sample at a time.
+    Rise time is measured between 10 % and 90 % of the step, overshoot beyond the setpoint in the direction
+    of the step, and settling time is the time after which the value entered the band and never left it.
+    """
+    def __init__(self, setpoint, start_time, start_value, band):
+        """Start the step
+
+        Args:
+            setpoint (float): New setpoint [°C]
+            start_time (float): Time of the first sample after the change [s]
+            start_value (float): Value at the change [°C]
+            band (float): Half width of the settling band [°C]
+        """
+        self.setpoint = setpoint
+        self.start_time = start_time
+        self.start_value = start_value
+        self.band = band
+        step = setpoint - start_value
+        self.direction = 1.0 if step >= 0 else -1.0
+        self.amplitude = abs(step)
+        self.low_crossing = start_value + 0.1 * step
+        self.high_crossing = start_value + 0.9 * step
+
+        self.time_10 = None
+        self.time_90 = None
+        self.peak = 0.0
+        self.entered_band = None
+        self.iae = 0.0
+        self.ise = 0.0
+        self.time_in_zone = 0.0
+        self.last_time = start_time
+        self.samples = 0
+
+    def update(self, time_s, value):
+        """Add a sample
+
+        Args:
+            time_s (float): Time of the sample [s]
+            value (float): Controlled temperature [°C]
+        """
+        dt = max(time_s - self.last_time, 0.0)
+        self.last_time = time_s
+        self.samples += 1
+        error = self.setpoint - value
+
+        self.iae += abs(error) * dt
+        self.ise += error * error * dt
+        in_band = abs(error) <= self.band
+        if in_band:
+            self.time_in_zone += dt
+            if self.entered_band is None:
+                self.entered_band = time_s
+        else:
+            self.entered_band = None
+
+        progress = self.direction * value
+        if self.time_10 is None and progress >= self.direction * self.low_crossing:
+            self.time_10 = time_s
+        if self.time_90 is None and progress >= self.direction * self.high_crossing:
+            self.time_90 = time_s
+        self.peak = max(self.peak, -self.direction * error)
+
+    @property
+    def rise_time(self):
+        """Time between 10 % and 90 % of the step, NaN until reached
+        """
+        if self.time_10 is None or self.time_90 is None or self.amplitude == 0:
+            return NAN
+        return self.time_90 - self.time_10
+
+    @property
+    def overshoot(self):
+        """Largest excursion beyond the setpoint [°C]
+        """
+        return self.peak
+
+    @property
+    def overshoot_percent(self):
+        """Overshoot relative to the step amplitude [%]
+        """
+        return 100.0 * self.peak / self.amplitude if self.amplitude else NAN
+
+    @property
+    def settling_time(self):
+        """Time from the change until the value stayed in the band, NaN while it is out of the band
+        """
+        return self.entered_band - self.start_time if self.entered_band is not None else NAN
+
+    def summary(self):
+        """Metrics of the step
+
+        Returns:
+            dict: setpoint, start_time, rise_time, overshoot, overshoot_percent, settling_time, iae, ise, time_in_zone
+        """
+        return {
+            "setpoint": self.setpoint,
+            "start_time": self.start_time,
+            "rise_time": self.rise_time,
+            "overshoot": self.overshoot,
+            "overshoot_percent": self.overshoot_percent,
+            "settling_time": self.settling_time,
+            "iae": self.iae,
+            "ise": self.ise,
+            "time_in_zone": self.time_in_zone,
+        }
+
+
+class ControlMetrics:
+    """Streaming control performance of the prototype. Every sample updates the windowed statistics
+    of the controlled temperature and the response to the current setpoint in O(1).
+    A setpoint change (set_setpoint) starts a new StepResponse at the next sample, the previous ones are kept in steps.
+    """
+    def __init__(self, band=0.8, stability_window=20, mean_window=30):
+        """Initialize the metrics
+
+        Args:
+            band (float, optional): Half width of the precision band [°C]. Defaults to 0.8.
+            stability_window (int, optional): Samples of the stability check (max - min). Defaults to 20.
+            mean_window (int, optional): Samples of the moving average. Defaults to 30.
+        """
+        self.band = band
+        self.stability = WindowStats(stability_window)
+        self.average = WindowStats(mean_window)
+        self.steps = []
+        self.current = None
+        self.pending_setpoint = None
+        self.last_value = NAN
+
+    def set_setpoint(self, setpoint):
+        """Start the response to a new setpoint at the next sample
+
+        Args:
+            setpoint (float): New setpoint [°C]
+        """
+        self.pending_setpoint = float(setpoint)
+
+    def update(self, time_s, value):
+        """Add a sample of the controlled temperature
+
+        Args:
+            time_s (float): Time of the sample [s]
+            value (float): Controlled temperature [°C]
+        """
+        if math.isnan(value):
+            return
+        if self.pending_setpoint is not None:
+            start_value = self.last_value if not math.isnan(self.last_value) else value
+            self.current = StepResponse(self.pending_setpoint, time_s, start_value, self.band)
+            self.steps.append(self.current)
+            self.pending_setpoint = None
+        self.last_value = value
+        self.stability.append(value)
+        self.average.append(value)
+        if self.current is not None:
+            self.current.update(time_s, value)
+
+    def reset(self):
+        """Forget every sample and step
+        """
+        self.stability.clear()
+        self.average.clear()
+        self.steps = []
+        self.current = None
+        self.pending_setpoint = None
+        self.last_value = NAN
+
+    def summary(self):
+        """Current metrics
+
+        Returns:
+            dict: Windowed min/max/mean/spread of the temperature and the metrics of the current step (NaN without step)
+        """
+        result = {
+            "min": self.stability.min(),
+            "max": self.stability.max(),
+            "spread": self.stability.spread(),
+            "mean": self.average.mean(),
+        }
+        if self.current is not None:
+            result.update(self.current.summary())
+        return result
+
+    def status_text(self):
+        """Short description of the current step for the UI
+
+        Returns:
+            string: Metrics text
+        """
+        if self.current is None:
+            return "Metrics: no setpoint sent"
+        s = self.current.summary()
+        return (f"Metrics (consigne {s['setpoint']:.2f}): rise {s['rise_time']:.1f} s | "
+                f"overshoot {s['overshoot']:.2f} °C | settling {s['settling_time']:.1f} s | "
+                f"IAE {s['iae']:.1f} | ISE {s['ise']:.1f} | in zone {s['time_in_zone']:.0f} s")
@@ -0,0 +1,304 @@
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+THERMISTORS = ("t1", "t2", "t3")
+
+
+def _step_numpy(plate, duration):
+    """Advance a plate with update_plate_with_numpy, the scheme of the simulator window
+    """
+    end = plate.current_time + duration - plate.dt / 2
+    while plate.current_time < end:
+        plate.update_plate_with_numpy()
+
+
+def _step_advance(plate, duration):
+    """Advance a plate with Plate.advance, the scheme of the digital twin and the emulator
+    """
+    plate.advance(duration)
+
+
+# Integrators compared by the harness: name -> (plate class, function advancing a plate by a duration [s])
+MODES = {
+    "explicit2d": ("app.core.plate_transmission.Plate", _step_numpy),
+    "explicit2d-advance": ("app.core.plate_transmission.Plate", _step_advance),
+    "implicit3d": ("app.core.layered_plate.LayeredPlate", _step_advance),
+}
+# Modes whose extrapolation scores every mode, preferred first: dt follows dx², so no time error is left in it
+REFERENCE_MODES = ("explicit2d", "explicit2d-advance")
+
+
+def _plate_class(path):
+    """Import a plate class from its dotted path
+    """
+    module, name = path.rsplit(".", 1)
+    return getattr(__import__(module, fromlist=[name]), name)
+
+
+def run_case(kwargs, n, mode, sample_times, options=None):
+    """Simulate a config at one mesh size and read the thermistors at the sample times
+
+    Args:
+        kwargs (dict): Plate arguments (plate_kwargs of a config), n is replaced
+        n (int): Number of elements along X
+        mode (string): Key of MODES
+        sample_times (np.array): Times of the readings [s], increasing
+        options (dict, optional): Other arguments of the plate class of the mode. Defaults to None.
+
+    Returns:
+        dict: n, mode, dx [m], dt [s], wall time [s] and thermistor readings (samples x 3) [°C]
+    """
+    path, step = MODES[mode]
+    plate = _plate_class(path)(**dict(kwargs, n=n), **(options or {}))
+    readings = np.empty((len(sample_times), 3))
+    start = time.perf_counter()
+    for k, sample_time in enumerate(sample_times):
+        step(plate, sample_time - plate.current_time)
+        readings[k] = plate.read_thermistors()
+    wall_time = time.perf_counter() - start
+    return {"n": n, "mode": mode, "dx": plate.dx, "dt": plate.dt, "wall_time": wall_time, "readings": readings}
+
+
+def observed_order(values, spacings):
+    """Order p of convergence seen on three meshes, from value = exact + C h^p
+
+    Args:
+        values (list): Value on the three meshes, coarsest first
+        spacings (list): Mesh spacing h of the three meshes, decreasing
+
+    Returns:
+        float: p, nan if the three values do not converge monotonically
+    """
+    (f1, f2, f3), (h1, h2, h3) = values, spacings
+    if f1 == f2 or f2 == f3 or (f1 - f2) * (f2 - f3) <= 0:
+        return math.nan
+    target = (f1 - f2) / (f2 - f3)
+
+    def ratio(p):
+        return (h1**p - h2**p) / (h2**p - h3**p)
+
+    low, high = 0.05, 8.0
+    if not ratio(low) <= target <= ratio(high):
+        return math.nan
+    for _ in range(60):
+        middle = (low + high) / 2
+        if ratio(middle) < target:
+            low = middle
+        else:
+            high = middle
+    return (low + high) / 2
+
+
+def richardson(coarse, fine, h_coarse, h_fine, order=2.0):
+    """Richardson extrapolation of the two finest solutions to h = 0
+
+    Args:
+        coarse (np.array): Solution on the coarser mesh
+        fine (np.array): Solution on the finer mesh
+        h_coarse (float): Spacing of the coarser mesh
+        h_fine (float): Spacing of the finer mesh
+        order (float, optional): Order of the scheme. Defaults to 2.0 (second order in space, dt follows dx²).
+
+    Returns:
+        np.array: Extrapolated solution
+    """
+    return fine + (fine - coarse) / ((h_coarse / h_fine)**order - 1)
+
+
+def analyse(runs, order=2.0, references=REFERENCE_MODES):
+    """Estimate the error of every run against one common reference, the Richardson extrapolation of the
+    first mode of `references` in the runs. The explicit modes refine dt with dx², so their extrapolation has
+    no time error left; a mode at a fixed dt or with another model (implicit3d) is scored against it too, and
+    its time and modelling errors show in its errors. Without a reference mode each mode is scored against its
+    own extrapolation, which only measures its mesh error.
+    The extrapolation uses the formal order of the scheme, the order observed on the three finest meshes is
+    reported per thermistor to show whether the ladder is in the asymptotic range: a thermistor on the heater
+    element reads a point source, whose temperature grows with N and never converges.
+
+    Args:
+        runs (list): Output of run_case, at least two mesh sizes per mode
+        order (float, optional): Order of the scheme used for the extrapolation. Defaults to 2.0.
+        references (tuple, optional): Modes whose extrapolation may be the common reference, preferred first.
+                                      Defaults to REFERENCE_MODES.
+
+    Returns:
+        dict: mode -> {"runs": runs sorted by n with "errors" (max over time per thermistor) [°C],
+                       "observed_order": order per thermistor, "reference": mode of the reference}
+    """
+    ladders = {}
+    for mode in dict.fromkeys(run["mode"] for run in runs):
+        ladder = sorted((run for run in runs if run["mode"] == mode), key=lambda run: run["n"])
+        if len(ladder) < 2:
+            print(f"[WARN] {mode}: at least two mesh sizes are needed for an error estimate")
+            continue
+        ladders[mode] = ladder
+    extrapolations = {mode: richardson(ladder[-2]["readings"], ladder[-1]["readings"], ladder[-2]["dx"], ladder[-1]["dx"], order)
+                      for mode, ladder in ladders.items()}
+    common = next((mode for mode in references if mode in ladders), None)
+    if common is None and len(ladders) > 1:
+        print(f"[WARN] None of {', '.join(references)} was run, each mode is scored against its own extrapolation "
+              f"and the errors of different modes are not comparable")
+
+    result = {}
+    for mode, ladder in ladders.items():
+        reference_mode = common or mode
+        for run in ladder:
+            run["errors"] = np.abs(run["readings"] - extrapolations[reference_mode]).max(axis=0)
+        orders = [math.nan] * 3
+        if len(ladder) >= 3:
+            finest = ladder[-3:]
+            spacings = [run["dx"] for run in finest]
+            # Order seen on the readings at the end of the run, where the field has developed
+            orders = [observed_order([run["readings"][-1, k] for run in finest], spacings) for k in range(3)]
+        result[mode] = {"runs": ladder, "observed_order": orders, "reference": reference_mode}
+    return result
+
+
+def recommend(analysis, tolerance, thermistors=(0, 1, 2)):
+    """Cheapest run whose error is within the tolerance on the chosen thermistors
+
+    Args:
+        analysis (dict): Output of analyse
+        tolerance (float): Largest accepted error [°C]
+        thermistors (tuple, optional): Indices of the thermistors that must meet it. Defaults to all three.
+
+    Returns:
+        dict: The run (n, mode, wall_time, errors...), None if no run meets the tolerance
+    """
+    candidates = [run for mode in analysis.values() for run in mode["runs"]
+                  if max(run["errors"][k] for k in thermistors) <= tolerance]
+    return min(candidates, key=lambda run: run["wall_time"]) if candidates else None
+
+
+def plot(analysis, tolerance, thermistors, path):
+    """Plot wall time against thermistor error, one line per mode and the tolerance
+
+    Args:
+        analysis (dict): Output of analyse
+        tolerance (float): Tolerance [°C]
+        thermistors (tuple): Indices of the thermistors counted in the error
+        path (string): PNG file
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=(8, 5))
+    FigureCanvasAgg(figure)
+    ax = figure.add_subplot(111)
+    for mode, data in analysis.items():
+        times = [run["wall_time"] for run in data["runs"]]
+        errors = [max(max(run["errors"][k] for k in thermistors), 1e-6) for run in data["runs"]]
+        ax.loglog(times, errors, "o-", label=mode)
+        for run, wall_time, error in zip(data["runs"], times, errors):
+            ax.annotate(f"N={run['n']}", (wall_time, error), textcoords="offset points", xytext=(4, 4), fontsize=8)
+    ax.axhline(tolerance, color="gray", linestyle="--", label=f"tolerance {tolerance:g} °C")
+    ax.set_xlabel("Wall time [s]")
+    ax.set_ylabel(f"Max error of {', '.join(THERMISTORS[k] for k in thermistors)} [°C]")
+    ax.set_title("Accuracy versus cost")
+    ax.grid(True, which="both", alpha=0.3)
+    ax.legend()
+    figure.tight_layout()
+    figure.savefig(path, dpi=100)
+
+
+def print_report(analysis, best, tolerance, thermistors=(0, 1, 2)):
+    """Print the error table, the observed orders and the recommendation, its error over the chosen thermistors
+    """
+    print(f"{'mode':<20} {'N':>4} {'dt [ms]':>9} {'wall [s]':>9} " + " ".join(f"{'err ' + name:>9}" for name in THERMISTORS))
+    for mode, data in analysis.items():
+        for run in data["runs"]:
+            errors = " ".join(f"{error:>9.4f}" for error in run["errors"])
+            print(f"{mode:<20} {run['n']:>4} {1000 * run['dt']:>9.3f} {run['wall_time']:>9.2f} {errors}")
+        orders = ", ".join(f"{name} {order:.2f}" for name, order in zip(THERMISTORS, data["observed_order"]))
+        print(f"[INFO] {mode}: errors against the extrapolation of {data['reference']}, "
+              f"observed order on the three finest meshes: {orders}")
+        for name, order in zip(THERMISTORS, data["observed_order"]):
+            if not order >= 1.0:
+                print(f"[WARN] {mode}: {name} does not converge steadily on this ladder (order < 1 or not monotonic), "
+                      f"its error estimate is unreliable")
+    if best is None:
+        print(f"[WARN] No run is within {tolerance:g} °C, extend the ladder or exclude the thermistors that do not converge")
+    else:
+        print(f"[INFO] Cheapest setting within {tolerance:g} °C: N={best['n']} with {best['mode']} "
+              f"({best['wall_time']:.2f} s, max error {max(best['errors'][k] for k in thermistors):.4f} °C on "
+              f"{', '.join(THERMISTORS[k] for k in thermistors)})")
+
+
+def _export(analysis, best, tolerance, path):
+    """Write the results to a JSON file
+    """
+    runs = [{key: value for key, value in run.items() if key != "readings"}
+            for data in analysis.values() for run in data["runs"]]
+    for run in runs:
+        run["errors"] = [float(error) for error in run["errors"]]
+    with open(path, "w") as file:
+        json.dump({
+            "tolerance": tolerance,
+            "runs": runs,
+            "observed_order": {mode: data["observed_order"] for mode, data in analysis.items()},
+            "reference": {mode: data["reference"] for mode, data in analysis.items()},
+            "recommended": None if best is None else {"n": best["n"], "mode": best["mode"]},
+        }, file, indent=4)
+
+
+def main(argv):
+    """Run a config over a ladder of mesh sizes and modes and recommend the cheapest setting within a tolerance
+
+    Args:
+        argv (list): Command line arguments
+    """
+    from app.core.JSON_Handler import JsonHandler
+    from app.core.layered_plate import layered_kwargs
+    from app.core.plate_transmission import plate_kwargs
+
+    parser = argparse.ArgumentParser(description="Accuracy versus cost of the plate simulation over mesh sizes and modes")
+    parser.add_argument("--config", default="app/Configs/latest.json", help="Simulator config of the plate")
+    parser.add_argument("--sizes", default="10,15,20,30,45,60,90", help="Comma separated values of N, coarsest first")
+    parser.add_argument("--modes", default=",".join(MODES), help=f"Comma separated subset of {','.join(MODES)}")
+    parser.add_argument("--duration", type=float, default=None, help="Simulated time [s]. Defaults to the total time of the config.")
+    parser.add_argument("--samples", type=int, default=60, help="Thermistor readings compared over the run")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Accepted thermistor error [°C]")
+    parser.add_argument("--thermistors", default="1,2,3", help="Thermistors that must meet the tolerance")
+    parser.add_argument("--order", type=float, default=2.0, help="Order of the scheme for the Richardson extrapolation")
+    parser.add_argument("--out", default="data", help="Directory of the plot and the JSON results")
+    args = parser.parse_args(argv)
+
+    json_handler = JsonHandler()
+    if not json_handler.read_json_file(args.config):
+        sys.exit(1)
+    config = json_handler.get_data()
+    kwargs = plate_kwargs(config["plate"])
+    # The layered mode takes its layers, time step and faces from the solver section of the config
+    options = {"implicit3d": layered_kwargs(config.get("solver", {}), config["plate"])}
+    duration = args.duration or kwargs["total_time"]
+    kwargs["total_time"] = duration
+    sample_times = np.linspace(duration / args.samples, duration, args.samples)
+    thermistors = tuple(int(k) - 1 for k in args.thermistors.split(","))
+
+    runs = []
+    for mode in args.modes.split(","):
+        for n in sorted(int(n) for n in args.sizes.split(",")):
+            run = run_case(kwargs, n, mode, sample_times, options.get(mode))
+            print(f"[INFO] {mode} N={n}: {run['wall_time']:.2f} s")
+            runs.append(run)
+
+    analysis = analyse(runs, args.order)
+    best = recommend(analysis, args.tolerance, thermistors)
+    print_report(analysis, best, args.tolerance, thermistors)
+
+    os.makedirs(args.out, exist_ok=True)
+    prefix = os.path.join(args.out, f"convergence_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    plot(analysis, args.tolerance, thermistors, prefix + ".png")
+    _export(analysis, best, args.tolerance, prefix + ".json")
+    print(f"[INFO] Results written to {prefix}.png and {prefix}.json")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,197 @@
+import math
+import queue
+import threading
+import time
+from typing import NamedTuple
+
+import numpy as np
+
+from app.core.control_metrics import WindowStats
+from app.core.telemetry import pwm_to_command
+
+
+class TwinSample(NamedTuple):
+    """Measured and predicted thermistor temperatures at the time of a telemetry record [°C]
+    """
+    time: float
+    t1: float
+    t2: float
+    t3: float
+    twin_t1: float
+    twin_t2: float
+    twin_t3: float
+
+
+def command_to_power(record, full_power):
+    """Heater power of a record, proportional to the command U (100 % = full_power)
+
+    Args:
+        record (TelemetryRecord): Record
+        full_power (float): Power at a command of 100 % [W], negative if the heater cools with a positive command
+
+    Returns:
+        float: Power [W]
+    """
+    return pwm_to_command(record) / 100.0 * full_power
+
+
+class DigitalTwin(threading.Thread):
+    """Plate simulated in lockstep with the telemetry of the prototype.
+    Each record drives the twin: the plate is advanced to the time of the record with the power of the previous one
+    (the PWM holds between two samples), then the power of the record is applied and the thermistors are compared
+    with the measured t1..t3. The plate runs on this thread with Plate.advance, much faster than real time,
+    so it keeps up with the telemetry and catches up on its own after a pause or a backlog.
+    The plate starts from the measured temperatures (linear between the thermistors) and restarts
+    when the firmware time goes back (board reset).
+    """
+    def __init__(self, plate, full_power=None, residual_window=60, max_queue=10000):
+        """Initialize the twin, start it with start()
+
+        Args:
+            plate (Plate): Plate simulated, its heat source position is the heater
+            full_power (float, optional): Heater power at a command of 100 % [W]. Defaults to the power of the plate.
+            residual_window (int, optional): Samples of the running RMS residual. Defaults to 60.
+            max_queue (int, optional): Records waiting for the twin before new ones are dropped. Defaults to 10000.
+        """
+        super().__init__(daemon=True)
+        self.plate = plate
+        self.full_power = plate.power_in if full_power is None else full_power
+        self.inputs = queue.Queue(maxsize=max_queue)
+        self.outputs = queue.Queue()
+        self.square_residuals = [WindowStats(residual_window) for _ in range(3)]
+        self.residuals = [math.nan] * 3
+        self.origin = None
+        self.last_time = None
+        self.running = True
+
+        self.samples = 0
+        self.dropped = 0
+        self.restarts = 0
+        self.simulated = 0.0
+        self.cpu_time = 0.0
+
+    def feed(self, record):
+        """Hand a telemetry record to the twin, without waiting
+
+        Args:
+            record (TelemetryRecord): Record received from the prototype
+        """
+        try:
+            self.inputs.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def run(self):
+        """Step the twin on the records until stop is called
+        """
+        start_cpu = time.thread_time()
+        while self.running:
+            try:
+                record = self.inputs.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            try:
+                self.step(record)
+            except Exception as e:
+                print(f"[ERROR] Digital twin stopped: {e}")
+                break
+            self.cpu_time = time.thread_time() - start_cpu
+
+    def step(self, record):
+        """Advance the plate to a record and compare it with the measures
+
+        Args:
+            record (TelemetryRecord): Record received from the prototype
+
+        Returns:
+            TwinSample: Measured and predicted temperatures
+        """
+        measured = (record.t1, record.t2, record.t3)
+        if self.origin is None or record.time < self.last_time:
+            self.restart(record.time, measured)
+        self.last_time = record.time
+        duration = record.time - self.origin - self.plate.current_time
+        self.plate.advance(duration)
+        self.simulated += max(duration, 0.0)
+        self.plate.set_power(command_to_power(record, self.full_power))
+
+        predicted = self.plate.read_thermistors()
+        for k in range(3):
+            self.residuals[k] = measured[k] - predicted[k]
+            self.square_residuals[k].append(self.residuals[k] ** 2)
+        sample = TwinSample(record.time, *measured, *(float(v) for v in predicted))
+        self.outputs.put(sample)
+        self.samples += 1
+        return sample
+
+    def restart(self, time_s, measured):
+        """Restart the plate from measured temperatures
+
+        Args:
+            time_s (float): Firmware time of the measures [s]
+            measured (tuple): t1, t2, t3 [°C]
+        """
+        if self.origin is not None:
+            self.restarts += 1
+        plate = self.plate
+        positions = [index[0] for index in plate.thermistances_indices]
+        order = np.argsort(positions)
+        profile = np.interp(np.arange(plate.nx), np.take(positions, order), np.take(measured, order))
+        plate.temps[:] = profile[:, None] + 273
+        plate.current_time = 0
+        self.origin = time_s
+        for stats in self.square_residuals:
+            stats.clear()
+
+    def drain(self):
+        """Take the samples computed since the last call
+
+        Returns:
+            list: TwinSample, oldest first
+        """
+        samples = []
+        while True:
+            try:
+                samples.append(self.outputs.get_nowait())
+            except queue.Empty:
+                return samples
+
+    def rms_residuals(self):
+        """Running RMS of measured - predicted of each thermistor
+
+        Returns:
+            list: RMS residual of t1, t2, t3 [°C]
+        """
+        return [math.sqrt(stats.mean()) if len(stats) else math.nan for stats in self.square_residuals]
+
+    def stats(self):
+        """Counters of the twin
+
+        Returns:
+            dict: samples, backlog, dropped, restarts, CPU time [s] and speed (simulated seconds per CPU second)
+        """
+        return {
+            "samples": self.samples,
+            "backlog": self.inputs.qsize(),
+            "dropped": self.dropped,
+            "restarts": self.restarts,
+            "cpu_time": self.cpu_time,
+            "speed": self.simulated / self.cpu_time if self.cpu_time else math.nan,
+        }
+
+    def status_text(self):
+        """Short description for the UI
+
+        Returns:
+            string: Last and RMS residual of each thermistor, backlog and speed
+        """
+        rms = self.rms_residuals()
+        stats = self.stats()
+        parts = [f"T{k + 1} {self.residuals[k]:+.2f} (rms {rms[k]:.2f})" for k in range(3)]
+        return (f"Twin residual [°C]: {' | '.join(parts)} | backlog {stats['backlog']}"
+                f" | x{stats['speed']:.0f} real time")
+
+    def stop(self):
+        """Stop the thread after its current record
+        """
+        self.running = False
@@ -0,0 +1,182 @@
+import json
+import math
+import os
+
+import numpy as np
+
+COMPRESSIONS = ("float32", "float16", "delta")
+
+
+class FieldRecorder:
+    """Record snapshots of the whole temperature field every interval seconds of simulated time.
+    The snapshots go to a .npy file preallocated for the whole run and mapped in memory, so a snapshot
+    is a single array copy and nothing is kept in RAM. The snapshot times are kept in an index file.
+
+    Compression:
+        float32: temperatures as float32
+        float16: difference to the first snapshot as float16 (0.002 K of resolution within 2 K of it, 0.016 K within 32 K;
+                 absolute Kelvin would step by 0.25 K around 300 K)
+        delta: difference to the first snapshot quantised on int16 with a scale per snapshot
+    """
+    def __init__(self, directory, shape, total_time, interval, compression="float32"):
+        """Create the snapshot files
+
+        Args:
+            directory (string): Directory of the snapshot files, created if needed
+            shape (tuple): Shape of the temperature field
+            total_time (float): Duration of the run [s], used to preallocate the files
+            interval (float): Simulated time between two snapshots [s]
+            compression (str, optional): One of COMPRESSIONS. Defaults to "float32".
+
+        Raises:
+            ValueError: Invalid interval or compression
+        """
+        if interval <= 0:
+            raise ValueError("Snapshot interval must be positive")
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Snapshot compression must be one of {COMPRESSIONS}")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.shape = tuple(shape)
+        self.interval = interval
+        self.compression = compression
+        self.capacity = int(math.floor(total_time / interval)) + 2
+        self.count = 0
+        self.next_time = 0.0
+        self.reference = None
+
+        dtype = {"float32": np.float32, "float16": np.float16, "delta": np.int16}[compression]
+        self.fields = np.lib.format.open_memmap(os.path.join(directory, "field.npy"), mode="w+",
+                                                dtype=dtype, shape=(self.capacity,) + self.shape)
+        self.times = np.lib.format.open_memmap(os.path.join(directory, "field_times.npy"), mode="w+",
+                                               dtype=np.float64, shape=(self.capacity,))
+        self.times[:] = np.nan
+        if compression == "delta":
+            self.scales = np.lib.format.open_memmap(os.path.join(directory, "field_scales.npy"), mode="w+",
+                                                    dtype=np.float64, shape=(self.capacity, 2))
+        self.__write_meta()
+
+    def __write_meta(self):
+        """Write the description of the snapshot files
+        """
+        with open(os.path.join(self.directory, "field.json"), "w") as file:
+            json.dump({
+                "shape": list(self.shape),
+                "interval": self.interval,
+                "compression": self.compression,
+                "capacity": self.capacity,
+                "count": self.count,
+                "relative": self.compression in ("float16", "delta"),
+            }, file, indent=4)
+
+    def record(self, time, temps):
+        """Store a snapshot of the field
+
+        Args:
+            time (float): Simulated time of the snapshot [s]
+            temps (np.array): Temperature field [K]
+        """
+        if self.count >= self.capacity:
+            return
+        i = self.count
+        if self.compression != "float32" and self.reference is None:
+            self.reference = np.array(temps, dtype=np.float64)
+            np.save(os.path.join(self.directory, "field_reference.npy"), self.reference)
+        if self.compression == "float16":
+            self.fields[i] = temps - self.reference
+        elif self.compression == "delta":
+            delta = temps - self.reference
+            offset = 0.5 * (float(delta.max()) + float(delta.min()))
+            scale = max((float(delta.max()) - offset) / 32767.0, 1e-9)
+            self.fields[i] = np.rint((delta - offset) / scale)
+            self.scales[i] = (offset, scale)
+        else:
+            self.fields[i] = temps
+        self.times[i] = time
+        self.count += 1
+        self.next_time = self.count * self.interval
+
+    def close(self):
+        """Flush the snapshots to disk and store the number of snapshots taken
+        """
+        if self.fields is None:
+            return
+        self.fields.flush()
+        self.times.flush()
+        if self.compression == "delta":
+            self.scales.flush()
+        self.__write_meta()
+        self.fields = None
+
+
+class FieldRecording:
+    """Read the snapshots written by FieldRecorder. The files are mapped in memory, so opening a
+    recording is immediate and reading a snapshot only touches that snapshot on disk.
+    """
+    def __init__(self, directory):
+        """Open a recording
+
+        Args:
+            directory (string): Directory of the snapshot files
+        """
+        self.directory = directory
+        with open(os.path.join(directory, "field.json"), "r") as file:
+            self.meta = json.load(file)
+        self.compression = self.meta["compression"]
+        self.fields = np.load(os.path.join(directory, "field.npy"), mmap_mode="r")
+        times = np.load(os.path.join(directory, "field_times.npy"), mmap_mode="r")
+        # The count in field.json is only updated on close, a cut run is bounded by its last written time
+        valid = np.flatnonzero(~np.isnan(times))
+        self.count = int(valid[-1]) + 1 if len(valid) else 0
+        self.times = np.array(times[:self.count])
+        # float16 recordings made before "relative" hold absolute temperatures
+        self.reference = None
+        if self.count and self.meta.get("relative", self.compression == "delta"):
+            self.reference = np.load(os.path.join(directory, "field_reference.npy"))
+        if self.compression == "delta" and self.count:
+            self.scales = np.load(os.path.join(directory, "field_scales.npy"), mmap_mode="r")
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        """Decode one snapshot
+
+        Args:
+            index (int): Index of the snapshot
+
+        Returns:
+            np.array: Temperature field [K]
+        """
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("Snapshot index out of range")
+        if self.compression == "delta":
+            offset, scale = self.scales[index]
+            return self.reference + offset + self.fields[index].astype(np.float64) * scale
+        if self.reference is not None:
+            return self.reference + self.fields[index].astype(np.float64)
+        return self.fields[index].astype(np.float64)
+
+    def index_at(self, time):
+        """Index of the last snapshot taken at or before a time
+
+        Args:
+            time (float): Simulated time [s]
+
+        Returns:
+            int: Index of the snapshot
+        """
+        return max(0, min(self.count - 1, int(np.searchsorted(self.times, time, side="right")) - 1))
+
+    def at(self, time):
+        """Snapshot at or just before a time
+
+        Args:
+            time (float): Simulated time [s]
+
+        Returns:
+            np.array: Temperature field [K]
+        """
+        return self[self.index_at(time)]
@@ -0,0 +1,398 @@
+import argparse
+import os
+import re
+import select
+import socket
+import sys
+import threading
+import time
+
+import numpy as np
+
+from app.core.binary_telemetry import PWM_TOP, adc_to_volt, encode_frames, voltage_to_temp_t1, voltage_to_temp_t3
+from app.core.digital_twin import command_to_power
+from app.core.telemetry import TelemetryRecord, format_line
+
+F32 = np.float32
+ADC_CODES = np.arange(1024)
+# Temperature read for every ADC code, decreasing with the code (NTC)
+T1_TABLE = voltage_to_temp_t1(adc_to_volt(ADC_CODES))
+T3_TABLE = voltage_to_temp_t3(adc_to_volt(ADC_CODES))
+
+
+def temp_to_adc(temp, table):
+    """ADC code the firmware converts to the temperature closest to `temp`, 10 bit quantisation of the thermistor
+
+    Args:
+        temp (float): Temperature of the thermistor [°C]
+        table (np.array): T1_TABLE (t1/t2 channels) or T3_TABLE (t3/t4 channels)
+
+    Returns:
+        int: ADC code, 0 to 1023
+    """
+    index = int(np.searchsorted(-table, -temp))
+    if index == 0:
+        return 0
+    if index >= len(table):
+        return len(table) - 1
+    return index if abs(table[index] - temp) < abs(table[index - 1] - temp) else index - 1
+
+
+def _to_float(text):
+    """String.toFloat of Arduino: the leading number of the text, 0 if there is none
+    """
+    match = re.match(r"\s*[-+]?(\d+\.?\d*|\.\d+)", text)
+    return float(F32(match.group(0))) if match else 0.0
+
+
+class FirmwareEmulator:
+    """CodeArduino.ino running on the host, with a Plate in place of the prototype.
+    Commands (p, S, R, B, A, PARAM) give the same answers as the board, tick runs one Timer3 period:
+    the four channels are read from the plate thermistors with 10 bit quantisation, the t3 estimator and the PI law
+    run in float32 with their clamps, and the 4095 step PWM sets the heater power of the plate until the next sample.
+    Outputs are the bytes the board sends ("\\r\\n" line endings, binary frames in binary mode).
+    """
+    def __init__(self, plate, full_power=None, noise=0.0, period=1.0, seed=None):
+        """Initialize the board, call boot for the start message
+
+        Args:
+            plate (Plate): Plant, thermistors 1..3 are t1..t3 and t4 reads the ambient temperature
+            full_power (float, optional): Heater power at a command of 100 % [W]. Defaults to the power of the plate.
+            noise (float, optional): Standard deviation of the thermistor noise before quantisation [°C]. Defaults to 0.0.
+            period (float, optional): Timer3 period [s]. Defaults to 1.0 (DESIRED_ADC_UPDATE_FREQ).
+            seed (int, optional): Seed of the noise. Defaults to None.
+        """
+        self.plate = plate
+        self.full_power = plate.power_in if full_power is None else full_power
+        self.noise = noise
+        self.period = period
+        self.rng = np.random.default_rng(seed)
+        self.plate.set_power(0.0)
+
+        self.running = False
+        self.binary = False
+        self.consigne = F32(25)
+        self.P = F32(0.88)
+        self.I = F32(1 / 101.72)
+        self.D = F32(0)
+        self.F = F32(0)
+        self.previous_control = F32(0)
+        self.previous_error = F32(0)
+        self.previous_t2s = [F32(25)] * 3
+        self.previous_estimated_t3 = F32(-1)
+        self.update_count = 0
+        self.pwm = PWM_TOP // 2
+        self.input = b""
+
+    def boot(self):
+        """Start message printed by setup()
+
+        Returns:
+            bytes: Output of the board
+        """
+        return self.__println(
+            "Mega2560 started with split timers:",
+            f"PWM Frequency (Timer1): {16000000 // (8 * (PWM_TOP + 1))} Hz (using full 16-bit resolution)",
+            f"ADC Update Frequency (Timer3): {1 / self.period:.2f} Hz",
+            "Enter commands:",
+            "  p    -> start control loop",
+            "  S    -> stop control loop",
+            "  R    -> reset and new parameters",
+            "  B    -> binary telemetry, A -> text telemetry",
+            "  PARAM C=2.5 F=1.0  -> set parameters (C = setpoint, F = frequency)",
+        )
+
+    def receive(self, data):
+        """Bytes received on the serial port, every complete line is handled
+
+        Args:
+            data (bytes): Received bytes
+
+        Returns:
+            bytes: Output of the board
+        """
+        self.input += data
+        *lines, self.input = self.input.split(b"\n")
+        output = b""
+        for line in lines:
+            line = line.decode("ascii", errors="ignore").strip()
+            if line:
+                output += self.handle_line(line)
+        return output
+
+    def handle_line(self, line):
+        """handleLine of the firmware
+
+        Args:
+            line (string): Command, trimmed
+
+        Returns:
+            bytes: Output of the board
+        """
+        if line.lower() == "p":
+            self.running = True
+            return self.__println("Control loop ON")
+        if line.lower() == "s":
+            self.running = False
+            return self.__println("Control loop OFF")
+        if line.lower() == "r":
+            self.running = False
+            self.previous_control = F32(0)
+            return b""
+        if line == "B":
+            self.binary = True
+            return self.__println("Binary telemetry ON")
+        if line == "A":
+            self.binary = False
+            return self.__println("Binary telemetry OFF")
+        if line.startswith("PARAM"):
+            return self.parse_parameters(line)
+        return self.__println(f"Unknown command or format: {line}")
+
+    def parse_parameters(self, line):
+        """parseParameters of the firmware
+
+        Args:
+            line (string): PARAM command
+
+        Returns:
+            bytes: Output of the board
+        """
+        if " " not in line:
+            return self.__println("Invalid PARAM syntax. Use: PARAM C=... P=... I=... D=... F=...")
+        output = []
+        for token in line.split(" ", 1)[1].split(" "):
+            name, _, value = token.partition("=")
+            if not _ or name not in ("C", "P", "I", "D", "F"):
+                continue
+            if name == "C":
+                self.consigne = F32(_to_float(value))
+                continue
+            setattr(self, name, F32(_to_float(value)))
+            output.append(f"New {name} parameter received: {float(getattr(self, name)):.10f}")
+        output.append(f"New setpoint (consigne) -> {float(self.consigne):.2f}")
+        return self.__println(*output)
+
+    def read_adc(self):
+        """Convert the four channels from the plate
+
+        Returns:
+            list: ADC codes of the channels 0..3 (t2, t4, t1, t3)
+        """
+        t1, t2, t3 = (float(t) for t in self.plate.read_thermistors())
+        t4 = self.plate.ambient_temp - 273
+        if self.noise:
+            t1, t2, t3, t4 = np.array([t1, t2, t3, t4]) + self.rng.normal(0.0, self.noise, 4)
+        return [temp_to_adc(t2, T1_TABLE), temp_to_adc(t4, T3_TABLE), temp_to_adc(t1, T1_TABLE), temp_to_adc(t3, T3_TABLE)]
+
+    def tick(self):
+        """One Timer3 period: sample, estimator, control law and telemetry, then the plate runs until the next sample
+
+        Returns:
+            bytes: Output of the board
+        """
+        output = self.sample()
+        self.plate.advance(self.period)
+        self.update_count += 1
+        return output
+
+    def sample(self):
+        """Body of loop() when a sample is ready
+
+        Returns:
+            bytes: Telemetry of the sample
+        """
+        adc = self.read_adc()
+        true_time = self.update_count * self.period
+        temp_t2 = F32(T1_TABLE[adc[0]])
+        if self.previous_estimated_t3 < 0:
+            self.previous_estimated_t3 = temp_t2
+        estimated = (F32(0.04431) * (self.previous_t2s[0] - F32(25))
+                     + F32(0.9519) * (self.previous_estimated_t3 - F32(25))) + F32(25)
+        self.previous_estimated_t3 = estimated
+        self.previous_t2s = [temp_t2] + self.previous_t2s[:2]
+
+        error = F32(0)
+        if self.running:
+            error = self.consigne - estimated
+            control = (self.previous_control + error * (self.I / F32(2) + self.P)
+                       + self.previous_error * (self.I / F32(2) - self.P))
+            control = min(max(control, F32(-2.5)), F32(2.5))
+            self.previous_control = control
+            # Operation point and anti-windup
+            control = min(max(control + F32(2.5), F32(0.1)), F32(4.9))
+            control = F32(5) - control
+            self.previous_error = error
+            self.pwm = int((control - F32(0.1)) / F32(4.8) * F32(PWM_TOP))
+        else:
+            self.pwm = PWM_TOP // 2
+
+        record = TelemetryRecord(
+            true_time, self.pwm, PWM_TOP, float(self.consigne) if self.running else float("nan"),
+            float(T1_TABLE[adc[2]]), float(temp_t2), float(T3_TABLE[adc[3]]), float(T3_TABLE[adc[1]]),
+            float(estimated), float(error) if self.running else float("nan"), self.running,
+        )
+        self.plate.set_power(command_to_power(record, self.full_power))
+        if self.binary:
+            return encode_frames(true_time, [adc], self.pwm, self.consigne, estimated, error, self.running)
+        return self.__println(format_line(record))
+
+    @staticmethod
+    def __println(*lines):
+        """Serial.println of each line
+        """
+        return "".join(line + "\r\n" for line in lines).encode("ascii")
+
+
+class VirtualDevice(threading.Thread):
+    """Serial device served by a FirmwareEmulator, opened by the monitor like the board.
+    On POSIX it is a pseudo terminal (device is its path, e.g. /dev/pts/3), otherwise or when socket_port is given
+    a local TCP server (device is "socket://127.0.0.1:<port>"). Samples are produced every period / speed seconds
+    of wall time; when nobody reads the device the output is dropped like on an unplugged board.
+    """
+    def __init__(self, emulator, speed=1.0, socket_port=None):
+        """Open the device, start the board with start()
+
+        Args:
+            emulator (FirmwareEmulator): Board
+            speed (float, optional): Time acceleration (simulated seconds per second). Defaults to 1.0.
+            socket_port (int, optional): TCP port instead of a pseudo terminal, 0 for any. Defaults to None.
+        """
+        super().__init__(daemon=True)
+        self.emulator = emulator
+        self.speed = speed
+        self.running = True
+        self.samples = 0
+        self.bytes_dropped = 0
+        self.achieved_speed = 0.0
+        self.master = self.slave = self.server = self.client = None
+        if socket_port is None and os.name == "posix":
+            import tty
+            self.master, self.slave = os.openpty()
+            tty.setraw(self.master)
+            tty.setraw(self.slave)
+            os.set_blocking(self.master, False)
+            self.device = os.ttyname(self.slave)
+        else:
+            self.server = socket.create_server(("127.0.0.1", socket_port or 0))
+            self.server.setblocking(False)
+            self.device = f"socket://127.0.0.1:{self.server.getsockname()[1]}"
+
+    def run(self):
+        """Run the board until stop is called
+        """
+        self.write(self.emulator.boot())
+        interval = self.emulator.period / self.speed
+        next_sample = time.monotonic()
+        start = next_sample
+        while self.running:
+            data = self.read(max(0.0, next_sample - time.monotonic()))
+            if data:
+                self.write(self.emulator.receive(data))
+            now = time.monotonic()
+            if now >= next_sample:
+                self.write(self.emulator.tick())
+                self.samples += 1
+                # Do not try to catch up more than a second of samples when the plate is slower than the speed asked
+                next_sample = max(next_sample + interval, now - 1.0)
+        self.achieved_speed = self.samples * self.emulator.period / max(time.monotonic() - start, 1e-9)
+
+    def read(self, timeout):
+        """Wait up to `timeout` seconds for bytes from the monitor
+
+        Returns:
+            bytes: Received bytes
+        """
+        if self.master is not None:
+            ready, _, _ = select.select([self.master], [], [], timeout)
+            try:
+                return os.read(self.master, 4096) if ready else b""
+            except OSError:
+                return b""
+        sockets = [self.client] if self.client is not None else [self.server]
+        ready, _, _ = select.select(sockets, [], [], timeout)
+        if not ready:
+            return b""
+        if self.client is None:
+            self.client, _ = self.server.accept()
+            self.client.setblocking(False)
+            return b""
+        try:
+            data = self.client.recv(4096)
+        except BlockingIOError:
+            return b""
+        except OSError:
+            data = b""
+        if not data:
+            self.client.close()
+            self.client = None
+        return data
+
+    def write(self, data):
+        """Send bytes to the monitor, what does not fit in the device buffer is dropped
+        """
+        view = memoryview(data)
+        while view:
+            try:
+                if self.master is not None:
+                    written = os.write(self.master, view)
+                elif self.client is not None:
+                    written = self.client.send(view)
+                else:
+                    written = 0
+            except (BlockingIOError, OSError):
+                written = 0
+            if written == 0:
+                self.bytes_dropped += len(view)
+                return
+            view = view[written:]
+
+    def stop(self):
+        """Stop the board and close the device
+        """
+        self.running = False
+        if self.is_alive():
+            self.join()
+        for fd in (self.master, self.slave):
+            if fd is not None:
+                os.close(fd)
+        for sock in (self.client, self.server):
+            if sock is not None:
+                sock.close()
+
+
+def main(argv):
+    """Serve an emulated board until Ctrl+C
+
+    Args:
+        argv (list): Command line arguments
+    """
+    from app.core.JSON_Handler import JsonHandler
+    from app.core.plate_transmission import Plate, plate_kwargs
+
+    parser = argparse.ArgumentParser(description="Emulator of CodeArduino.ino with the simulated plate as prototype")
+    parser.add_argument("--speed", type=float, default=1.0, help="Time acceleration")
+    parser.add_argument("--socket", type=int, default=None, help="Serve on a TCP port instead of a pseudo terminal")
+    parser.add_argument("--config", default="app/Configs/latest.json", help="Simulator config of the plate")
+    parser.add_argument("--full-power", type=float, default=None, help="Heater power at U=100%% [W]")
+    parser.add_argument("--noise", type=float, default=0.0, help="Thermistor noise [°C]")
+    args = parser.parse_args(argv)
+
+    json_handler = JsonHandler()
+    if not json_handler.read_json_file(args.config):
+        sys.exit(1)
+    plate = Plate(**plate_kwargs(json_handler.get_data()["plate"]))
+    device = VirtualDevice(FirmwareEmulator(plate, args.full_power, args.noise), args.speed, args.socket)
+    print(f"[INFO] Emulated board on {device.device}, open it with: python Serial_monitor.py {device.device}")
+    device.start()
+    try:
+        while device.is_alive():
+            device.join(1.0)
+    except KeyboardInterrupt:
+        pass
+    device.stop()
+    print(f"[INFO] {device.samples} samples, x{device.achieved_speed:.1f} real time, {device.bytes_dropped} bytes dropped")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,289 @@
+import os
+import socket
+import time
+from datetime import datetime
+
+from app.core.run_writer import RunWriter
+from app.core.serial_ingest import PortReader
+from app.core.telemetry import TelemetryRecord
+
+# Columns of the parsed stream, "arrival" is the wall clock time of the read (time.time()) so segments line up
+RECORD_COLUMNS = list(TelemetryRecord._fields) + ["arrival"]
+
+
+class LiveFeed:
+    """Local TCP server repeating the raw bytes of the port to attached viewers.
+    A viewer opens it like a serial port with pyserial ("socket://127.0.0.1:5760"), so Serial_monitor.py can
+    show a running capture. Sockets never block the capture: a viewer that falls more than max_backlog bytes
+    behind is disconnected. What the viewers send is returned by poll, the recorder forwards it to the port
+    only when commands are allowed.
+    """
+    def __init__(self, port, host="127.0.0.1", max_backlog=1 << 20):
+        """Start listening
+
+        Args:
+            port (int): TCP port
+            host (str, optional): Interface to listen on. Defaults to "127.0.0.1".
+            max_backlog (int, optional): Bytes a viewer may lag behind before it is dropped. Defaults to 1 MB.
+        """
+        self.max_backlog = max_backlog
+        self.server = socket.create_server((host, port))
+        self.server.setblocking(False)
+        self.address = self.server.getsockname()
+        self.clients = {}
+        self.dropped = 0
+
+    def poll(self):
+        """Accept new viewers and read what they sent
+
+        Returns:
+            bytes: Data sent by the viewers
+        """
+        while True:
+            try:
+                client, address = self.server.accept()
+            except BlockingIOError:
+                break
+            client.setblocking(False)
+            self.clients[client] = bytearray()
+            print(f"[INFO] Live viewer attached from {address[0]}:{address[1]}")
+        received = []
+        for client in list(self.clients):
+            try:
+                data = client.recv(4096)
+            except BlockingIOError:
+                continue
+            except OSError:
+                data = b""
+            if not data:
+                self.__remove(client)
+            else:
+                received.append(data)
+        return b"".join(received)
+
+    def broadcast(self, data):
+        """Send bytes to every viewer, as much as their socket takes now
+
+        Args:
+            data (bytes): Raw bytes read from the port
+        """
+        for client, backlog in list(self.clients.items()):
+            backlog += data
+            try:
+                sent = client.send(backlog)
+            except BlockingIOError:
+                sent = 0
+            except OSError:
+                self.__remove(client)
+                continue
+            del backlog[:sent]
+            if len(backlog) > self.max_backlog:
+                print("[WARN] Live viewer too slow, disconnected")
+                self.dropped += 1
+                self.__remove(client)
+
+    def __remove(self, client):
+        """Forget a viewer and close its socket
+        """
+        self.clients.pop(client, None)
+        client.close()
+
+    def close(self):
+        """Disconnect the viewers and stop listening
+        """
+        for client in list(self.clients):
+            self.__remove(client)
+        self.server.close()
+
+
+class HeadlessRecorder:
+    """Capture of a bench without GUI for long sessions. The bytes of the port are written as they come to a
+    raw file and parsed with the reader of the monitor (PortReader) into a run file (RunWriter). Both files are
+    rotated together into a new segment when the raw file reaches max_bytes or the segment is max_seconds old.
+    A lost port closes nothing but the port: the recorder retries every reconnect_delay seconds and carries on
+    in the same segment. The raw stream can be watched live through a LiveFeed.
+    """
+    def __init__(self, url, out_dir, baudrate=115200, max_bytes=64 << 20, max_seconds=3600, live_port=None,
+                 allow_commands=False, reconnect_delay=2.0, open_port=None):
+        """Initialize the recorder, run it with run and stop it with stop
+
+        Args:
+            url (string): Port to record ("COM4", "/dev/ttyACM0" or pyserial URL)
+            out_dir (string): Directory of the segments
+            baudrate (int, optional): Baudrate of the port. Defaults to 115200.
+            max_bytes (int, optional): Raw bytes per segment. Defaults to 64 MB.
+            max_seconds (float, optional): Length of a segment [s]. Defaults to 3600.
+            live_port (int, optional): TCP port of the live feed, None for no feed. Defaults to None.
+            allow_commands (bool, optional): Forward the bytes of the live viewers to the port. Defaults to False.
+            reconnect_delay (float, optional): Time between two attempts to reopen the port [s]. Defaults to 2.0.
+            open_port (function, optional): Opens the port, for tests. Defaults to serial.serial_for_url.
+        """
+        self.url = url
+        self.out_dir = out_dir
+        self.baudrate = baudrate
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.allow_commands = allow_commands
+        self.reconnect_delay = reconnect_delay
+        self.open_port = open_port or self.__open_serial
+        self.live = LiveFeed(live_port) if live_port is not None else None
+        os.makedirs(out_dir, exist_ok=True)
+
+        self.running = True
+        self.ser = None
+        self.reader = None
+        self.raw_file = None
+        self.writer = None
+        self.segment_start = 0.0
+        self.segment_bytes = 0
+
+        self.segments = []
+        self.bytes_read = 0
+        self.records = 0
+        self.disconnects = 0
+        self.cpu_time = 0.0
+
+    def __open_serial(self):
+        """Open the port with pyserial
+        """
+        import serial
+        return serial.serial_for_url(self.url, baudrate=self.baudrate, timeout=0.2)
+
+    def connect(self):
+        """Open the port, the decoder restarts with it
+
+        Returns:
+            bool: True if the port is open
+        """
+        try:
+            self.ser = self.open_port()
+        except Exception as e:
+            print(f"[WARN] Could not open port {self.url}: {e}")
+            self.ser = None
+            return False
+        self.reader = PortReader(self.ser, self.url)
+        print(f"[INFO] Recording {self.url}")
+        return True
+
+    def disconnect(self):
+        """Close the port after an error
+        """
+        if self.ser is not None:
+            try:
+                self.ser.close()
+            except Exception:
+                pass
+        self.ser = None
+        self.reader = None
+
+    def start_segment(self):
+        """Close the current files and open the next segment
+        """
+        self.close_segment()
+        base = os.path.join(self.out_dir, f"record_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+        prefix = base
+        index = 1
+        while os.path.exists(prefix + ".raw"):
+            prefix = f"{base}_{index}"
+            index += 1
+        self.raw_file = open(prefix + ".raw", "wb")
+        self.writer = RunWriter(prefix + ".d2run", RECORD_COLUMNS,
+                                params={"port": self.url, "baudrate": self.baudrate, "segment": len(self.segments)})
+        self.segment_start = time.monotonic()
+        self.segment_bytes = 0
+        self.segments.append(prefix)
+        print(f"[INFO] New segment {prefix}")
+
+    def close_segment(self):
+        """Close the files of the current segment
+        """
+        if self.raw_file is not None:
+            self.raw_file.close()
+            self.raw_file = None
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    def step(self):
+        """Read the port once (waiting up to its timeout) and store what came
+
+        Returns:
+            int: Number of bytes read
+        """
+        if self.live is not None:
+            commands = self.live.poll()
+            if commands and self.allow_commands and self.ser is not None:
+                self.ser.write(commands)
+        data = self.ser.read(self.ser.in_waiting or 1)
+        if not data:
+            return 0
+        arrival = time.time()
+        self.raw_file.write(data)
+        self.segment_bytes += len(data)
+        self.bytes_read += len(data)
+        if self.live is not None:
+            self.live.broadcast(data)
+
+        self.reader.feed(data, arrival)
+        for item in self.reader.drain():
+            if item.record is not None:
+                self.writer.append(*item.record, arrival)
+                self.records += 1
+        if self.segment_bytes >= self.max_bytes or time.monotonic() - self.segment_start >= self.max_seconds:
+            self.start_segment()
+        return len(data)
+
+    def run(self):
+        """Record until stop is called, reopening the port when it is lost
+        """
+        start_cpu = time.process_time()
+        self.start_segment()
+        try:
+            while self.running:
+                if self.ser is None and not self.connect():
+                    self.__wait(self.reconnect_delay)
+                    continue
+                try:
+                    self.step()
+                except Exception as e:
+                    print(f"[WARN] Port {self.url} lost: {e}")
+                    self.disconnects += 1
+                    self.disconnect()
+                    self.raw_file.flush()
+                self.cpu_time = time.process_time() - start_cpu
+        finally:
+            self.disconnect()
+            self.close_segment()
+            if self.live is not None:
+                self.live.close()
+            self.cpu_time = time.process_time() - start_cpu
+        print("Recorder stopped.")
+
+    def __wait(self, delay):
+        """Wait before reopening the port, serving the live feed meanwhile
+        """
+        end = time.monotonic() + delay
+        while self.running and time.monotonic() < end:
+            if self.live is not None:
+                self.live.poll()
+            time.sleep(0.1)
+
+    def stop(self):
+        """Stop the recorder after its current read
+        """
+        self.running = False
+
+    def stats(self):
+        """Counters of the recorder
+
+        Returns:
+            dict: bytes, records, segments, disconnects, live viewers and CPU time of the process [s]
+        """
+        return {
+            "bytes": self.bytes_read,
+            "records": self.records,
+            "segments": len(self.segments),
+            "disconnects": self.disconnects,
+            "viewers": len(self.live.clients) if self.live is not None else 0,
+            "cpu_time": self.cpu_time,
+        }
@@ -0,0 +1,166 @@
+import json
+import time
+from collections import deque
+
+from app.core.profiler import LogHistogram
+
+# Stages of a sample in the monitor, each measured from the arrival of its bytes (time.monotonic())
+STAGES = ["parse", "queue", "metrics", "record", "screen"]
+
+# Echo of the firmware acknowledging each command, by first word of the command
+ACKS = {
+    "PARAM": "New setpoint (consigne)",
+    "p": "Control loop ON",
+    "S": "Control loop OFF",
+    "B": "Binary telemetry ON",
+    "A": "Binary telemetry OFF",
+}
+
+
+class LatencyTracker:
+    """Latency histograms of the stages of the telemetry, from the arrival of the bytes.
+    Values are added with mark(stage, arrival) when a stage is done with a sample.
+    """
+    def __init__(self, stages=STAGES):
+        """Initialize the histograms
+
+        Args:
+            stages (list, optional): Name of the stages. Defaults to STAGES.
+        """
+        self.histograms = {stage: LogHistogram() for stage in stages}
+
+    def mark(self, stage, arrival, now=None):
+        """Record that a stage is done with a sample
+
+        Args:
+            stage (string): Name of the stage
+            arrival (float): time.monotonic() of the arrival of the sample
+            now (float, optional): time.monotonic() of the end of the stage. Defaults to now.
+        """
+        if now is None:
+            now = time.monotonic()
+        self.histograms[stage].add(max(now - arrival, 0.0))
+
+    def summary(self):
+        """Histograms of every stage
+
+        Returns:
+            dict: LogHistogram.to_dict by stage
+        """
+        return {stage: histogram.to_dict() for stage, histogram in self.histograms.items()}
+
+    def status_text(self):
+        """Short description for the UI
+
+        Returns:
+            string: p50/p95 of every stage that has values [ms]
+        """
+        parts = [
+            f"{stage} {1000 * h.percentile(50):.1f}/{1000 * h.percentile(95):.1f}"
+            for stage, h in self.histograms.items() if h.count
+        ]
+        return "Latency p50/p95 [ms]: " + (" | ".join(parts) if parts else "-")
+
+
+class CommandTracker:
+    """Match the commands sent to the firmware with their echo and measure the round trip.
+    Commands of the same kind are acknowledged in order, a command without echo after `timeout` seconds
+    counts as lost. Commands with no known echo (R, unknown) are not tracked.
+    """
+    def __init__(self, acks=ACKS, timeout=5.0):
+        """Initialize the tracker
+
+        Args:
+            acks (dict, optional): Echo by first word of the command. Defaults to ACKS.
+            timeout (float, optional): Time after which a command is lost [s]. Defaults to 5.0.
+        """
+        self.acks = acks
+        self.timeout = timeout
+        self.pending = {kind: deque() for kind in acks}
+        self.histograms = {kind: LogHistogram() for kind in acks}
+        self.lost = {kind: 0 for kind in acks}
+        self.last = None
+
+    def sent(self, command, now=None):
+        """Register a command sent to the firmware
+
+        Args:
+            command (string): Command line, without line ending
+            now (float, optional): time.monotonic() of the write. Defaults to now.
+        """
+        kind = command.split(" ", 1)[0]
+        if kind in self.pending:
+            self.pending[kind].append((command, time.monotonic() if now is None else now))
+
+    def on_line(self, line, arrival):
+        """Check if a received line acknowledges a pending command
+
+        Args:
+            line (string): Text line from the firmware
+            arrival (float): time.monotonic() of its arrival
+
+        Returns:
+            float: Round trip time [s] of the acknowledged command, None if the line is not an echo
+        """
+        self.expire(arrival)
+        for kind, ack in self.acks.items():
+            if line.startswith(ack) and self.pending[kind]:
+                command, sent_at = self.pending[kind].popleft()
+                rtt = max(arrival - sent_at, 0.0)
+                self.histograms[kind].add(rtt)
+                self.last = (command, rtt)
+                return rtt
+        return None
+
+    def expire(self, now):
+        """Count the commands waiting for longer than the timeout as lost
+
+        Args:
+            now (float): time.monotonic()
+        """
+        for kind, pending in self.pending.items():
+            while pending and now - pending[0][1] > self.timeout:
+                pending.popleft()
+                self.lost[kind] += 1
+
+    def summary(self):
+        """Round trip histograms and lost commands by kind
+
+        Returns:
+            dict: {"kind": {"rtt": LogHistogram.to_dict, "lost": n, "pending": n}}
+        """
+        return {
+            kind: {"rtt": self.histograms[kind].to_dict(), "lost": self.lost[kind], "pending": len(self.pending[kind])}
+            for kind in self.acks
+        }
+
+    def status_text(self):
+        """Short description for the UI
+
+        Returns:
+            string: Last round trip and lost commands
+        """
+        lost = sum(self.lost.values())
+        if self.last is None:
+            return f"Command RTT: - | lost {lost}"
+        command, rtt = self.last
+        return f"Command RTT: {command.split(' ', 1)[0]} {1000 * rtt:.1f} ms | lost {lost}"
+
+
+def export_latency(file_path, latency, commands, extra=None):
+    """Write the latency and command round trip histograms to a JSON file
+
+    Args:
+        file_path (string): Path of the JSON file
+        latency (LatencyTracker): Stage latencies
+        commands (CommandTracker): Command round trips
+        extra (dict, optional): Other values to store (ingestion counters, ...). Defaults to None.
+    """
+    data = {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "stages": latency.summary(),
+        "commands": commands.summary(),
+    }
+    data.update(extra or {})
+    with open(file_path, "w") as file:
+        json.dump(data, file, indent=4)
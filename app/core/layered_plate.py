@@ -0,0 +1,303 @@
+import ast
+
+import numpy as np
+
+from app.core.plate_transmission import Plate, plate_kwargs
+
+FACES = ("bottom", "top")
+
+
+def parse_layers(text, thickness, k, rho, cp):
+    """Read the "Layers:" field of the solver section
+
+    Args:
+        text (string): Number of layers splitting the plate evenly, or list of (thickness [mm], k, rho, cp)
+            from the bottom face to the top face. Empty for one layer.
+        thickness (float): Thickness of the plate [m], used for a number of layers
+        k (float): Thermal conductivity of the plate [W/mK], used for a number of layers
+        rho (float): Density of the plate [kg/m3], used for a number of layers
+        cp (float): Heat capacity of the plate [J/kgK], used for a number of layers
+
+    Returns:
+        list: (thickness [m], k, rho, cp) of each layer, bottom first
+    """
+    value = ast.literal_eval(text.strip()) if str(text).strip() else 1
+    if isinstance(value, int):
+        if value < 1:
+            raise Exception("Layers must be at least 1")
+        return [(thickness / value, k, rho, cp)] * value
+    layers = [tuple(float(v) for v in layer) for layer in value]
+    if not layers or any(len(layer) != 4 or min(layer) <= 0 for layer in layers):
+        raise Exception("Layers must be (thickness [mm], k, rho, cp) tuples with positive values")
+    return [(layer[0] / 1000, *layer[1:]) for layer in layers]
+
+
+def layered_kwargs(s, p):
+    """Convert the "solver" section of a config to LayeredPlate arguments (those of the plate section excluded)
+
+    Args:
+        s (dict): "solver" section of a config file
+        p (dict): "plate" section of the same config, for the material of the layers and the default time step
+
+    Returns:
+        dict: Keyword arguments of LayeredPlate
+    """
+    plate = plate_kwargs(p)
+    faces = [face.strip() for face in s.get("Thermistor faces:", "").split(",") if face.strip()] or ["top"] * 3
+    dt = s.get("Time step [s]:", "").strip() or p["step time [s]:"]
+    return dict(
+        layers=parse_layers(s.get("Layers:", ""), plate["thickness"], plate["k"], plate["rho"], plate["cp"]),
+        dt=float(dt),
+        thermistor_faces=faces,
+        heater_face=s.get("Heater face:", "").strip() or "bottom",
+    )
+
+
+def solver_mode(config):
+    """Integration scheme selected by a config
+
+    Args:
+        config (dict): Config file with a "plate" and an optional "solver" section
+
+    Returns:
+        string: Plate.solver_mode or LayeredPlate.solver_mode
+    """
+    return config.get("solver", {}).get("Mode:", "").strip() or Plate.solver_mode
+
+
+def build_plate(config):
+    """Plate of a config, 2D explicit or layered 3D implicit depending on its solver section
+
+    Args:
+        config (dict): Config file with a "plate" and an optional "solver" section
+
+    Returns:
+        Plate: Plate or LayeredPlate
+    """
+    p = config["plate"]
+    mode = solver_mode(config)
+    if mode == Plate.solver_mode:
+        return Plate(**plate_kwargs(p))
+    if mode == LayeredPlate.solver_mode:
+        return LayeredPlate(**plate_kwargs(p), **layered_kwargs(config.get("solver", {}), p))
+    raise Exception(f"Solver mode must be {Plate.solver_mode} or {LayeredPlate.solver_mode}")
+
+
+class LayeredPlate(Plate):
+    """Plate made of layers stacked along z (heater contact, plate, coating...), each with its own material.
+    The field is a (layer, x, y) grid of finite volumes coupled to their 6 neighbours: the 7 point operator is
+    applied with slices and never assembled. Every tick is a backward Euler step, unconditionally stable, so dt
+    is chosen for accuracy and not by the stability limit of the thinnest layer. The linear system is solved by
+    conjugate gradient preconditioned with the exact solve of each z column (tridiagonal): the stiff coupling
+    through the thickness is handled by the preconditioner and adding layers costs about linearly.
+    temps is the top face, as shown by the canvas; the whole field is field.
+    """
+    solver_mode = "implicit3d"
+
+    def __init__(self, layers=1, dt=0.1, thermistor_faces=("top", "top", "top"), heater_face="bottom",
+                 tolerance=1e-10, max_iterations=200, **kwargs):
+        """Initialize the plate, the arguments of Plate are passed as keywords
+
+        Args:
+            layers (int or list, optional): Number of layers of the plate material, or (thickness [m], k, rho, cp)
+                of each layer from the bottom face. Defaults to 1.
+            dt (float, optional): Time step [s]. Defaults to 0.1.
+            thermistor_faces (tuple, optional): Face of each thermistance, "top" or "bottom". Defaults to top.
+            heater_face (str, optional): Face of the heat source and of the perturbation. Defaults to "bottom".
+            tolerance (float, optional): Residual of the solver relative to the right hand side. Defaults to 1e-10.
+            max_iterations (int, optional): Iterations of the solver per tick. Defaults to 200.
+        """
+        super().__init__(**kwargs)
+        if isinstance(layers, int):
+            layers = [(self.thickness / layers, self.k, self.rho, self.cp)] * layers
+        if len(thermistor_faces) != len(self.thermistances_indices):
+            raise Exception("One face is needed per thermistance")
+        for face in list(thermistor_faces) + [heater_face]:
+            if face not in FACES:
+                raise Exception(f"Face must be {' or '.join(FACES)}")
+        if dt <= 0:
+            raise Exception("Time step must be positive")
+
+        self.layers = [tuple(layer) for layer in layers]
+        self.nz = len(self.layers)
+        self.thickness = sum(layer[0] for layer in self.layers)
+        self.dt = dt
+        self.nt = round(self.total_time / self.dt)
+        self.times = np.arange(0, self.nt) * self.dt
+        self.tolerance = tolerance
+        self.max_iterations = max_iterations
+        self.thermistor_layers = [0 if face == "bottom" else self.nz - 1 for face in thermistor_faces]
+        self.heater_layer = 0 if heater_face == "bottom" else self.nz - 1
+
+        self.field = np.full((self.nz, self.nx, self.ny), self.temps[0, 0])
+        self.temps = self.field[-1]
+        self.new_temps = None
+        self.__build_operator()
+
+        self.iterations = 0 # Solver iterations of the last tick
+        self.total_iterations = 0
+        self.unconverged = 0 # Ticks whose residual stayed above the tolerance
+
+    def __build_operator(self):
+        """Conductances between the volumes and to the ambient, diagonal and z column factorisation
+        """
+        dx, dy = self.dx, self.dy
+        dz, k, rho, cp = (np.array(values, dtype=float).reshape(-1, 1, 1) for values in zip(*self.layers))
+        self.capacity = rho * cp * dx * dy * dz / self.dt # Heat capacity of a volume over dt [W/K]
+        self.gx = k * dy * dz / dx # Conductance between two neighbours along x [W/K]
+        self.gy = k * dx * dz / dy
+        self.gz = dx * dy / (dz[:-1] / (2 * k[:-1]) + dz[1:] / (2 * k[1:])) # Between two layers, in series
+
+        h = self.h_convection
+        g_ambient = np.zeros((self.nz, self.nx, self.ny))
+        g_ambient[0] += h * dx * dy
+        g_ambient[-1] += h * dx * dy
+        g_ambient[:, 0, :] += h * dy * dz[:, 0]
+        g_ambient[:, -1, :] += h * dy * dz[:, 0]
+        g_ambient[:, :, 0] += h * dx * dz[:, 0]
+        g_ambient[:, :, -1] += h * dx * dz[:, 0]
+        self.g_ambient = g_ambient
+
+        diagonal = self.capacity + g_ambient
+        diagonal[:, 1:] += self.gx
+        diagonal[:, :-1] += self.gx
+        diagonal[:, :, 1:] += self.gy
+        diagonal[:, :, :-1] += self.gy
+        diagonal[1:] += self.gz
+        diagonal[:-1] += self.gz
+        self.diagonal = diagonal
+
+        # Thomas algorithm of every z column: pivots and coefficients of the back substitution
+        self.inv_pivots = np.empty_like(diagonal)
+        self.inv_pivots[0] = 1 / diagonal[0]
+        for layer in range(1, self.nz):
+            self.inv_pivots[layer] = 1 / (diagonal[layer] - self.gz[layer - 1]**2 * self.inv_pivots[layer - 1])
+
+        self.scratch_x = np.empty((self.nz, self.nx - 1, self.ny))
+        self.scratch_y = np.empty((self.nz, self.nx, self.ny - 1))
+        self.scratch_z = np.empty((self.nz - 1, self.nx, self.ny))
+        self.buffers = [np.empty_like(diagonal) for _ in range(5)]
+
+    def apply_operator(self, x, out):
+        """Product of the 7 point operator (capacity, conduction and convection) with a field
+
+        Args:
+            x (np.array): Field (layer, x, y)
+            out (np.array): Result, same shape
+        """
+        np.multiply(self.diagonal, x, out=out)
+        sx, sy, sz = self.scratch_x, self.scratch_y, self.scratch_z
+        np.multiply(x[:, :-1], self.gx, out=sx)
+        out[:, 1:] -= sx
+        np.multiply(x[:, 1:], self.gx, out=sx)
+        out[:, :-1] -= sx
+        np.multiply(x[:, :, :-1], self.gy, out=sy)
+        out[:, :, 1:] -= sy
+        np.multiply(x[:, :, 1:], self.gy, out=sy)
+        out[:, :, :-1] -= sy
+        np.multiply(x[:-1], self.gz, out=sz)
+        out[1:] -= sz
+        np.multiply(x[1:], self.gz, out=sz)
+        out[:-1] -= sz
+
+    def precondition(self, r, out):
+        """Solve the z columns of the operator exactly (its in plane coupling left out)
+
+        Args:
+            r (np.array): Residual (layer, x, y)
+            out (np.array): Result, same shape
+        """
+        out[0] = r[0] * self.inv_pivots[0]
+        for layer in range(1, self.nz):
+            np.multiply(out[layer - 1], self.gz[layer - 1], out=out[layer])
+            out[layer] += r[layer]
+            out[layer] *= self.inv_pivots[layer]
+        for layer in range(self.nz - 2, -1, -1):
+            out[layer] += self.gz[layer] * self.inv_pivots[layer] * out[layer + 1]
+
+    def solve(self, b, x):
+        """Preconditioned conjugate gradient, x holds the initial guess and the solution
+
+        Args:
+            b (np.array): Right hand side (layer, x, y)
+            x (np.array): Initial guess, overwritten by the solution
+
+        Returns:
+            int: Number of iterations
+        """
+        r, z, p, ap, _ = self.buffers
+        self.apply_operator(x, ap)
+        np.subtract(b, ap, out=r)
+        target = self.tolerance * np.linalg.norm(b)
+        self.precondition(r, z)
+        p[:] = z
+        rz = np.vdot(r, z)
+        for iteration in range(1, self.max_iterations + 1):
+            if np.linalg.norm(r) <= target:
+                return iteration - 1
+            self.apply_operator(p, ap)
+            alpha = rz / np.vdot(p, ap)
+            x += alpha * p
+            r -= alpha * ap
+            self.precondition(r, z)
+            rz, rz_old = np.vdot(r, z), rz
+            p *= rz / rz_old
+            p += z
+        if np.linalg.norm(r) > target:
+            self.unconverged += 1
+            if self.unconverged == 1:
+                print(f"[WARN] Layered plate solver did not converge in {self.max_iterations} iterations")
+        return self.max_iterations
+
+    def update_plate_with_numpy(self):
+        """Progress the simulation 1 tick (backward Euler step of dt)
+
+        Returns:
+            np.array: Array of the temps of the top face
+        """
+        t = self.current_time
+        b = self.buffers[4]
+        np.multiply(self.capacity, self.field, out=b)
+        b += self.g_ambient * self.ambient_temp
+        heated = b[self.heater_layer]
+        if self.external_power is not None:
+            heated[self.p_in_location] += self.external_power
+            self.current_power = float(self.external_power)
+        elif self.start_heat_time <= t < self.stop_heat_time:
+            heated[self.p_in_location] += self.power_in
+            self.current_power = float(self.power_in)
+        else:
+            self.current_power = 0.0
+        if self.start_pert <= t < self.stop_pert:
+            heated[self.pert_location] += self.power_perturbation
+            self.current_pert = float(self.power_perturbation)
+        else:
+            self.current_pert = 0.0
+
+        self.iterations = self.solve(b, self.field)
+        self.total_iterations += self.iterations
+        self.current_time += self.dt
+        if self.field_recorder is not None and self.current_time >= self.field_recorder.next_time:
+            self.field_recorder.record(self.current_time, self.temps)
+        return self.temps
+
+    def advance(self, duration):
+        """Progress the simulation by `duration` seconds
+
+        Args:
+            duration (float): Simulated time [s], rounded to a whole number of ticks
+
+        Returns:
+            np.array: Array of the temps of the top face
+        """
+        for _ in range(int(duration / self.dt + 0.5)):
+            self.update_plate_with_numpy()
+        return self.temps
+
+    def read_thermistors(self):
+        """Read the temperature at each thermistance, on its face
+
+        Returns:
+            list: Temperatures of the thermistances [°C]
+        """
+        return [self.field[layer][index] - 273 for layer, index in zip(self.thermistor_layers, self.thermistances_indices)]
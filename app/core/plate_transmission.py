@@ -1,7 +1,48 @@
+import ast
+
 import numpy as np
 
 
+def plate_kwargs(p):
+    """Convert the "plate" section of a config (the text of the input fields) to Plate arguments
+
+    Args:
+        p (dict): "plate" section of a config file, lengths in mm
+
+    Returns:
+        dict: Keyword arguments of Plate, lengths in m
+    """
+    return dict(
+        total_time=float(p["Total Time [s]:"]),
+        lx=float(p["Length X [mm]:"])/1000,
+        ly=float(p["Length Y [mm]:"])/1000,
+        thickness=float(p["Thickness [mm]:"])/1000,
+        n=int(p["N:"]),
+        k=float(p["Thermal Conductivity [W/mK]:"]),
+        rho=float(p["Density [kg/m3]:"]),
+        cp=float(p["Heat Capacity [J/kgK]:"]),
+        h_convection=float(p["Convection Coeff [W/m2K]:"]),
+        amp_in=float(p["Amperage Input [A]:"]),
+        power_transfer=float(p["Power transfert :"]),
+        ambient_temp=float(p["Ambient Temp [°C]:"]),
+        initial_plate_temp=float(p["Initial Temp [°C]:"]),
+        position_heat_source=ast.literal_eval(p["Position heat source [(X, Y)]:"]),
+        positions_thermistances=[
+            ast.literal_eval(p["Position thermistance 1 [(X, Y)]:"]),
+            ast.literal_eval(p["Position thermistance 2 [(X, Y)]:"]),
+            ast.literal_eval(p["Position thermistance 3 [(X, Y)]:"])
+        ],
+        start_heat_time=float(p["Start heat time [s]:"]),
+        stop_heat_time=float(p["Stop heat time [s]:"]),
+        start_perturbation=float(p["Start perturbation time [s]:"]),
+        stop_perturbation=float(p["Stop perturbation time [s]:"]),
+        position_perturbation=ast.literal_eval(p["Position perturbation [(X, Y)]:"]),
+        perturbation=float(p["Perturbation [W]:"])
+    )
+
+
 class Plate:#117.21, 61.6
+    solver_mode = "explicit2d" # Name of the integration scheme, part of the result cache key
     def __init__(self, total_time=500, lx=116.44e-3, ly=61.68e-3, thickness=1.82e-3, n=117, k=350, rho=2333,
                     cp=896, h_convection=13.5, amp_in=-0.824, power_transfer=-1.3, ambient_temp=23.8, initial_plate_temp=0,
                     position_heat_source=(16, 31), positions_thermistances=[(16, 31), (61, 31), (106, 31)],
@@ -100,12 +141,15 @@ class Plate:#117.21, 61.6
         self.temps = np.full([self.nx, self.ny], self.ambient_temp + initial_plate_temp)  # Initial temperature of all elements in x #todo double check initial temp
 
         self.thermistances_positions = positions_thermistances  # Location of temperature measurement
+        self.thermistances_indices = [(round(pos[0]/(1000*self.dx)), round(pos[1]/(1000*self.dy))) for pos in positions_thermistances] # Grid index of each thermistance
 
         # Preallocate vectors
         self.new_temps = np.zeros_like(self.temps)
         self.dt_alpha = self.dt / (self.rho * self.cp) * self.k
         self.dt_conv = self.dt / (self.rho * self.cp) * self.h_convection
         self.current_time = 0
+        self.field_recorder = None # Optional FieldRecorder taking snapshots of the field
+        self.external_power = None # Power of the heat source set with set_power, replaces the heat schedule [W]
         
 
     def update_plate_with_numpy(self):
@@ -128,7 +172,10 @@ class Plate:#117.21, 61.6
         self.new_temps += self.dt_conv * (self.ambient_temp - self.temps) * 2 * self.area_top / self.volume
         
         # Apply power term if it's time to heat up
-        if (self.current_time >= self.start_heat_time and self.current_time < self.stop_heat_time):
+        if self.external_power is not None:
+            self.new_temps[self.p_in_location] += self.dt / (self.rho * self.cp) * self.external_power / self.volume
+            self.current_power = float(self.external_power)
+        elif (self.current_time >= self.start_heat_time and self.current_time < self.stop_heat_time):
             self.new_temps += self.dt / (self.rho * self.cp) * self.powers / self.volume
             self.current_power = float(self.power_in)
         else:
@@ -153,7 +200,100 @@ class Plate:#117.21, 61.6
         self.new_temps[:, -1] += self.dt_alpha * ((self.temps[:, -2] - self.temps[:, -1]) / self.dy**2)
         self.temps[:] = self.new_temps
         self.current_time += self.dt
+        if self.field_recorder is not None and self.current_time >= self.field_recorder.next_time:
+            self.field_recorder.record(self.current_time, self.temps)
 
         return self.temps
         
-    
\ No newline at end of file
+    
+
+    def set_power(self, power):
+        """Drive the heat source with a given power instead of the start/stop heat schedule (digital twin)
+
+        Args:
+            power (float): Power of the heat source [W], None to go back to the schedule
+        """
+        self.external_power = None if power is None else float(power)
+
+    def advance(self, duration):
+        """Progress the simulation by `duration` seconds as fast as possible.
+        Same scheme as update_plate_with_numpy, computed in place with slices instead of np.roll
+        and with the point sources added to their element only.
+
+        Args:
+            duration (float): Simulated time [s], rounded to a whole number of ticks
+
+        Returns:
+            np.array: Array of the temps
+        """
+        steps = int(duration / self.dt + 0.5)
+        temps, new = self.temps, self.new_temps
+        cx = self.dt_alpha / self.dx**2
+        cy = self.dt_alpha / self.dy**2
+        c_top = self.dt_conv * 2 * self.area_top / self.volume
+        c_sides = self.dt_conv * self.area_sides / self.volume
+        c_ends = self.dt_conv * self.area_ends / self.volume
+        c_power = self.dt / (self.rho * self.cp) / self.volume
+        ambient = self.ambient_temp
+        inner = temps[1:-1, 1:-1]
+        new_inner = new[1:-1, 1:-1]
+        scratch_x = np.empty_like(inner)
+        scratch_y = np.empty_like(inner)
+
+        for _ in range(steps):
+            t = self.current_time
+            # Convection of the top and bottom faces
+            np.multiply(temps, 1 - c_top, out=new)
+            new += c_top * ambient
+            # Inner propagation: cx (up + down) + cy (left + right) - 2 (cx + cy) center
+            np.add(temps[2:, 1:-1], temps[:-2, 1:-1], out=scratch_x)
+            scratch_x *= cx
+            np.add(temps[1:-1, 2:], temps[1:-1, :-2], out=scratch_y)
+            scratch_y *= cy
+            scratch_x += scratch_y
+            np.multiply(inner, -2 * (cx + cy), out=scratch_y)
+            scratch_x += scratch_y
+            new_inner += scratch_x
+
+            if self.external_power is not None:
+                new[self.p_in_location] += c_power * self.external_power
+                self.current_power = self.external_power
+            elif self.start_heat_time <= t < self.stop_heat_time:
+                new[self.p_in_location] += c_power * self.power_in
+                self.current_power = float(self.power_in)
+            else:
+                self.current_power = 0.0
+            if self.start_pert <= t < self.stop_pert:
+                new[self.pert_location] += c_power * self.power_perturbation
+                self.current_pert = float(self.power_perturbation)
+            else:
+                self.current_pert = 0.0
+
+            # Convection and conduction of the edges
+            new[0, :] += c_sides * (ambient - temps[0, :]) + cx * (temps[1, :] - temps[0, :])
+            new[-1, :] += c_sides * (ambient - temps[-1, :]) + cx * (temps[-2, :] - temps[-1, :])
+            new[:, 0] += c_ends * (ambient - temps[:, 0]) + cy * (temps[:, 1] - temps[:, 0])
+            new[:, -1] += c_ends * (ambient - temps[:, -1]) + cy * (temps[:, -2] - temps[:, -1])
+            temps[:] = new
+            self.current_time += self.dt
+            if self.field_recorder is not None and self.current_time >= self.field_recorder.next_time:
+                self.field_recorder.record(self.current_time, temps)
+        return temps
+
+    def attach_field_recorder(self, recorder):
+        """Record snapshots of the temperature field while the plate is simulated
+
+        Args:
+            recorder (FieldRecorder): Recorder receiving the snapshots, None to stop recording
+        """
+        self.field_recorder = recorder
+        if recorder is not None and recorder.count == 0:
+            recorder.record(self.current_time, self.temps)
+
+    def read_thermistors(self):
+        """Read the temperature at each thermistance
+
+        Returns:
+            list: Temperatures of the thermistances [°C]
+        """
+        return [self.temps[index] - 273 for index in self.thermistances_indices]
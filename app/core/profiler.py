@@ -0,0 +1,264 @@
+import csv
+import json
+import math
+import time
+
+
+class LogHistogram:
+    """Histogram of durations with logarithmic buckets, from 1 µs to 100 s by default.
+    Adding a value is O(1) and the memory does not depend on the number of values.
+    """
+    def __init__(self, low=1e-6, high=100.0, buckets_per_decade=5):
+        """Initialize the histogram
+
+        Args:
+            low (float, optional): Upper bound of the first bucket [s]. Defaults to 1e-6.
+            high (float, optional): Lower bound of the overflow bucket [s]. Defaults to 100.0.
+            buckets_per_decade (int, optional): Resolution of the histogram. Defaults to 5.
+        """
+        self.low = low
+        self.buckets_per_decade = buckets_per_decade
+        self.n_buckets = int(math.ceil(math.log10(high / low) * buckets_per_decade)) + 2
+        self.counts = [0] * self.n_buckets
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def add(self, value):
+        """Add a value to the histogram
+
+        Args:
+            value (float): Duration [s]
+        """
+        if value <= self.low:
+            index = 0
+        else:
+            index = min(self.n_buckets - 1, 1 + int(math.log10(value / self.low) * self.buckets_per_decade))
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def bucket_edges(self):
+        """Upper edge of every bucket, the last one is unbounded
+
+        Returns:
+            list: Upper edges [s]
+        """
+        return [self.low * 10 ** (i / self.buckets_per_decade) for i in range(self.n_buckets - 1)] + [float("inf")]
+
+    def percentile(self, q):
+        """Approximate percentile, given as the upper edge of the bucket holding it
+
+        Args:
+            q (float): Percentile between 0 and 100
+
+        Returns:
+            float: Duration [s], 0 if the histogram is empty
+        """
+        if self.count == 0:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for edge, n in zip(self.bucket_edges(), self.counts):
+            seen += n
+            if seen >= rank and n:
+                return min(edge, self.max)
+        return self.max
+
+    def mean(self):
+        """Mean of the values
+
+        Returns:
+            float: Mean duration [s], 0 if the histogram is empty
+        """
+        return self.total / self.count if self.count else 0.0
+
+    def to_dict(self):
+        """Summary of the histogram for exports
+
+        Returns:
+            dict: count, total, mean, min, max, p50, p95, p99 and the non empty buckets
+        """
+        edges = self.bucket_edges()
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.mean(),
+            "min": self.min if self.count else 0.0,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "buckets": [[edges[i], n] for i, n in enumerate(self.counts) if n],
+        }
+
+
+class _NullSection:
+    """Context manager doing nothing, returned when the profiler is disabled
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SECTION = _NullSection()
+
+
+class _Section:
+    """Context manager timing one stage for the profiler
+    """
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.add(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Profiler:
+    """Timing counters for the stages of the simulation (solver, 3D surface, 2D plot, draw, file I/O).
+    Stages are timed with the section context manager. Every stage has a histogram of its calls and,
+    between begin_frame and end_frame, the time of each stage is also summed per frame so that the
+    frame histograms show where a frame spends its time. When disabled, section returns a shared
+    no-op context manager, so the instrumentation can stay in the hot paths.
+    """
+    def __init__(self, enabled=False):
+        """Initialize the profiler
+
+        Args:
+            enabled (bool, optional): Start collecting right away. Defaults to False.
+        """
+        self.enabled = enabled
+        self.overlay = False
+        self.reset()
+
+    def reset(self):
+        """Clear all the counters
+        """
+        self.stages = {}
+        self.frame_stages = {}
+        self.frames = LogHistogram()
+        self.current_frame = None
+        self.frame_start = None
+        self.created = time.time()
+
+    def set_enabled(self, enabled):
+        """Switch the collection on or off at runtime
+
+        Args:
+            enabled (bool): New state
+        """
+        self.enabled = bool(enabled)
+        if not self.enabled:
+            self.current_frame = None
+
+    def section(self, name):
+        """Time a block of code
+
+        Args:
+            name (string): Name of the stage
+
+        Returns:
+            context manager: Timer of the stage, no-op when disabled
+        """
+        if not self.enabled:
+            return _NULL_SECTION
+        return _Section(self, name)
+
+    def add(self, name, duration):
+        """Add a measured duration to a stage
+
+        Args:
+            name (string): Name of the stage
+            duration (float): Duration [s]
+        """
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = LogHistogram()
+        stage.add(duration)
+        if self.current_frame is not None:
+            self.current_frame[name] = self.current_frame.get(name, 0.0) + duration
+
+    def begin_frame(self):
+        """Mark the start of a GUI frame
+        """
+        if not self.enabled:
+            return
+        self.current_frame = {}
+        self.frame_start = time.perf_counter()
+
+    def end_frame(self):
+        """Mark the end of a GUI frame and fill the per frame histograms
+        """
+        if self.current_frame is None:
+            return
+        self.frames.add(time.perf_counter() - self.frame_start)
+        for name, duration in self.current_frame.items():
+            hist = self.frame_stages.get(name)
+            if hist is None:
+                hist = self.frame_stages[name] = LogHistogram()
+            hist.add(duration)
+        self.current_frame = None
+
+    def summary(self):
+        """Summary of all the counters
+
+        Returns:
+            dict: Per call and per frame statistics of every stage
+        """
+        return {
+            "created": self.created,
+            "frames": self.frames.to_dict(),
+            "stages": {name: hist.to_dict() for name, hist in self.stages.items()},
+            "per_frame": {name: hist.to_dict() for name, hist in self.frame_stages.items()},
+        }
+
+    def overlay_text(self):
+        """Short text for the on-canvas overlay
+
+        Returns:
+            string: Mean time per frame of each stage
+        """
+        lines = [f"frame: {self.frames.mean()*1e3:.1f} ms (p95 {self.frames.percentile(95)*1e3:.1f})"]
+        for name, hist in self.frame_stages.items():
+            lines.append(f"{name}: {hist.mean()*1e3:.1f} ms")
+        return "\n".join(lines)
+
+    def export_json(self, file_path):
+        """Write the summary to a JSON file
+
+        Args:
+            file_path (string): Path of the file to write
+        """
+        with open(file_path, "w") as file:
+            json.dump(self.summary(), file, indent=4)
+
+    def export_csv(self, file_path):
+        """Write one row per stage to a CSV file
+
+        Args:
+            file_path (string): Path of the file to write
+        """
+        columns = ["count", "total", "mean", "min", "max", "p50", "p95", "p99"]
+        with open(file_path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["scope", "stage"] + columns)
+            writer.writerow(["frame", "frame"] + [self.frames.to_dict()[c] for c in columns])
+            for scope, stages in (("call", self.stages), ("frame", self.frame_stages)):
+                for name, hist in stages.items():
+                    summary = hist.to_dict()
+                    writer.writerow([scope, name] + [summary[c] for c in columns])
@@ -0,0 +1,180 @@
+import ast
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+# Files whose content defines the solver: editing any of them changes every cache key
+SOLVER_FILES = [os.path.join(os.path.dirname(os.path.abspath(__file__)), name) for name in ("plate_transmission.py", "layered_plate.py")]
+
+_solver_version = None
+
+
+def files_version(file_paths):
+    """Hash of source files, for the part of a cache key that must change when they do
+
+    Args:
+        file_paths (list): Files, a missing one is skipped
+
+    Returns:
+        string: Short hexadecimal hash
+    """
+    digest = hashlib.sha256()
+    for file_path in file_paths:
+        if os.path.exists(file_path):
+            with open(file_path, "rb") as file:
+                digest.update(file.read())
+    return digest.hexdigest()[:16]
+
+
+def solver_version():
+    """Hash of the solver source files, so that cached results are dropped when the solver changes
+
+    Returns:
+        string: Short hexadecimal hash
+    """
+    global _solver_version
+    if _solver_version is None:
+        _solver_version = files_version(SOLVER_FILES)
+    return _solver_version
+
+
+def normalise_value(value):
+    """Normalise one config value so that "10", "10.0" and 10 give the same key
+
+    Args:
+        value (any): Value of a config field, usually its text
+
+    Returns:
+        float, list or string: Normalised value
+    """
+    if isinstance(value, str):
+        try:
+            value = ast.literal_eval(value.strip())
+        except (ValueError, SyntaxError):
+            return value.strip()
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, (list, tuple)):
+        return [normalise_value(v) for v in value]
+    return str(value)
+
+
+def cache_key(plate_params, solver_mode, extra=None):
+    """Key of a simulation: hash of its normalised parameters, solver mode and solver version
+
+    Args:
+        plate_params (dict): "plate" section of the config (all its keys)
+        solver_mode (string): Integration scheme, Plate.solver_mode
+        extra (dict, optional): Other settings changing the result. Defaults to None.
+
+    Returns:
+        string: Hexadecimal key
+    """
+    payload = {
+        "plate": {key: normalise_value(value) for key, value in plate_params.items()},
+        "solver": solver_mode,
+        "version": solver_version(),
+        "extra": {key: normalise_value(value) for key, value in (extra or {}).items()},
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """Content addressed cache of simulation results and precomputations on disk.
+    Every key has a directory holding named groups of arrays (.npz). The directory modification time
+    is refreshed on every hit and the least recently used entries are removed when the cache grows
+    past max_bytes. Entries written by another solver version are removed on the next eviction.
+    """
+    def __init__(self, directory="Data/cache", max_bytes=512 * 2**20):
+        """Initialize the cache
+
+        Args:
+            directory (str, optional): Directory of the cache. Defaults to "Data/cache".
+            max_bytes (int, optional): Size budget of the cache. Defaults to 512 MiB.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def __entry_dir(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key, name="results"):
+        """Read a group of arrays
+
+        Args:
+            key (string): Key of the entry
+            name (str, optional): Name of the group. Defaults to "results".
+
+        Returns:
+            dict: Arrays of the group, None on a miss
+        """
+        file_path = os.path.join(self.__entry_dir(key), name + ".npz")
+        if not os.path.exists(file_path):
+            self.misses += 1
+            return None
+        try:
+            with np.load(file_path) as data:
+                arrays = {k: data[k] for k in data.files}
+        except Exception as e:
+            print(f"[WARN] Ignoring unreadable cache entry {file_path}: {e}")
+            self.misses += 1
+            return None
+        os.utime(self.__entry_dir(key))
+        self.hits += 1
+        return arrays
+
+    def put(self, key, arrays, name="results", meta=None):
+        """Store a group of arrays, then evict old entries if over budget
+
+        Args:
+            key (string): Key of the entry
+            arrays (dict): Arrays to store
+            name (str, optional): Name of the group. Defaults to "results".
+            meta (dict, optional): Description of the entry, stored as JSON. Defaults to None.
+        """
+        entry = self.__entry_dir(key)
+        os.makedirs(entry, exist_ok=True)
+        tmp_path = os.path.join(entry, name + ".tmp.npz")
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, os.path.join(entry, name + ".npz"))
+        info = {"version": solver_version(), "created": time.time()}
+        info.update(meta or {})
+        with open(os.path.join(entry, "meta.json"), "w") as file:
+            json.dump(info, file, indent=4)
+        self.evict()
+
+    def evict(self):
+        """Remove entries of other solver versions, then the least recently used ones until under budget
+        """
+        if not os.path.isdir(self.directory):
+            return
+        entries = []
+        for key in os.listdir(self.directory):
+            entry = self.__entry_dir(key)
+            if not os.path.isdir(entry):
+                continue
+            try:
+                with open(os.path.join(entry, "meta.json"), "r") as file:
+                    version = json.load(file).get("version")
+            except Exception:
+                version = None
+            if version != solver_version():
+                shutil.rmtree(entry, ignore_errors=True)
+                continue
+            size = sum(os.path.getsize(os.path.join(entry, f)) for f in os.listdir(entry))
+            entries.append((os.path.getmtime(entry), size, entry))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
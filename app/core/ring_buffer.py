@@ -0,0 +1,122 @@
+from collections import deque
+
+import numpy as np
+
+
+class RingBuffer:
+    """Fixed capacity history of float64 rows. Every row is written twice (at i and i + capacity),
+    so the rows in the window are always one contiguous slice and reading them never copies.
+    """
+    def __init__(self, capacity, columns):
+        """Allocate the buffer
+
+        Args:
+            capacity (int): Number of rows kept
+            columns (int): Number of values per row
+        """
+        self.capacity = capacity
+        self.columns = columns
+        self.data = np.full((2 * capacity, columns), np.nan)
+        self.total = 0
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def append(self, row):
+        """Add a row, dropping the oldest one when full
+
+        Args:
+            row (sequence): Values of the row
+        """
+        i = self.total % self.capacity
+        self.data[i] = row
+        self.data[i + self.capacity] = row
+        self.total += 1
+
+    def view(self):
+        """Rows in the window, oldest first
+
+        Returns:
+            np.array: View of shape (len, columns)
+        """
+        if self.total < self.capacity:
+            return self.data[:self.total]
+        start = self.total % self.capacity
+        return self.data[start:start + self.capacity]
+
+    def column(self, index):
+        """Values of one column in the window, oldest first
+
+        Args:
+            index (int): Index of the column
+
+        Returns:
+            np.array: View of the column
+        """
+        return self.view()[:, index]
+
+    def clear(self):
+        """Remove every row
+        """
+        self.total = 0
+
+
+class RollingExtrema:
+    """Minimum and maximum of the last `window` values in O(1) amortised per value, with monotonic deques.
+    NaN values take a place in the window but are not candidates.
+    """
+    def __init__(self, window):
+        """Initialize the tracker
+
+        Args:
+            window (int): Number of values in the window, None for all of them
+        """
+        self.window = window
+        self.count = 0
+        self.min_queue = deque()
+        self.max_queue = deque()
+
+    def append(self, value):
+        """Add a value
+
+        Args:
+            value (float): New value
+        """
+        index = self.count
+        self.count += 1
+        if value == value:
+            while self.min_queue and self.min_queue[-1][1] >= value:
+                self.min_queue.pop()
+            self.min_queue.append((index, value))
+            while self.max_queue and self.max_queue[-1][1] <= value:
+                self.max_queue.pop()
+            self.max_queue.append((index, value))
+        if self.window is not None:
+            oldest = self.count - self.window
+            while self.min_queue and self.min_queue[0][0] < oldest:
+                self.min_queue.popleft()
+            while self.max_queue and self.max_queue[0][0] < oldest:
+                self.max_queue.popleft()
+
+    def min(self):
+        """Smallest value of the window
+
+        Returns:
+            float: Minimum, NaN if the window holds no value
+        """
+        return self.min_queue[0][1] if self.min_queue else float("nan")
+
+    def max(self):
+        """Largest value of the window
+
+        Returns:
+            float: Maximum, NaN if the window holds no value
+        """
+        return self.max_queue[0][1] if self.max_queue else float("nan")
+
+    def clear(self):
+        """Remove every value
+        """
+        self.count = 0
+        self.min_queue.clear()
+        self.max_queue.clear()
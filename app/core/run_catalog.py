@@ -0,0 +1,353 @@
+import glob
+import json
+import os
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+from app.core.result_cache import normalise_value
+
+# Short names of the config fields, used as parameter names in queries
+PARAM_NAMES = {
+    "Total Time [s]:": "total_time",
+    "Length X [mm]:": "lx",
+    "Length Y [mm]:": "ly",
+    "Thickness [mm]:": "thickness",
+    "N:": "n",
+    "Thermal Conductivity [W/mK]:": "k",
+    "Density [kg/m3]:": "rho",
+    "Heat Capacity [J/kgK]:": "cp",
+    "Convection Coeff [W/m2K]:": "h",
+    "Amperage Input [A]:": "amp_in",
+    "Power transfert :": "power_transfer",
+    "Ambient Temp [°C]:": "ambient_temp",
+    "Initial Temp [°C]:": "initial_temp",
+    "Position heat source [(X, Y)]:": "heat_source",
+    "Position thermistance 1 [(X, Y)]:": "thermistance_1",
+    "Position thermistance 2 [(X, Y)]:": "thermistance_2",
+    "Position thermistance 3 [(X, Y)]:": "thermistance_3",
+    "Start heat time [s]:": "start_heat_time",
+    "Stop heat time [s]:": "stop_heat_time",
+    "step time [s]:": "step_time",
+    "Start perturbation time [s]:": "start_perturbation",
+    "Stop perturbation time [s]:": "stop_perturbation",
+    "Position perturbation [(X, Y)]:": "perturbation_position",
+    "Perturbation [W]:": "perturbation",
+}
+
+METRICS = ["final_t1", "final_t2", "final_t3", "peak", "settling_time"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    created REAL NOT NULL,
+    name TEXT,
+    config TEXT,
+    files TEXT,
+    setpoint REAL, p REAL, i REAL, d REAL, f REAL,
+    final_t1 REAL, final_t2 REAL, final_t3 REAL,
+    peak REAL, settling_time REAL
+);
+CREATE TABLE IF NOT EXISTS run_params (
+    name TEXT NOT NULL,
+    value REAL NOT NULL,
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    PRIMARY KEY (name, value, run_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS runs_kind_created ON runs(kind, created);
+CREATE INDEX IF NOT EXISTS run_params_run ON run_params(run_id);
+"""
+
+
+def flatten_params(plate_params):
+    """Numeric values of the config fields under their short name, positions are split in _x and _y
+
+    Args:
+        plate_params (dict): "plate" section of a config
+
+    Returns:
+        dict: Parameter name -> float
+    """
+    values = {}
+    for key, raw in plate_params.items():
+        name = PARAM_NAMES.get(key, key)
+        value = normalise_value(raw)
+        if isinstance(value, float):
+            values[name] = value
+        elif isinstance(value, list) and len(value) == 2 and all(isinstance(v, float) for v in value):
+            values[name + "_x"], values[name + "_y"] = value
+    return values
+
+
+def summary_metrics(times, t1, t2, t3, target=None, band=0.8):
+    """Summary metrics of a run
+
+    Args:
+        times (array): Time of each sample [s]
+        t1 (array): Thermistance 1 [°C]
+        t2 (array): Thermistance 2 [°C]
+        t3 (array): Thermistance 3 [°C]
+        target (float, optional): Setpoint of t3, the final t3 value when None. Defaults to None.
+        band (float, optional): Half width of the settling band [°C]. Defaults to 0.8.
+
+    Returns:
+        dict: final_t1, final_t2, final_t3, peak and settling_time (time after which t3 stays in the band, None if never)
+    """
+    times, t1, t2, t3 = (np.asarray(a, dtype=float) for a in (times, t1, t2, t3))
+    if len(times) == 0:
+        return {name: None for name in METRICS}
+    if target is None:
+        target = t3[-1]
+    outside = np.flatnonzero(np.abs(t3 - target) > band)
+    if len(outside) == 0:
+        settling = 0.0
+    elif outside[-1] == len(t3) - 1:
+        settling = None
+    else:
+        settling = float(times[outside[-1] + 1] - times[0])
+    return {
+        "final_t1": float(t1[-1]), "final_t2": float(t2[-1]), "final_t3": float(t3[-1]),
+        "peak": float(np.nanmax([t1, t2, t3])),
+        "settling_time": settling,
+    }
+
+
+class RunCatalog:
+    """Local SQLite catalog of the simulations and of the prototype recordings.
+    Each run stores its config, gains and setpoint, the files it produced and summary metrics.
+    Every numeric parameter and metric is also stored in run_params, whose primary key (name, value, run_id)
+    makes a range condition on a parameter an index range scan, so queries stay fast with many runs.
+    """
+    def __init__(self, db_path="Data/run_catalog.sqlite"):
+        """Open (and create if needed) the catalog
+
+        Args:
+            db_path (str, optional): Path of the database. Defaults to "Data/run_catalog.sqlite".
+        """
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db_path = db_path
+        self.connection = sqlite3.connect(db_path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        """Close the database
+        """
+        self.connection.close()
+
+    def add_run(self, kind, files, config=None, params=None, gains=None, setpoint=None, metrics=None, name=None, created=None):
+        """Add a run to the catalog
+
+        Args:
+            kind (string): "simulation" or "monitor"
+            files (list): Files produced by the run
+            config (dict, optional): Full config of the run. Defaults to None.
+            params (dict, optional): Numeric parameters to index, name -> value. Defaults to None.
+            gains (dict, optional): Controller gains "p", "i", "d", "f". Defaults to None.
+            setpoint (float, optional): Setpoint of the controller. Defaults to None.
+            metrics (dict, optional): Summary metrics, see summary_metrics. Defaults to None.
+            name (string, optional): Display name. Defaults to the name of the first file.
+            created (float, optional): Creation time (epoch). Defaults to now.
+
+        Returns:
+            int: Id of the run
+        """
+        gains = gains or {}
+        metrics = metrics or {}
+        files = [os.path.abspath(f) for f in files]
+        with self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO runs (kind, created, name, config, files, setpoint, p, i, d, f, "
+                "final_t1, final_t2, final_t3, peak, settling_time) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (kind, created if created is not None else time.time(),
+                 name or (os.path.basename(files[0]) if files else None),
+                 json.dumps(config or {}), json.dumps(files), setpoint,
+                 gains.get("p"), gains.get("i"), gains.get("d"), gains.get("f"))
+                + tuple(metrics.get(m) for m in METRICS)
+            )
+            run_id = cursor.lastrowid
+            indexed = dict(params or {})
+            indexed.update({k: v for k, v in gains.items() if v is not None})
+            indexed.update({m: metrics.get(m) for m in METRICS if metrics.get(m) is not None})
+            if setpoint is not None:
+                indexed["setpoint"] = setpoint
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO run_params (name, value, run_id) VALUES (?, ?, ?)",
+                [(k.lower(), float(v), run_id) for k, v in indexed.items()]
+            )
+        return run_id
+
+    def add_simulation(self, config, files, times, t1, t2, t3):
+        """Add a simulation run
+
+        Args:
+            config (dict): Config of the run, with its "plate" section
+            files (list): Files produced by the run
+            times (array): Time of each sample [s]
+            t1 (array): Thermistance 1 [°C]
+            t2 (array): Thermistance 2 [°C]
+            t3 (array): Thermistance 3 [°C]
+
+        Returns:
+            int: Id of the run
+        """
+        return self.add_run("simulation", files, config=config, params=flatten_params(config.get("plate", {})),
+                            metrics=summary_metrics(times, t1, t2, t3))
+
+    def add_monitor_recording(self, files, setpoint, gains, times, t1, t2, t3, band=0.8):
+        """Add a recording of the prototype made with the serial monitor
+
+        Args:
+            files (list): Files produced by the recording
+            setpoint (float): Setpoint sent to the prototype [°C]
+            gains (dict): Gains sent to the prototype, "p", "i", "d", "f"
+            times (array): Time of each sample [s]
+            t1 (array): Thermistance 1 [°C]
+            t2 (array): Thermistance 2 [°C]
+            t3 (array): Thermistance 3 [°C]
+            band (float, optional): Allowed error around the setpoint [°C]. Defaults to 0.8.
+
+        Returns:
+            int: Id of the run
+        """
+        return self.add_run("monitor", files, config={"setpoint": setpoint, "gains": gains}, gains=gains,
+                            setpoint=setpoint, metrics=summary_metrics(times, t1, t2, t3, target=setpoint, band=band))
+
+    def query(self, kind=None, limit=None, **ranges):
+        """Find runs by parameter and metric ranges, for example query(h=(10, 15), n=(100, None))
+
+        Args:
+            kind (string, optional): Only runs of this kind. Defaults to None.
+            limit (int, optional): Maximum number of runs. Defaults to None.
+            **ranges (tuple or float): (low, high) bounds, None for an open bound, or an exact value
+
+        Returns:
+            list: sqlite3.Row of the matching runs, most recent first
+        """
+        sql = "SELECT * FROM runs WHERE 1=1"
+        args = []
+        if kind is not None:
+            sql += " AND kind = ?"
+            args.append(kind)
+        for name, bounds in ranges.items():
+            low, high = bounds if isinstance(bounds, (tuple, list)) else (bounds, bounds)
+            sql += " AND id IN (SELECT run_id FROM run_params WHERE name = ?"
+            args.append(name.lower())
+            if low is not None:
+                sql += " AND value >= ?"
+                args.append(float(low))
+            if high is not None:
+                sql += " AND value <= ?"
+                args.append(float(high))
+            sql += ")"
+        sql += " ORDER BY created DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            args.append(int(limit))
+        return self.connection.execute(sql, args).fetchall()
+
+    def known_files(self):
+        """Files already referenced by a run
+
+        Returns:
+            set: Absolute paths
+        """
+        files = set()
+        for (row,) in self.connection.execute("SELECT files FROM runs"):
+            files.update(json.loads(row))
+        return files
+
+    def scan(self, sim_dir="Data", monitor_dir="data/Xlsx"):
+        """Add the existing run files that are not in the catalog yet (.d2run and sim_data_*.txt from the simulator,
+        .xlsx recordings from the monitor)
+
+        Args:
+            sim_dir (str, optional): Output directory of the simulator. Defaults to "Data".
+            monitor_dir (str, optional): Output directory of the monitor recordings. Defaults to "data/Xlsx".
+
+        Returns:
+            int: Number of runs added
+        """
+        from app.core.run_writer import read_run
+
+        known = self.known_files()
+        added = 0
+        for file_path in sorted(glob.glob(os.path.join(sim_dir, "sim_data_*.d2run"))):
+            if os.path.abspath(file_path) in known:
+                continue
+            try:
+                header, data = read_run(file_path)
+                columns = header["columns"]
+                self.add_simulation(header.get("params", {}), [file_path],
+                                    *(data[:, columns.index(c)] for c in ("time", "t1", "t2", "t3")))
+                known.add(os.path.abspath(file_path))
+                added += 1
+            except Exception as e:
+                print(f"[WARN] Skipping {file_path}: {e}")
+        for file_path in sorted(glob.glob(os.path.join(sim_dir, "sim_data_*.txt"))):
+            # Text exports of a catalogued .d2run are part of that run
+            if os.path.abspath(file_path) in known or os.path.abspath(os.path.splitext(file_path)[0] + ".d2run") in known:
+                continue
+            try:
+                data = np.loadtxt(file_path, ndmin=2)
+                self.add_run("simulation", [file_path], metrics=summary_metrics(data[:, 0], data[:, 3], data[:, 4], data[:, 5]),
+                             created=os.path.getmtime(file_path))
+                added += 1
+            except Exception as e:
+                print(f"[WARN] Skipping {file_path}: {e}")
+        for file_path in sorted(glob.glob(os.path.join(monitor_dir, "data_*.xlsx"))):
+            if os.path.abspath(file_path) in known:
+                continue
+            try:
+                from openpyxl import load_workbook
+                sheet = load_workbook(file_path, read_only=True)["data"]
+                rows = np.array([row[:6] for row in sheet.iter_rows(min_row=2, values_only=True) if row[0] is not None], dtype=float)
+                setpoint = float(rows[-1, 1]) if len(rows) else None
+                self.add_run("monitor", [file_path], setpoint=setpoint, created=os.path.getmtime(file_path),
+                             metrics=summary_metrics(rows[:, 0], rows[:, 3], rows[:, 4], rows[:, 5], target=setpoint) if len(rows) else None)
+                added += 1
+            except Exception as e:
+                print(f"[WARN] Skipping {file_path}: {e}")
+        return added
+
+
+def parse_range(text):
+    """Parse a command line condition such as h=10:15, n=100: or kind=monitor
+
+    Args:
+        text (string): Condition
+
+    Returns:
+        tuple: (name, bounds)
+    """
+    name, _, value = text.partition("=")
+    if ":" in value:
+        low, _, high = value.partition(":")
+        return name, (float(low) if low else None, float(high) if high else None)
+    try:
+        return name, float(value)
+    except ValueError:
+        return name, value
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in ("scan", "query"):
+        print("usage: python -m app.core.run_catalog scan | query [name=low:high ...] [kind=simulation|monitor]")
+        sys.exit(1)
+    catalog = RunCatalog()
+    if sys.argv[1] == "scan":
+        print(f"{catalog.scan()} runs added")
+    else:
+        conditions = dict(parse_range(arg) for arg in sys.argv[2:])
+        start = time.perf_counter()
+        rows = catalog.query(**conditions)
+        for row in rows:
+            print(f"{row['id']:5d} {row['kind']:10s} {time.strftime('%Y-%m-%d %H:%M', time.localtime(row['created']))} "
+                  f"{row['name']}  t3={row['final_t3']} peak={row['peak']} settling={row['settling_time']}")
+        print(f"{len(rows)} runs in {(time.perf_counter() - start)*1e3:.1f} ms")
@@ -0,0 +1,193 @@
+import json
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+
+import numpy as np
+
+MAGIC = b"D2RUN001"
+HEADER_ALIGN = 64
+DTYPE = "<f8"
+
+
+class RunWriter:
+    """Stream the samples of a run to a binary file while the run is going.
+    The file starts with a JSON header (columns, parameters of the run, ...) padded to 64 bytes,
+    followed by rows of little-endian float64. Rows are filled in a preallocated chunk by the caller
+    and full chunks (or partial ones every flush_interval seconds) are handed to a background thread
+    that writes and flushes them, so append never waits for the disk. Since rows are fixed size,
+    a file cut by a crash can still be read up to its last complete row with read_run.
+    """
+    def __init__(self, file_path, columns, params=None, chunk_rows=1024, flush_interval=1.0):
+        """Create the file, write the header and start the writing thread
+
+        Args:
+            file_path (string): Path of the file to create
+            columns (list): Name of the columns of each row
+            params (dict, optional): Parameters of the run to store in the header. Defaults to None.
+            chunk_rows (int, optional): Number of rows handed to the writing thread at once. Defaults to 1024.
+            flush_interval (float, optional): Maximum time [s] a row waits before being written. Defaults to 1.0.
+        """
+        self.file_path = file_path
+        self.columns = list(columns)
+        self.chunk_rows = chunk_rows
+        self.flush_interval = flush_interval
+        self.rows_written = 0
+        self.error = None
+
+        header = {
+            "columns": self.columns,
+            "dtype": DTYPE,
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "params": params or {},
+        }
+        self.file = open(file_path, "wb")
+        self.file.write(encode_header(header))
+        self.file.flush()
+
+        self.buffer = np.empty((chunk_rows, len(self.columns)), dtype=DTYPE)
+        self.fill = 0
+        self.last_handoff = time.perf_counter()
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.__write_loop, daemon=True)
+        self.thread.start()
+
+    def append(self, *values):
+        """Add one row, values in the order of the columns
+
+        Args:
+            *values (float): Values of the row
+        """
+        self.buffer[self.fill] = values
+        self.fill += 1
+        if self.fill == self.chunk_rows or time.perf_counter() - self.last_handoff >= self.flush_interval:
+            self.__handoff()
+
+    def extend(self, rows):
+        """Add many rows at once, written by the thread as one chunk
+
+        Args:
+            rows (np.array): Rows of shape (n, columns)
+        """
+        self.__handoff()
+        self.queue.put(np.ascontiguousarray(rows, dtype=DTYPE))
+
+    def __handoff(self):
+        """Give the filled part of the chunk to the writing thread and start a new chunk
+        """
+        if self.fill:
+            self.queue.put(self.buffer[:self.fill])
+            self.buffer = np.empty((self.chunk_rows, len(self.columns)), dtype=DTYPE)
+            self.fill = 0
+        self.last_handoff = time.perf_counter()
+
+    def __write_loop(self):
+        """Background thread writing the chunks to the file
+        """
+        while True:
+            chunk = self.queue.get()
+            if chunk is None:
+                break
+            try:
+                self.file.write(chunk.tobytes())
+                self.file.flush()
+                self.rows_written += len(chunk)
+            except Exception as e:
+                self.error = e
+                print(f"[ERROR] Failed to write run data to {self.file_path}: {e}")
+
+    def close(self):
+        """Write the remaining rows, stop the thread and close the file
+        """
+        if self.file.closed:
+            return
+        self.__handoff()
+        self.queue.put(None)
+        self.thread.join()
+        self.file.close()
+
+
+def encode_header(header):
+    """Encode a run header: magic, header length and JSON padded to HEADER_ALIGN bytes
+
+    Args:
+        header (dict): Header to encode
+
+    Returns:
+        bytes: Encoded header
+    """
+    payload = json.dumps(header).encode("utf-8")
+    size = len(MAGIC) + 4 + len(payload)
+    payload += b" " * (-size % HEADER_ALIGN)
+    return MAGIC + struct.pack("<I", len(payload)) + payload
+
+
+def read_header(file_path):
+    """Read the header of a run file
+
+    Args:
+        file_path (string): Path of the run file
+
+    Raises:
+        ValueError: The file is not a run file
+
+    Returns:
+        tuple: (header dict, offset of the first row in bytes)
+    """
+    with open(file_path, "rb") as file:
+        magic = file.read(len(MAGIC))
+        if magic != MAGIC:
+            raise ValueError(f"{file_path} is not a run file")
+        (length,) = struct.unpack("<I", file.read(4))
+        header = json.loads(file.read(length).decode("utf-8"))
+    return header, len(MAGIC) + 4 + length
+
+
+def read_run(file_path, mmap=True):
+    """Open a run file. Incomplete trailing rows (crash during a write) are ignored.
+
+    Args:
+        file_path (string): Path of the run file
+        mmap (bool, optional): Map the rows instead of loading them. Defaults to True.
+
+    Returns:
+        tuple: (header dict, array of shape (rows, columns))
+    """
+    header, offset = read_header(file_path)
+    n_columns = len(header["columns"])
+    row_size = np.dtype(header["dtype"]).itemsize * n_columns
+    rows = (os.path.getsize(file_path) - offset) // row_size
+    if rows == 0:
+        return header, np.empty((0, n_columns), dtype=header["dtype"])
+    if mmap:
+        data = np.memmap(file_path, dtype=header["dtype"], mode="r", offset=offset, shape=(rows, n_columns))
+    else:
+        data = np.fromfile(file_path, dtype=header["dtype"], count=rows * n_columns, offset=offset).reshape(rows, n_columns)
+    return header, data
+
+
+def export_text(file_path, text_path=None):
+    """Convert a run file to the text format written by np.savetxt (one row per sample)
+
+    Args:
+        file_path (string): Path of the run file
+        text_path (string, optional): Path of the text file. Defaults to the run file with a .txt extension.
+
+    Returns:
+        string: Path of the text file
+    """
+    if text_path is None:
+        text_path = os.path.splitext(file_path)[0] + ".txt"
+    header, data = read_run(file_path)
+    np.savetxt(text_path, data, header=" ".join(header["columns"]))
+    return text_path
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("usage: python -m app.core.run_writer <run.d2run> [output.txt]")
+        sys.exit(1)
+    print(export_text(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None))
@@ -0,0 +1,362 @@
+import argparse
+import inspect
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+from app.core.plate_transmission import Plate
+
+# Parameters perturbed by the ensemble: name -> (Plate argument, index in a position tuple or None)
+PARAMETERS = {
+    "k": ("k", None),
+    "rho": ("rho", None),
+    "cp": ("cp", None),
+    "h_convection": ("h_convection", None),
+    "power_transfer": ("power_transfer", None),
+    "thickness": ("thickness", None),
+    "source_x": ("position_heat_source", 0),
+    "source_y": ("position_heat_source", 1),
+}
+PROBES = ("t1", "t2", "t3")
+RELATIVE_STEP = 0.01 # Perturbation of a material parameter, fraction of its value
+POSITION_STEP = 1.0 # Perturbation of a position [mm]
+
+
+def with_defaults(kwargs):
+    """Plate arguments completed with the defaults of Plate, so that a parameter left out can still be read and perturbed
+
+    Args:
+        kwargs (dict): Plate arguments
+
+    Returns:
+        dict: Every argument of Plate
+    """
+    defaults = {name: parameter.default for name, parameter in inspect.signature(Plate.__init__).parameters.items()
+                if parameter.default is not inspect.Parameter.empty}
+    return dict(defaults, **kwargs)
+
+
+def bilinear(nx, ny, gx, gy):
+    """Cells and weights of a point between the nodes of the grid
+
+    Args:
+        nx (int): Elements along x
+        ny (int): Elements along y
+        gx (float): Position in cells along x (position / dx), clipped to the grid
+        gy (float): Position in cells along y
+
+    Returns:
+        list: ((i, j), weight) of the four surrounding cells
+    """
+    gx = min(max(gx, 0.0), nx - 1.0)
+    gy = min(max(gy, 0.0), ny - 1.0)
+    i, j = min(int(gx), max(nx - 2, 0)), min(int(gy), max(ny - 2, 0))
+    fx, fy = gx - i, gy - j
+    cells = []
+    for di, wx in ((0, 1 - fx), (1, fx)):
+        for dj, wy in ((0, 1 - fy), (1, fy)):
+            if wx * wy > 0:
+                cells.append(((min(i + di, nx - 1), min(j + dj, ny - 1)), wx * wy))
+    return cells
+
+
+class PlateEnsemble:
+    """Several plates of the same grid advanced together, one numpy array (member, x, y) for all of them.
+    The scheme is the one of Plate.advance with coefficients per member, and a common dt, the smallest stable one.
+    The heat source and the thermistors are spread over their four surrounding cells (bilinear) instead of
+    rounded to one, so that a position can be varied continuously.
+    """
+    def __init__(self, kwargs, members):
+        """Build the members
+
+        Args:
+            kwargs (dict): Plate arguments of the reference (plate_kwargs of a config)
+            members (list): Plate arguments changed by each member, {} for the reference itself
+        """
+        arguments = [dict(with_defaults(kwargs), **member) for member in members]
+        plates = [Plate(**member) for member in arguments]
+        base = plates[0]
+        if any((plate.nx, plate.ny) != (base.nx, base.ny) for plate in plates):
+            raise Exception("The members of an ensemble must share their grid")
+        self.plates = plates
+        self.nx, self.ny, self.dx, self.dy = base.nx, base.ny, base.dx, base.dy
+        self.dt = min(plate.dt for plate in plates)
+        self.current_time = 0.0
+        self.start_heat_time, self.stop_heat_time = base.start_heat_time, base.stop_heat_time
+        self.start_pert, self.stop_pert = base.start_pert, base.stop_pert
+        self.ambient_temp = base.ambient_temp
+        self.temps = np.array([plate.temps for plate in plates])
+        self.new_temps = np.empty_like(self.temps)
+
+        def column(values):
+            return np.array(values, dtype=float).reshape(-1, 1, 1)
+
+        capacity = column([plate.rho * plate.cp for plate in plates])
+        k = column([plate.k for plate in plates])
+        h = column([plate.h_convection for plate in plates])
+        dz = column([plate.dz for plate in plates])
+        self.cx = self.dt * k / capacity / self.dx**2
+        self.cy = self.dt * k / capacity / self.dy**2
+        self.c_top = self.dt * h / capacity * 2 / dz
+        self.c_sides = self.dt * h / capacity / self.dx
+        self.c_ends = self.dt * h / capacity / self.dy
+        # Heat per tick of the source at full power, spread over its cells [K]
+        self.source = np.zeros_like(self.temps)
+        for member, (plate, argument) in enumerate(zip(plates, arguments)):
+            gx = argument["position_heat_source"][0] / (1000 * self.dx)
+            gy = argument["position_heat_source"][1] / (1000 * self.dy)
+            for cell, weight in bilinear(self.nx, self.ny, gx, gy):
+                self.source[(member,) + cell] += weight * plate.power_in * self.dt / (plate.rho * plate.cp * plate.volume)
+        self.perturbation = np.zeros_like(self.temps)
+        for member, plate in enumerate(plates):
+            self.perturbation[(member,) + plate.pert_location] = \
+                plate.power_perturbation * self.dt / (plate.rho * plate.cp * plate.volume)
+
+    def advance(self, duration):
+        """Progress every member by `duration` seconds
+
+        Args:
+            duration (float): Simulated time [s], rounded to a whole number of ticks
+        """
+        temps, new = self.temps, self.new_temps
+        inner = temps[:, 1:-1, 1:-1]
+        new_inner = new[:, 1:-1, 1:-1]
+        scratch_x = np.empty_like(inner)
+        scratch_y = np.empty_like(inner)
+        cx, cy = self.cx, self.cy
+        c_sides, c_ends = self.c_sides[:, :, 0], self.c_ends[:, :, 0]
+        cx_edge, cy_edge = cx[:, :, 0], cy[:, :, 0]
+        ambient = self.ambient_temp
+
+        for _ in range(int(duration / self.dt + 0.5)):
+            t = self.current_time
+            np.multiply(temps, 1 - self.c_top, out=new)
+            new += self.c_top * ambient
+            np.add(temps[:, 2:, 1:-1], temps[:, :-2, 1:-1], out=scratch_x)
+            scratch_x *= cx
+            np.add(temps[:, 1:-1, 2:], temps[:, 1:-1, :-2], out=scratch_y)
+            scratch_y *= cy
+            scratch_x += scratch_y
+            np.multiply(inner, -2 * (cx + cy), out=scratch_y)
+            scratch_x += scratch_y
+            new_inner += scratch_x
+            if self.start_heat_time <= t < self.stop_heat_time:
+                new += self.source
+            if self.start_pert <= t < self.stop_pert:
+                new += self.perturbation
+            new[:, 0, :] += c_sides * (ambient - temps[:, 0, :]) + cx_edge * (temps[:, 1, :] - temps[:, 0, :])
+            new[:, -1, :] += c_sides * (ambient - temps[:, -1, :]) + cx_edge * (temps[:, -2, :] - temps[:, -1, :])
+            new[:, :, 0] += c_ends * (ambient - temps[:, :, 0]) + cy_edge * (temps[:, :, 1] - temps[:, :, 0])
+            new[:, :, -1] += c_ends * (ambient - temps[:, :, -1]) + cy_edge * (temps[:, :, -2] - temps[:, :, -1])
+            temps[:] = new
+            self.current_time += self.dt
+
+    def read(self, member, position):
+        """Temperature of a member at a position, interpolated between the cells
+
+        Args:
+            member (int): Index of the member
+            position (tuple): (X, Y) [mm]
+
+        Returns:
+            float: Temperature [°C]
+        """
+        cells = bilinear(self.nx, self.ny, position[0] / (1000 * self.dx), position[1] / (1000 * self.dy))
+        return sum(weight * self.temps[(member,) + cell] for cell, weight in cells) - 273
+
+    def read_thermistors(self, member):
+        """Read the thermistances of a member at its own positions
+
+        Args:
+            member (int): Index of the member
+
+        Returns:
+            list: Temperatures of the thermistances [°C]
+        """
+        return [self.read(member, position) for position in self.plates[member].thermistances_positions]
+
+
+def _perturb(kwargs, name, sign=1.0):
+    """Plate arguments changed by one step of a parameter
+
+    Returns:
+        tuple: (changed arguments, step)
+    """
+    argument, index = PARAMETERS[name]
+    kwargs = with_defaults(kwargs)
+    if index is None:
+        step = RELATIVE_STEP * kwargs[argument]
+        return {argument: kwargs[argument] + sign * step}, step
+    position = list(kwargs[argument])
+    position[index] += sign * POSITION_STEP
+    return {argument: tuple(position)}, POSITION_STEP
+
+
+def sensitivity(kwargs, duration=None, sample_period=5.0, parameters=None, central=False):
+    """Sensitivity of the thermistor traces to every parameter, from one batched ensemble run.
+    The reference and one perturbed plate per parameter (two with central differences) are advanced together.
+    The sensitivity to a thermistor position needs no member: it is the slope of the reference field there.
+    Each curve is the change of the trace for one step of its parameter, RELATIVE_STEP of a material parameter
+    or POSITION_STEP of a position, so that parameters of different units can be ranked.
+
+    Args:
+        kwargs (dict): Plate arguments (plate_kwargs of a config)
+        duration (float, optional): Simulated time [s]. Defaults to the total time of kwargs.
+        sample_period (float, optional): Time between two samples of the traces [s]. Defaults to 5.0.
+        parameters (list, optional): Keys of PARAMETERS. Defaults to all of them.
+        central (bool, optional): Central differences instead of forward ones (twice the members). Defaults to False.
+
+    Returns:
+        dict: "time", "reference" (samples x 3) [°C], "curves" (name -> samples x 3) [°C per step],
+              "steps" (name -> step in the unit of the parameter), "members" and "wall_time" [s]
+    """
+    kwargs = with_defaults(kwargs)
+    duration = kwargs["total_time"] if duration is None else duration
+    parameters = list(PARAMETERS) if parameters is None else list(parameters)
+    members, steps = [{}], {}
+    for name in parameters:
+        change, steps[name] = _perturb(kwargs, name)
+        members.append(change)
+        if central:
+            members.append(_perturb(kwargs, name, -1.0)[0])
+    ensemble = PlateEnsemble(kwargs, members)
+    probes = [(f"{probe}_{axis}", k, axis_index) for k, probe in enumerate(PROBES) for axis_index, axis in enumerate("xy")]
+
+    times = np.arange(sample_period, duration + sample_period / 2, sample_period)
+    readings = np.empty((len(times), len(members), 3))
+    probe_curves = {name: np.empty((len(times), 3)) for name, _, _ in probes}
+    positions = ensemble.plates[0].thermistances_positions
+    start = time.perf_counter()
+    for s, sample_time in enumerate(times):
+        ensemble.advance(sample_time - ensemble.current_time)
+        readings[s] = [ensemble.read_thermistors(member) for member in range(len(members))]
+        for name, k, axis in probes:
+            curve = probe_curves[name][s]
+            curve[:] = 0.0
+            high, low = list(positions[k]), list(positions[k])
+            high[axis] += POSITION_STEP / 2
+            low[axis] -= POSITION_STEP / 2
+            curve[k] = ensemble.read(0, high) - ensemble.read(0, low)
+    wall_time = time.perf_counter() - start
+
+    curves = {}
+    for p, name in enumerate(parameters):
+        if central:
+            curves[name] = (readings[:, 1 + 2 * p] - readings[:, 2 + 2 * p]) / 2
+        else:
+            curves[name] = readings[:, 1 + p] - readings[:, 0]
+    curves.update(probe_curves)
+    steps.update({name: POSITION_STEP for name, _, _ in probes})
+    return {"time": times, "reference": readings[:, 0], "curves": curves, "steps": steps,
+            "members": len(members), "wall_time": wall_time}
+
+
+def rank(result):
+    """Parameters ordered by their largest effect on a thermistor over the run
+
+    Args:
+        result (dict): Output of sensitivity
+
+    Returns:
+        list: (name, peak per thermistor [°C per step]) from the most to the least influent
+    """
+    peaks = [(name, np.abs(curve).max(axis=0)) for name, curve in result["curves"].items()]
+    return sorted(peaks, key=lambda item: item[1].max(), reverse=True)
+
+
+def describe_step(name, step):
+    """Label of the step of a parameter for the report
+    """
+    return f"{POSITION_STEP:g} mm" if name.endswith(("_x", "_y")) else f"{100 * RELATIVE_STEP:g} % ({step:+.4g})"
+
+
+def print_report(result):
+    """Print the ranked sensitivities
+    """
+    print(f"[INFO] {result['members']} members advanced together in {result['wall_time']:.2f} s")
+    print(f"{'parameter':<16} {'step':>20} " + " ".join(f"{'peak ' + probe + ' [°C]':>14}" for probe in PROBES))
+    for name, peaks in rank(result):
+        print(f"{name:<16} {describe_step(name, result['steps'][name]):>20} " + " ".join(f"{peak:>14.4f}" for peak in peaks))
+
+
+def plot(result, path, top=6):
+    """Plot the sensitivity curves of the most influent parameters, one panel per thermistor
+
+    Args:
+        result (dict): Output of sensitivity
+        path (string): PNG file
+        top (int, optional): Curves per panel. Defaults to 6.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=(14, 5))
+    FigureCanvasAgg(figure)
+    for k, probe in enumerate(PROBES):
+        ax = figure.add_subplot(1, len(PROBES), k + 1)
+        ranked = sorted(result["curves"].items(), key=lambda item: np.abs(item[1][:, k]).max(), reverse=True)
+        for name, curve in ranked[:top]:
+            ax.plot(result["time"], curve[:, k], label=f"{name} ({describe_step(name, result['steps'][name])})")
+        ax.set_title(f"Sensitivity of {probe}")
+        ax.set_xlabel("Time [s]")
+        ax.set_ylabel("Change for one step [°C]")
+        ax.grid(True, alpha=0.3)
+        ax.legend(fontsize=7)
+    figure.tight_layout()
+    figure.savefig(path, dpi=100)
+
+
+def _export(result, path):
+    """Write the curves to a JSON file
+    """
+    with open(path, "w") as file:
+        json.dump({
+            "time": result["time"].tolist(),
+            "reference": result["reference"].tolist(),
+            "steps": result["steps"],
+            "curves": {name: curve.tolist() for name, curve in result["curves"].items()},
+            "ranking": [[name, peaks.tolist()] for name, peaks in rank(result)],
+        }, file)
+
+
+def main(argv):
+    """Rank the parameters of a config by their effect on the thermistors
+
+    Args:
+        argv (list): Command line arguments
+    """
+    from app.core.JSON_Handler import JsonHandler
+    from app.core.plate_transmission import plate_kwargs
+
+    parser = argparse.ArgumentParser(description="Sensitivity of the thermistor traces to the parameters of the plate")
+    parser.add_argument("--config", default="app/Configs/latest.json", help="Simulator config of the plate")
+    parser.add_argument("--duration", type=float, default=None, help="Simulated time [s]. Defaults to the total time of the config.")
+    parser.add_argument("--n", type=int, default=None, help="N of the ensemble. Defaults to the N of the config.")
+    parser.add_argument("--sample", type=float, default=5.0, help="Time between two samples [s]")
+    parser.add_argument("--parameters", default=",".join(PARAMETERS), help=f"Comma separated subset of {','.join(PARAMETERS)}")
+    parser.add_argument("--central", action="store_true", help="Central differences, twice the members")
+    parser.add_argument("--out", default="data", help="Directory of the plot and the JSON curves")
+    args = parser.parse_args(argv)
+
+    json_handler = JsonHandler()
+    if not json_handler.read_json_file(args.config):
+        sys.exit(1)
+    kwargs = plate_kwargs(json_handler.get_data()["plate"])
+    if args.n:
+        kwargs["n"] = args.n
+    result = sensitivity(kwargs, args.duration, args.sample, args.parameters.split(","), args.central)
+    print_report(result)
+
+    os.makedirs(args.out, exist_ok=True)
+    prefix = os.path.join(args.out, f"sensitivity_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    plot(result, prefix + ".png")
+    _export(result, prefix + ".json")
+    print(f"[INFO] Results written to {prefix}.png and {prefix}.json")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,363 @@
+import os
+import queue
+import selectors
+import sys
+import threading
+import time
+from typing import NamedTuple, Optional
+
+from app.core.binary_telemetry import BinaryFrameDecoder, decode_frames, to_records
+from app.core.telemetry import TelemetryRecord, parse_line, synthetic_lines
+
+
+class IngestItem(NamedTuple):
+    """One line or binary frame received from the serial port
+    """
+    arrival: float # time.monotonic() when the bytes were read
+    line: Optional[str] # text line, None for a binary frame
+    record: Optional[TelemetryRecord] # parsed telemetry, None for other text
+    parsed: float # time.monotonic() once parsed
+
+
+class PortReader:
+    """Decoding and queueing of one serial port. Splits the text lines and binary frames of the bytes read
+    (BinaryFrameDecoder), parses them and puts timestamped IngestItem in a bounded queue that the GUI drains
+    in batches with drain. Reading never waits for the GUI: when the queue is full the new items are dropped
+    and counted in dropped, so a stalled GUI cannot overflow the serial driver buffer.
+    """
+    def __init__(self, ser, name="", max_queue=20000):
+        """Initialize the reader
+
+        Args:
+            ser (serial.Serial): Open serial port
+            name (str, optional): Name of the port in the stats. Defaults to "".
+            max_queue (int, optional): Maximum number of items waiting for the GUI. Defaults to 20000.
+        """
+        self.ser = ser
+        self.name = name
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.decoder = BinaryFrameDecoder()
+
+        self.bytes_read = 0
+        self.lines = 0
+        self.frames = 0
+        self.dropped = 0
+        self.max_depth = 0
+
+    def read_available(self, size=None):
+        """Read the waiting bytes and queue what they hold
+
+        Args:
+            size (int, optional): Bytes to read, the read waits up to the port timeout for them. Defaults to the waiting bytes.
+
+        Returns:
+            int: Number of bytes read
+        """
+        data = self.ser.read(size if size is not None else self.ser.in_waiting)
+        if data:
+            self.feed(data, time.monotonic())
+        return len(data)
+
+    def feed(self, data, arrival):
+        """Decode received bytes and queue their lines and frames
+
+        Args:
+            data (bytes): Bytes read from the port
+            arrival (float): time.monotonic() of the read
+        """
+        self.bytes_read += len(data)
+        frames, lines = self.decoder.feed(data)
+        self.lines += len(lines)
+        self.frames += len(frames)
+        parsed_lines = [(line, parse_line(line)) for line in lines]
+        records = to_records(decode_frames(frames)) if len(frames) else []
+        parsed = time.monotonic()
+        for line, record in parsed_lines:
+            self.put(IngestItem(arrival, line, record, parsed))
+        for record in records:
+            self.put(IngestItem(arrival, None, record, parsed))
+
+    def put(self, item):
+        """Queue an item without waiting, counting it as dropped when the queue is full
+
+        Args:
+            item (IngestItem): Item to queue
+        """
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+            return
+        depth = self.queue.qsize()
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+    def drain(self, max_items=None):
+        """Take the waiting items, oldest first
+
+        Args:
+            max_items (int, optional): Maximum number of items taken. Defaults to all of them.
+
+        Returns:
+            list: IngestItem
+        """
+        items = []
+        while max_items is None or len(items) < max_items:
+            try:
+                items.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def stats(self):
+        """Counters of the reader
+
+        Returns:
+            dict: bytes, lines, frames, dropped, queue depth and its maximum
+        """
+        return {
+            "bytes": self.bytes_read,
+            "lines": self.lines,
+            "frames": self.frames,
+            "dropped": self.dropped,
+            "depth": self.queue.qsize(),
+            "max_depth": self.max_depth,
+        }
+
+
+class SerialIngest(threading.Thread):
+    """Reading thread of one serial port: blocking reads of at least one byte, then everything waiting
+    """
+    def __init__(self, ser, max_queue=20000, min_read=1):
+        """Initialize the reading thread, start it with start()
+
+        Args:
+            ser (serial.Serial): Open serial port
+            max_queue (int, optional): Maximum number of items waiting for the GUI. Defaults to 20000.
+            min_read (int, optional): Bytes asked per read when less are waiting. pyserial's socket:// reports at most
+                one waiting byte, give it a chunk size and a short port timeout. Defaults to 1.
+        """
+        super().__init__(daemon=True)
+        self.reader = PortReader(ser, max_queue=max_queue)
+        self.min_read = min_read
+        self.running = True
+        self.error = None
+
+    def run(self):
+        """Read until stop is called or the port fails
+        """
+        while self.running:
+            try:
+                self.reader.read_available(max(self.reader.ser.in_waiting, self.min_read))
+            except Exception as e:
+                self.error = e
+                print(f"[ERROR] Serial error: {e}")
+                break
+        print("Serial reading thread terminated.")
+
+    def drain(self, max_items=None):
+        """Take the waiting items of the port, see PortReader.drain
+        """
+        return self.reader.drain(max_items)
+
+    def stats(self):
+        """Counters of the port, see PortReader.stats
+        """
+        return self.reader.stats()
+
+    def stop(self):
+        """Stop the thread after its current read
+        """
+        self.running = False
+
+
+class MultiSerialIngest(threading.Thread):
+    """One thread reading many serial ports. Where the ports have a file descriptor (POSIX) the thread sleeps
+    in select until one of them has data, so idle ports cost nothing and busy ones are read together;
+    otherwise (Windows COM ports) it polls in_waiting every poll_interval.
+    """
+    def __init__(self, poll_interval=0.005):
+        """Initialize the thread, add the ports with add_port then start it with start()
+
+        Args:
+            poll_interval (float, optional): Time between two polls without select [s]. Defaults to 0.005.
+        """
+        super().__init__(daemon=True)
+        self.poll_interval = poll_interval
+        self.readers = []
+        self.lock = threading.Lock()
+        self.selector = selectors.DefaultSelector()
+        self.polled = []
+        self.fds = {} # File descriptor of each registered reader, kept since a closed port no longer gives it
+        self.running = True
+        self.cpu_time = 0.0
+        self.wakeups = 0
+
+    def add_port(self, ser, name, max_queue=20000):
+        """Serve a new port
+
+        Args:
+            ser (serial.Serial): Open serial port
+            name (string): Name of the port
+            max_queue (int, optional): Maximum number of items waiting for the GUI. Defaults to 20000.
+
+        Returns:
+            PortReader: Reader of the port, drain it to get its items
+        """
+        reader = PortReader(ser, name, max_queue)
+        with self.lock:
+            self.readers.append(reader)
+            try:
+                fd = ser.fileno()
+                self.selector.register(fd, selectors.EVENT_READ, reader)
+                self.fds[reader] = fd
+            except (AttributeError, OSError, ValueError):
+                self.polled.append(reader)
+        return reader
+
+    def remove_port(self, reader):
+        """Stop serving a port
+
+        Args:
+            reader (PortReader): Reader returned by add_port
+        """
+        with self.lock:
+            self.readers.remove(reader)
+            if reader in self.polled:
+                self.polled.remove(reader)
+            elif reader in self.fds:
+                try:
+                    self.selector.unregister(self.fds.pop(reader))
+                except (KeyError, OSError, ValueError):
+                    pass
+
+    def run(self):
+        """Read the ports until stop is called
+        """
+        start_cpu = time.thread_time()
+        while self.running:
+            with self.lock:
+                polled = list(self.polled)
+                registered = bool(self.selector.get_map())
+            if registered:
+                events = self.selector.select(self.poll_interval if polled else 0.1)
+            else:
+                events = []
+                time.sleep(self.poll_interval if polled else 0.1)
+            self.wakeups += 1
+            for key, _ in events:
+                self.__read(key.data)
+            for reader in polled:
+                if reader.ser.in_waiting:
+                    self.__read(reader)
+            self.cpu_time = time.thread_time() - start_cpu
+        print("Serial reading thread terminated.")
+
+    def __read(self, reader):
+        """Read a port, a failing port is removed and reported
+        """
+        try:
+            reader.read_available()
+        except Exception as e:
+            print(f"[ERROR] Serial error on {reader.name}: {e}")
+            self.remove_port(reader)
+
+    def stats(self):
+        """Counters of every port
+
+        Returns:
+            dict: Stats of each PortReader by name, with the thread CPU time and wakeups under "io_thread"
+        """
+        with self.lock:
+            readers = list(self.readers)
+        stats = {reader.name: reader.stats() for reader in readers}
+        stats["io_thread"] = {"cpu_time": self.cpu_time, "wakeups": self.wakeups}
+        return stats
+
+    def stop(self):
+        """Stop the thread after its current wait
+        """
+        self.running = False
+
+
+def open_loopback():
+    """Open a loopback serial port, a pseudo terminal where available (fast) else pyserial's loop://
+
+    Returns:
+        tuple: (serial port to read, function writing bytes to it, function closing the loopback)
+    """
+    import serial
+
+    if os.name == "posix":
+        import tty
+        master, slave = os.openpty()
+        tty.setraw(master)
+        tty.setraw(slave)
+        port = serial.Serial(os.ttyname(slave), timeout=0.1)
+
+        def write(data):
+            view = memoryview(data)
+            while view:
+                view = view[os.write(master, view):]
+
+        def close():
+            port.close()
+            os.close(master)
+            os.close(slave)
+        return port, write, close
+
+    port = serial.serial_for_url("loop://", timeout=0.1)
+
+    def write(data):
+        # loop:// blocks on writes larger than its 4 kB buffer
+        for offset in range(0, len(data), 4096):
+            port.write(data[offset:offset + 4096])
+    return port, write, port.close
+
+
+def benchmark_ingest(n=100000, batch_ms=50, consumer=None):
+    """Send telemetry lines through a loopback port and drain them in batches like the GUI timer does
+
+    Args:
+        n (int, optional): Number of lines. Defaults to 100000.
+        batch_ms (int, optional): Time between two drains [ms]. Defaults to 50.
+        consumer (function, optional): Called with each drained batch, stands for the GUI work. Defaults to None.
+
+    Returns:
+        dict: Lines per second end to end, consumer time per 1000 lines [ms], dropped items and the reader counters
+    """
+    port, write, close = open_loopback()
+    ingest = SerialIngest(port)
+    ingest.start()
+    data = ("\n".join(synthetic_lines(n)) + "\n").encode("ascii")
+    writer = threading.Thread(target=write, args=(data,), daemon=True)
+
+    received = 0
+    consumer_time = 0.0
+    start = time.perf_counter()
+    writer.start()
+    while received + ingest.reader.dropped < n and time.perf_counter() - start < 60:
+        time.sleep(batch_ms / 1000)
+        items = ingest.drain()
+        t0 = time.perf_counter()
+        if consumer is not None:
+            consumer(items)
+        consumer_time += time.perf_counter() - t0
+        received += len(items)
+    elapsed = time.perf_counter() - start
+    ingest.stop()
+    ingest.join()
+    close()
+
+    result = {
+        "lines_per_s": received / elapsed,
+        "consumer_ms_per_1000_lines": 1000 * consumer_time / max(received, 1) * 1000,
+        "received": received,
+    }
+    result.update(ingest.stats())
+    return result
+
+
+if __name__ == "__main__":
+    for name, value in benchmark_ingest(int(sys.argv[1]) if len(sys.argv) > 1 else 100000).items():
+        print(f"{name}: {value}")
@@ -0,0 +1,154 @@
+import time
+from collections import deque
+
+
+class SimulationPacer:
+    """Decide how many solver steps to run on each GUI tick so that the simulated time
+    advances at a target real-time factor (simulated seconds per wall-clock second).
+    The pacer keeps a debt of simulated time owed to the wall clock, estimates the cost of
+    one solver step on the fly and caps the work of a tick to a frame budget. When the
+    simulation cannot keep up, render frames are skipped (down to a minimum frame rate)
+    so the solver gets the CPU time instead.
+    """
+    MAX = "max"
+
+    def __init__(self, dt, target_rtf=1.0, frame_budget=0.03, max_fps=30.0, min_fps=2.0,
+                 clock=time.perf_counter):
+        """Initialize the pacer.
+
+        Args:
+            dt (float): Solver time step [s].
+            target_rtf (float or str, optional): Target real-time factor, SimulationPacer.MAX to run as fast as possible. Defaults to 1.0.
+            frame_budget (float, optional): Wall time [s] the solver may use during one tick. Defaults to 0.03.
+            max_fps (float, optional): Maximum number of renders per second. Defaults to 30.0.
+            min_fps (float, optional): Minimum number of renders per second, even when behind. Defaults to 2.0.
+            clock (function, optional): Monotonic clock returning seconds. Defaults to time.perf_counter.
+        """
+        self.dt = dt
+        self.frame_budget = frame_budget
+        self.max_fps = max_fps
+        self.min_fps = min_fps
+        self.clock = clock
+
+        self.step_cost = None # Moving average of the wall time of one step [s]
+        self.debt = 0.0 # Simulated time owed to the wall clock [s]
+        self.behind = False
+        self.skipped_frames = 0
+        self.last_tick = None
+        self.last_render = None
+        self.history = deque() # (wall time, simulated time, steps done) over the last second
+        self.total_steps = 0
+        self.sim_time = 0.0
+        self.set_target(target_rtf)
+
+    def set_target(self, target_rtf):
+        """Change the target real-time factor, the debt is cleared so that the new target starts from now.
+
+        Args:
+            target_rtf (float or str): Target real-time factor or SimulationPacer.MAX
+        """
+        if target_rtf != self.MAX:
+            target_rtf = float(target_rtf)
+            if target_rtf <= 0:
+                raise ValueError("Real-time factor must be positive")
+        self.target_rtf = target_rtf
+        self.debt = 0.0
+        self.last_tick = None
+        self.history.clear()
+
+    def plan_steps(self):
+        """Compute the number of steps to run during the current tick.
+
+        Returns:
+            int: Number of solver steps to run now
+        """
+        now = self.clock()
+        if self.last_tick is None:
+            self.last_tick = now
+            self.last_render = now
+        elapsed = now - self.last_tick
+        self.last_tick = now
+
+        cost = self.step_cost if self.step_cost else self.dt
+        budget_steps = max(1, int(self.frame_budget / cost))
+        if self.target_rtf == self.MAX:
+            self.behind = True
+            return budget_steps
+
+        self.debt += elapsed * self.target_rtf
+        owed = int(self.debt / self.dt)
+        steps = min(owed, budget_steps)
+        self.behind = owed > budget_steps
+        if self.behind:
+            # Do not let the debt grow without bound when the machine is too slow, drop what cannot be caught up within a frame
+            self.debt = min(self.debt, 2 * budget_steps * self.dt)
+        return steps
+
+    def record_steps(self, steps, duration):
+        """Account for the steps done during the tick.
+
+        Args:
+            steps (int): Number of steps done
+            duration (float): Wall time spent doing them [s]
+        """
+        if steps <= 0:
+            return
+        cost = duration / steps
+        self.step_cost = cost if self.step_cost is None else 0.8 * self.step_cost + 0.2 * cost
+        if self.target_rtf != self.MAX:
+            self.debt -= steps * self.dt
+        self.total_steps += steps
+        self.sim_time += steps * self.dt
+
+        now = self.clock()
+        self.history.append((now, self.sim_time, self.total_steps))
+        while len(self.history) > 2 and now - self.history[0][0] > 1.0:
+            self.history.popleft()
+
+    def should_render(self):
+        """Tell if the current tick should be rendered. Renders are capped to max_fps and skipped
+        while behind, but at least min_fps renders are done.
+
+        Returns:
+            bool: True if the plots should be redrawn
+        """
+        now = self.clock()
+        since = now - self.last_render if self.last_render is not None else float("inf")
+        render = since >= 1.0 / self.max_fps and (not self.behind or since >= 1.0 / self.min_fps)
+        if render:
+            self.last_render = now
+        else:
+            self.skipped_frames += 1
+        return render
+
+    def achieved_rtf(self):
+        """Real-time factor measured over the last second.
+
+        Returns:
+            float: Simulated seconds per wall second, 0 if unknown
+        """
+        if len(self.history) < 2:
+            return 0.0
+        (w0, s0, _), (w1, s1, _) = self.history[0], self.history[-1]
+        return (s1 - s0) / (w1 - w0) if w1 > w0 else 0.0
+
+    def steps_per_second(self):
+        """Solver steps per wall second measured over the last second.
+
+        Returns:
+            float: Steps per second, 0 if unknown
+        """
+        if len(self.history) < 2:
+            return 0.0
+        (w0, _, n0), (w1, _, n1) = self.history[0], self.history[-1]
+        return (n1 - n0) / (w1 - w0) if w1 > w0 else 0.0
+
+    def status_text(self):
+        """Text summary for the UI.
+
+        Returns:
+            string: Achieved real-time factor, steps per second and skipped renders
+        """
+        target = "max" if self.target_rtf == self.MAX else f"{self.target_rtf:g}x"
+        return (f"Facteur temps réel: {self.achieved_rtf():.2f}x (cible {target}) | "
+                f"{self.steps_per_second():.0f} pas/s | images sautées: {self.skipped_frames}")
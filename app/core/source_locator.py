@@ -0,0 +1,598 @@
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+from app.core.plate_transmission import Plate, plate_kwargs
+from app.core import sensitivity
+from app.core.result_cache import ResultCache, cache_key, files_version
+from app.core.sensitivity import PlateEnsemble
+
+# Keys of the "plate" section defining the probe responses (geometry, material, mesh, thermistors), the cache key of a library
+LIBRARY_KEYS = ("Length X [mm]:", "Length Y [mm]:", "Thickness [mm]:", "N:", "Thermal Conductivity [W/mK]:",
+                "Density [kg/m3]:", "Heat Capacity [J/kgK]:", "Convection Coeff [W/m2K]:",
+                "Position thermistance 1 [(X, Y)]:", "Position thermistance 2 [(X, Y)]:", "Position thermistance 3 [(X, Y)]:")
+# Files building the libraries besides the solver: the ensemble scheme and the layout of this module
+LIBRARY_FILES = (os.path.abspath(sensitivity.__file__), os.path.abspath(__file__))
+PROBES = ("t1", "t2", "t3")
+COARSE_SAMPLES = 120 # Samples of the time axis of the scan of every cell, onsets and stops are tried on each of them
+REFINED_CELLS = 10 # Best cells of the scan refined to the period of the library
+CELL_CHUNK = 256 # Cells scanned together, bounds the memory of the scan
+MAX_ROUNDS = 4 # Rounds of timing refinement and location search after the scan
+
+
+def build_library(kwargs, horizon, period=1.0):
+    """Step responses of the thermistors to a 1 W source on every cell of the plate, from one ensemble run.
+    The explicit scheme is linear and its operator is symmetric, so the reading of thermistor k for a source
+    on cell c is the temperature of cell c for a source on thermistor k: one member per thermistor gives the
+    responses of all the cells at once. The four corner cells are the exception, they take heat from their
+    neighbours but give none back, so a source there never reaches the thermistors and their response is zero.
+    A fourth member holds the response of the thermistors to a uniform 1 K initial excess over the ambient.
+
+    Args:
+        kwargs (dict): Plate arguments (plate_kwargs of a config)
+        horizon (float): Duration of the responses [s]
+        period (float, optional): Time between two samples of the responses [s]. Defaults to 1.0.
+
+    Returns:
+        dict: "steps" (nx, ny, samples, 3) [K/W], cell major for the locator, "initial" (samples, 3) [K/K] and "period" [s]
+    """
+    base = dict(kwargs, total_time=horizon, ambient_temp=-273.0, initial_plate_temp=0.0, amp_in=1.0, power_transfer=1.0,
+                start_heat_time=0.0, stop_heat_time=math.inf, perturbation=0.0)
+    plate = Plate(**base)
+    # Sources on the centre of the thermistor cells, so that they are not spread over the neighbours
+    members = [{"position_heat_source": (i * plate.dx * 1000, j * plate.dy * 1000)} for i, j in plate.thermistances_indices]
+    members.append({"amp_in": 0.0, "initial_plate_temp": 1.0})
+    ensemble = PlateEnsemble(base, members)
+
+    samples = int(horizon / period + 0.5) + 1
+    steps = np.zeros((plate.nx, plate.ny, samples, 3), dtype=np.float32)
+    initial = np.zeros((samples, 3))
+    initial[0] = 1.0
+    for m in range(1, samples):
+        ensemble.advance(m * period - ensemble.current_time)
+        steps[:, :, m] = ensemble.temps[:3].transpose(1, 2, 0)
+        initial[m] = [ensemble.temps[(3,) + index] for index in plate.thermistances_indices]
+    steps[[0, 0, -1, -1], [0, -1, 0, -1]] = 0.0
+    return {"steps": steps, "initial": initial, "period": np.array(period)}
+
+
+def load_library(plate_params, horizon, period=1.0, cache=None):
+    """Probe responses of a plate, from the cache or built and cached
+
+    Args:
+        plate_params (dict): "plate" section of a config
+        horizon (float): Duration of the responses [s]
+        period (float, optional): Time between two samples [s]. Defaults to 1.0.
+        cache (ResultCache, optional): Cache of the libraries. Defaults to None (Data/cache).
+
+    Returns:
+        tuple: (library dict of build_library, True if read from the cache)
+    """
+    cache = cache or ResultCache()
+    key = cache_key({name: plate_params[name] for name in LIBRARY_KEYS}, Plate.solver_mode,
+                    {"library": "probe responses", "horizon": horizon, "period": period, "version": files_version(LIBRARY_FILES)})
+    library = cache.get(key, "probe_responses")
+    if library is not None:
+        return library, True
+    library = build_library(plate_kwargs(plate_params), horizon, period)
+    cache.put(key, library, "probe_responses", meta={"kind": "probe responses", "horizon": horizon, "period": period})
+    return library, False
+
+
+def baseline(library, kwargs, power, ambient, initial_excess):
+    """Thermistors of the plate without perturbation, by superposition of the library responses
+
+    Args:
+        library (dict): Output of build_library
+        kwargs (dict): Plate arguments, for the heater cell
+        power (np.array): Heater power on each period of the library [W]
+        ambient (float): Ambient temperature [°C]
+        initial_excess (float): Initial temperature of the plate above the ambient [°C]
+
+    Returns:
+        np.array: Temperatures (samples, 3) [°C]
+    """
+    samples = len(power)
+    heater = Plate(**dict(kwargs, total_time=0)).p_in_location
+    response = library["steps"][heater[0], heater[1], :samples].astype(float)
+    changes = np.diff(power, prepend=0.0)
+    temps = ambient + initial_excess * library["initial"][:samples]
+    for k in range(3):
+        temps[:, k] += np.convolve(changes, response[:, k])[:samples]
+    return temps
+
+
+def _scan(residual, responses):
+    """Best rectangular power pulse on every candidate cell, for onsets and stops on every sample.
+    A pulse from onset s to stop e is the step response delayed by s minus the one delayed by e, its best power
+    is linear least squares. The inner products of the delayed responses are windowed autocorrelations,
+    computed once per delay instead of once per pair of onsets.
+
+    Args:
+        residual (np.array): Measured minus baseline (samples, 3) [°C]
+        responses (np.array): Step responses of the candidate cells (samples, 3, cells) [K/W]
+
+    Returns:
+        tuple: Reduction of the squared residual, onset and stop sample (-1 if the pulse does not stop) per cell
+    """
+    last = len(residual) - 1
+    cells = responses.shape[2]
+    count = last # Onsets 0 .. last - 1
+    projections = np.array([residual[s:].ravel() @ responses[:last + 1 - s].reshape(-1, cells) for s in range(count)])
+    gram = np.zeros((count, count, cells))
+    for lag in range(count):
+        correlation = np.cumsum(np.einsum("jkc,jkc->jc", responses[lag:], responses[:last + 1 - lag]), axis=0)
+        b = np.arange(lag, count)
+        gram[b - lag, b] = correlation[last - b]
+        gram[b, b - lag] = gram[b - lag, b]
+
+    diagonal = gram[np.arange(count), np.arange(count)]
+    best = np.zeros(cells)
+    start = np.zeros(cells, dtype=int)
+    stop = np.full(cells, -1)
+    columns = np.arange(cells)
+    for a in range(count):
+        # Stops at the following samples, then no stop within the trace
+        numerator = np.vstack([projections[a] - projections[a + 1:], projections[a][None]])
+        denominator = np.vstack([diagonal[a] - 2 * gram[a, a + 1:] + diagonal[a + 1:], diagonal[a][None]])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            reduction = np.where(denominator > 0, numerator**2 / denominator, 0.0)
+        k = reduction.argmax(axis=0)
+        better = reduction[k, columns] > best
+        best[better] = reduction[k, columns][better]
+        start[better] = a
+        stop[better] = np.where(k == count - a - 1, -1, a + 1 + k)[better]
+    return best, start, stop
+
+
+def _pulses(responses, start, stop):
+    """Response of every cell to a 1 W pulse from its onset to its stop sample
+
+    Args:
+        responses (np.array): Step responses (cells, samples, 3) [K/W]
+        start (np.array): Onset sample per cell
+        stop (np.array): Stop sample per cell, -1 if the pulse does not stop
+
+    Returns:
+        np.array: Pulse responses (cells, samples, 3) [K/W]
+    """
+    samples = responses.shape[1]
+    pulses = np.zeros(responses.shape)
+    # Cells sharing a delay are shifted together, the timings come from a coarse grid so there are few of them
+    for shift in np.unique(start):
+        rows = np.flatnonzero(start == shift)
+        pulses[rows, shift:] += responses[rows, :samples - shift]
+    for shift in np.unique(stop[stop >= 0]):
+        rows = np.flatnonzero(stop == shift)
+        pulses[rows, shift:] -= responses[rows, :samples - shift]
+    return pulses
+
+
+def _evaluate(residual, responses, start, stop):
+    """Best power and squared residual of every cell for a pulse of given timing
+
+    Args:
+        residual (np.array): Measured minus baseline (samples, 3) [°C]
+        responses (np.array): Step responses (cells, samples, 3) [K/W]
+        start (np.array): Onset sample per cell
+        stop (np.array): Stop sample per cell, -1 if the pulse does not stop
+
+    Returns:
+        tuple: (power [W], squared residual [°C²]) per cell
+    """
+    cells = len(responses)
+    projections = np.empty(cells)
+    norms = np.empty(cells)
+    for first in range(0, cells, CELL_CHUNK):
+        chunk = slice(first, first + CELL_CHUNK)
+        pulses = _pulses(responses[chunk], start[chunk], stop[chunk])
+        projections[chunk] = np.einsum("cmk,mk->c", pulses, residual)
+        norms[chunk] = np.einsum("cmk,cmk->c", pulses, pulses)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        powers = np.where(norms > 0, projections / norms, 0.0)
+        squares = np.sum(residual**2) - np.where(norms > 0, projections**2 / norms, 0.0)
+    return powers, squares
+
+
+def _around(residual, responses, start, stop, reach=1):
+    """Best power and squared residual of every cell for the pulses within `reach` samples of a common timing.
+    The norm of the pulse from s to e is the energy of the step response delayed by s, plus the one delayed by e,
+    minus twice their product, a lagged product of the response: a few products per cell cover all the pairs.
+
+    Args:
+        residual (np.array): Measured minus baseline (samples, 3) [°C]
+        responses (np.array): Step responses (cells, samples, 3) [K/W]
+        start (int): Common onset sample
+        stop (int): Common stop sample, -1 if the pulse does not stop
+        reach (int, optional): Samples tried on each side of the common timing. Defaults to 1.
+
+    Returns:
+        tuple: (power [W], squared residual [°C²], onset, stop) per cell
+    """
+    cells, samples = responses.shape[:2]
+    onsets = list(range(max(start - reach, 0), min(start + reach, samples - 2) + 1))
+    ends = [-1] if stop < 0 else list(range(max(stop - reach, 1), min(stop + reach, samples - 1) + 1))
+    pairs = [(s, e) for s in onsets for e in ends if e < 0 or e > s]
+    total = float(np.sum(residual**2))
+    powers = np.zeros(cells)
+    squares = np.full(cells, total)
+    starts = np.full(cells, start)
+    stops = np.full(cells, stop)
+    for first in range(0, cells, CELL_CHUNK):
+        chunk = slice(first, first + CELL_CHUNK)
+        response = responses[chunk].astype(float)
+        energy = np.concatenate([np.zeros((len(response), 1)), np.cumsum(np.einsum("cmk,cmk->cm", response, response), axis=1)], axis=1)
+        projection = {shift: np.einsum("cmk,mk->c", response[:, :samples - shift], residual[shift:])
+                      for shift in set(onsets + ends) if shift >= 0}
+        for s, e in pairs:
+            numerator = projection[s] - (projection[e] if e >= 0 else 0.0)
+            norm = energy[:, samples - s]
+            if e >= 0:
+                norm = norm + energy[:, samples - e] - 2 * np.einsum("cmk,cmk->c", response[:, :samples - e], response[:, e - s:samples - s])
+            with np.errstate(divide="ignore", invalid="ignore"):
+                fitted = np.where(norm > 0, total - numerator**2 / norm, total)
+                better = fitted < squares[chunk]
+                powers[chunk] = np.where(better, numerator / norm, powers[chunk])
+            squares[chunk] = np.where(better, fitted, squares[chunk])
+            starts[chunk] = np.where(better, s, starts[chunk])
+            stops[chunk] = np.where(better, e, stops[chunk])
+    return powers, squares, starts, stops
+
+
+def _refine(residual, response, start, stop, window):
+    """Onset and stop of the pulse of one cell to the sample, around a coarse estimate
+
+    Args:
+        residual (np.array): Measured minus baseline (samples, 3) [°C]
+        response (np.array): Step response of the cell (samples, 3) [K/W]
+        start (int): Coarse onset sample
+        stop (int): Coarse stop sample, -1 if the pulse does not stop
+        window (int): Samples tried on each side of the coarse values
+
+    Returns:
+        tuple: (reduction of the squared residual, power [W], onset, stop)
+    """
+    samples = len(residual)
+    # A pulse that does not stop competes with the stops around the coarse one, or near the end of the trace
+    centre = stop if stop >= 0 else samples - 1
+    stops = np.array([-1] + list(range(max(centre - window, 1), min(centre + window, samples - 1) + 1)))
+    onsets = np.arange(max(start - window, 0), min(start + window, samples - 2) + 1)
+    # Every pair is a rising step minus a falling one: their norms and cross products give all the pairs at once
+    rising = _pulses(np.repeat(response[None], len(onsets), axis=0), onsets, np.full(len(onsets), -1))
+    falling = _pulses(np.repeat(response[None], len(stops), axis=0), np.where(stops >= 0, stops, samples), np.full(len(stops), -1))
+    projections = (rising.reshape(len(onsets), -1) @ residual.ravel())[:, None] - (falling.reshape(len(stops), -1) @ residual.ravel())[None]
+    norms = (np.einsum("amk,amk->a", rising, rising)[:, None] + np.einsum("bmk,bmk->b", falling, falling)[None]
+             - 2 * rising.reshape(len(onsets), -1) @ falling.reshape(len(stops), -1).T)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        reduction = np.where((norms > 0) & ((stops[None] > onsets[:, None]) | (stops[None] < 0)), projections**2 / norms, 0.0)
+    a, k = np.unravel_index(int(reduction.argmax()), reduction.shape)
+    if reduction[a, k] <= 0:
+        return 0.0, 0.0, start, stop
+    return float(reduction[a, k]), float(projections[a, k] / norms[a, k]), int(onsets[a]), int(stops[k])
+
+
+def locate(library, residual, stride=1, timing_step=None):
+    """Fit location, power and timing of a perturbation source to the residual of the thermistors.
+    Every candidate cell is fitted with its best rectangular pulse on a time axis decimated to `timing_step`,
+    the timing of the best cells is then refined to the period of the library and tried on every cell.
+    The confidence of a cell is the likelihood of its best fit for independent gaussian noise of the variance
+    of the best fit, normalised over the cells: successive samples are correlated, so read it as a relative
+    map rather than calibrated probabilities.
+    With the three thermistors on one line, a source and its mirror image across that line read almost the same.
+
+    Args:
+        library (dict): Output of build_library
+        residual (np.array): Measured minus baseline on the samples of the library (samples, 3) [°C]
+        stride (int, optional): Cells between two candidates. Defaults to 1 (every cell).
+        timing_step (float, optional): Time between two onsets of the coarse scan [s]. Defaults to COARSE_SAMPLES over the trace.
+
+    Returns:
+        dict: "cell", "power" [W], "start" and "stop" [s] (stop None if not within the trace), "confidence"
+              (candidates x, candidates y), "cells_x", "cells_y", "fit" (samples, 3) [°C], "rms_before",
+              "rms_after" [°C] and "wall_time" [s]
+    """
+    begin = time.perf_counter()
+    period = float(library["period"])
+    samples = len(residual)
+    nx, ny = library["steps"].shape[:2]
+    cells_x, cells_y = np.arange(0, nx, stride), np.arange(0, ny, stride)
+    # One float32 row per cell, a view of the library for stride 1: the cells sharing a delay are shifted by copying rows
+    responses = library["steps"][::stride, ::stride, :samples].reshape(-1, samples, 3)
+    cells = len(responses)
+    if timing_step is None:
+        timing_step = period * math.ceil((samples - 1) / COARSE_SAMPLES)
+    factor = max(1, int(round(timing_step / period)))
+
+    starts = np.zeros(cells, dtype=int)
+    stops = np.zeros(cells, dtype=int)
+    for first in range(0, cells, CELL_CHUNK):
+        chunk = slice(first, first + CELL_CHUNK)
+        _, starts[chunk], stops[chunk] = _scan(residual[::factor], responses[chunk, ::factor].transpose(1, 2, 0).astype(float))
+    starts *= factor
+    stops = np.where(stops >= 0, stops * factor, -1)
+
+    # Least squares of every cell at its coarse timing, on all the samples
+    total = float(np.sum(residual**2))
+    powers, squares = _evaluate(residual, responses, starts, stops)
+    # A timing off by a fraction of the coarse step hurts the cells near the thermistors (sharp responses) more than
+    # the far ones: alternate between refining the timing of the best cells and trying every cell at the best timing
+    best = -1
+    for _ in range(MAX_ROUNDS):
+        for c in np.argsort(squares)[:REFINED_CELLS]:
+            reduction, power, start, stop = _refine(residual, responses[c].astype(float), starts[c], stops[c], factor)
+            if total - reduction < squares[c]:
+                squares[c], powers[c], starts[c], stops[c] = total - reduction, power, start, stop
+        if int(np.argmin(squares)) == best:
+            break
+        best = int(np.argmin(squares))
+        common_starts, common_stops = np.full(cells, starts[best]), np.full(cells, stops[best])
+        common_powers, common_squares = _evaluate(residual, responses, common_starts, common_stops)
+        better = common_squares < squares
+        powers[better], squares[better] = common_powers[better], common_squares[better]
+        starts[better], stops[better] = common_starts[better], common_stops[better]
+    # A cell left one sample off the best timing would look far less likely than it is
+    near_powers, near_squares, near_starts, near_stops = _around(residual, responses, starts[best], stops[best])
+    better = near_squares < squares
+    powers[better], squares[better] = near_powers[better], near_squares[better]
+    starts[better], stops[better] = near_starts[better], near_stops[better]
+    squares = np.maximum(squares, 0.0)
+
+    best = int(np.argmin(squares))
+    variance = max(squares[best] / max(residual.size - 5, 1), 1e-12)
+    likelihood = np.exp(-(squares - squares[best]) / (2 * variance))
+    confidence = (likelihood / likelihood.sum()).reshape(len(cells_x), len(cells_y))
+    fit = powers[best] * _pulses(responses[best:best + 1], starts[best:best + 1], stops[best:best + 1])[0]
+    cell = (int(cells_x[best // len(cells_y)]), int(cells_y[best % len(cells_y)]))
+    return {"cell": cell, "power": float(powers[best]), "start": starts[best] * period,
+            "stop": None if stops[best] < 0 else stops[best] * period,
+            "confidence": confidence, "cells_x": cells_x, "cells_y": cells_y, "fit": fit,
+            "rms_before": math.sqrt(total / residual.size), "rms_after": math.sqrt(float(np.mean((residual - fit)**2))),
+            "wall_time": time.perf_counter() - begin}
+
+
+def credible_cells(confidence, level=0.9):
+    """Number of candidate cells holding `level` of the confidence, the most likely first
+    """
+    ordered = np.sort(confidence.ravel())[::-1]
+    return int(np.searchsorted(np.cumsum(ordered), level) + 1)
+
+
+def synthesise(kwargs, position, power, start, stop, duration, period=1.0, noise=0.0, seed=0):
+    """Thermistor trace of the simulator with a perturbation, to test the locator
+
+    Args:
+        kwargs (dict): Plate arguments (plate_kwargs of a config)
+        position (tuple): Position of the perturbation [(X, Y) mm]
+        power (float): Power of the perturbation [W]
+        start (float): Start of the perturbation [s]
+        stop (float): Stop of the perturbation [s]
+        duration (float): Simulated time [s]
+        period (float, optional): Time between two readings [s]. Defaults to 1.0.
+        noise (float, optional): Standard deviation of the gaussian noise added to the readings [°C]. Defaults to 0.0.
+        seed (int, optional): Seed of the noise. Defaults to 0.
+
+    Returns:
+        dict: Trace in the format of load_trace
+    """
+    plate = Plate(**dict(kwargs, total_time=duration, position_perturbation=position, perturbation=power,
+                         start_perturbation=start, stop_perturbation=stop))
+    times = np.arange(0.0, duration + period / 2, period)
+    readings = np.empty((len(times), 3))
+    powers = np.empty(len(times))
+    for m, sample_time in enumerate(times):
+        plate.advance(sample_time - plate.current_time)
+        readings[m] = plate.read_thermistors()
+        powers[m] = plate.power_in if plate.start_heat_time <= sample_time < plate.stop_heat_time else 0.0
+    readings += np.random.default_rng(seed).normal(0.0, noise, readings.shape) if noise > 0 else 0.0
+    return {"time": times, "readings": readings, "power": powers, "ambient": None,
+            "truth": {"cell": plate.pert_location, "power": power, "start": start, "stop": stop}}
+
+
+def load_trace(path):
+    """Read the thermistors and the heater power of a run file (simulator, serial monitor or headless recorder)
+
+    Args:
+        path (string): Run file (.d2run)
+
+    Returns:
+        dict: "time" [s] from the first row, "readings" (rows, 3) [°C], "power" [W] or "command" [%] of the heater
+              (None if not recorded), "ambient" (median of t4 if recorded) [°C], "plate" (section of the run if
+              recorded) and "truth" (perturbation of a simulator run)
+    """
+    from app.core.run_writer import read_run
+
+    header, data = read_run(path, mmap=False)
+    columns = {name: data[:, k] for k, name in enumerate(header["columns"])}
+    params = header.get("params", {})
+    trace = {"time": columns["time"] - columns["time"][0], "readings": np.column_stack([columns[p] for p in PROBES]),
+             "power": columns.get("power"), "command": None, "ambient": None,
+             "plate": params.get("plate"), "truth": None}
+    if "u" in columns:
+        # The monitor records U = 10 * pwm / pwm_max - 5 [V], pwm_to_command gives -20 U [%]
+        trace["command"] = -20.0 * columns["u"]
+    if trace["command"] is None and "pwm" in columns:
+        ratio = np.divide(columns["pwm"], columns["pwm_max"], out=np.zeros(len(data)), where=columns["pwm_max"] != 0)
+        trace["command"] = -ratio * 200 + 100 # pwm_to_command
+    if "t4" in columns:
+        # t4 reads the air next to the plate, not the plate
+        trace["ambient"] = float(np.nanmedian(columns["t4"]))
+    if trace["plate"] is not None and "perturbation" in columns and np.any(columns["perturbation"] != 0):
+        kwargs = plate_kwargs(trace["plate"])
+        trace["truth"] = {"cell": Plate(**dict(kwargs, total_time=0)).pert_location, "power": kwargs["perturbation"],
+                          "start": kwargs["start_perturbation"], "stop": kwargs["stop_perturbation"]}
+    return trace
+
+
+def residual_of(trace, library, kwargs):
+    """Resample a trace on the samples of the library and remove the response to the heater and the initial state
+
+    Args:
+        trace (dict): Output of load_trace or synthesise
+        library (dict): Output of build_library
+        kwargs (dict): Plate arguments of the model
+
+    Returns:
+        tuple: (times (samples,) [s], measured (samples, 3) [°C], baseline (samples, 3) [°C])
+    """
+    period = float(library["period"])
+    samples = min(int(trace["time"][-1] / period) + 1, len(library["initial"]))
+    times = np.arange(samples) * period
+    measured = np.column_stack([np.interp(times, trace["time"], trace["readings"][:, k]) for k in range(3)])
+    # The power of a sample holds until the next one
+    held = np.clip(np.searchsorted(trace["time"], times, side="right") - 1, 0, len(trace["time"]) - 1)
+    if trace.get("power") is not None:
+        power = trace["power"][held]
+    elif trace.get("command") is not None:
+        power = trace["command"][held] / 100.0 * kwargs["amp_in"] * kwargs["power_transfer"]
+    else:
+        power = np.where((kwargs["start_heat_time"] <= times) & (times < kwargs["stop_heat_time"]),
+                         kwargs["amp_in"] * kwargs["power_transfer"], 0.0)
+    ambient = kwargs["ambient_temp"] if trace.get("ambient") is None else trace["ambient"]
+    initial_excess = float(np.mean(measured[0])) - ambient
+    return times, measured, baseline(library, kwargs, power, ambient, initial_excess)
+
+
+def print_report(result, plate, truth=None):
+    """Print the fitted source and, when known, the true one
+    """
+    i, j = result["cell"]
+    stop = "end of the trace" if result["stop"] is None else f"{result['stop']:.0f} s"
+    cell_area = plate.dx * plate.dy * 1e6 * (result["cells_x"][1] - result["cells_x"][0] if len(result["cells_x"]) > 1 else 1)**2
+    print(f"[INFO] Source at cell ({i}, {j}) = ({i * plate.dx * 1000:.1f}, {j * plate.dy * 1000:.1f}) mm, "
+          f"{result['power']:+.3f} W from {result['start']:.0f} s to {stop}")
+    print(f"[INFO] RMS residual {result['rms_before']:.4f} -> {result['rms_after']:.4f} °C, "
+          f"confidence {result['confidence'].max():.2f} on the best cell, 90 % within "
+          f"{credible_cells(result['confidence']) * cell_area:.0f} mm², fitted in {result['wall_time']:.2f} s")
+    if truth is not None:
+        ti, tj = truth["cell"]
+        print(f"[INFO] True source at cell ({ti}, {tj}), {truth['power']:+.3f} W from {truth['start']:.0f} s to "
+              f"{truth['stop']:.0f} s, {math.hypot((ti - i) * plate.dx, (tj - j) * plate.dy) * 1000:.1f} mm from the fit")
+
+
+def plot(result, plate, times, residual, path, truth=None):
+    """Plot the confidence map over the plate and the fitted pulse against the residual of each thermistor
+
+    Args:
+        result (dict): Output of locate
+        plate (Plate): Plate of the model, for the positions
+        times (np.array): Times of the residual [s]
+        residual (np.array): Measured minus baseline (samples, 3) [°C]
+        path (string): PNG file
+        truth (dict, optional): True source. Defaults to None.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    mm_x, mm_y = plate.dx * 1000, plate.dy * 1000
+    figure = Figure(figsize=(14, 5))
+    FigureCanvasAgg(figure)
+    ax = figure.add_subplot(1, 2, 1)
+    image = ax.imshow(result["confidence"].T, origin="lower", aspect="equal", cmap="viridis",
+                      extent=[result["cells_x"][0] * mm_x, (result["cells_x"][-1] + 1) * mm_x,
+                              result["cells_y"][0] * mm_y, (result["cells_y"][-1] + 1) * mm_y])
+    figure.colorbar(image, ax=ax, label="Confidence")
+    for k, (i, j) in enumerate(plate.thermistances_indices):
+        ax.plot((i + 0.5) * mm_x, (j + 0.5) * mm_y, "w^")
+        ax.annotate(PROBES[k], ((i + 0.5) * mm_x, (j + 0.5) * mm_y), color="white", xytext=(4, 4), textcoords="offset points")
+    ax.plot((plate.p_in_location[0] + 0.5) * mm_x, (plate.p_in_location[1] + 0.5) * mm_y, "ws", label="heater")
+    ax.plot((result["cell"][0] + 0.5) * mm_x, (result["cell"][1] + 0.5) * mm_y, "rx", markersize=10, label="fit")
+    if truth is not None:
+        ax.plot((truth["cell"][0] + 0.5) * mm_x, (truth["cell"][1] + 0.5) * mm_y, "o", mfc="none", mec="orange",
+                markersize=10, label="true")
+    ax.set_xlabel("X [mm]")
+    ax.set_ylabel("Y [mm]")
+    ax.set_title("Location of the perturbation")
+    ax.legend(fontsize=8, loc="upper right")
+
+    ax = figure.add_subplot(1, 2, 2)
+    for k, probe in enumerate(PROBES):
+        line, = ax.plot(times, residual[:, k], ".", markersize=2, label=f"{probe} measured - model")
+        ax.plot(times, result["fit"][:, k], color=line.get_color(), label=f"{probe} fitted source")
+    ax.set_xlabel("Time [s]")
+    ax.set_ylabel("Temperature [°C]")
+    ax.set_title(f"{result['power']:+.3f} W from {result['start']:.0f} s")
+    ax.grid(True, alpha=0.3)
+    ax.legend(fontsize=7)
+    figure.tight_layout()
+    figure.savefig(path, dpi=100)
+
+
+def _export(result, plate, truth, path):
+    """Write the fit and the confidence map to a JSON file
+    """
+    with open(path, "w") as file:
+        json.dump({
+            "cell": result["cell"],
+            "position_mm": [result["cell"][0] * plate.dx * 1000, result["cell"][1] * plate.dy * 1000],
+            "power": result["power"],
+            "start": result["start"],
+            "stop": result["stop"],
+            "rms_before": result["rms_before"],
+            "rms_after": result["rms_after"],
+            "cells_x": result["cells_x"].tolist(),
+            "cells_y": result["cells_y"].tolist(),
+            "confidence": result["confidence"].tolist(),
+            "truth": None if truth is None else {key: list(value) if key == "cell" else value for key, value in truth.items()},
+        }, file, indent=4)
+
+
+def main(argv):
+    """Locate a perturbation source from a thermistor trace, recorded or simulated
+
+    Args:
+        argv (list): Command line arguments
+    """
+    from app.core.JSON_Handler import JsonHandler
+
+    parser = argparse.ArgumentParser(description="Location, power and timing of a perturbation from the thermistors")
+    parser.add_argument("--config", default="app/Configs/latest.json", help="Simulator config of the plate, a simulator run uses its own")
+    parser.add_argument("--trace", default=None, help="Run file (.d2run) of the simulator, the monitor or the headless recorder")
+    parser.add_argument("--simulate", default=None, help="X,Y,P,START,STOP: simulate the config with this perturbation [mm, W, s] instead")
+    parser.add_argument("--noise", type=float, default=0.0, help="Noise added to the simulated readings [°C]")
+    parser.add_argument("--period", type=float, default=1.0, help="Time between two samples of the library [s]")
+    parser.add_argument("--timing-step", type=float, default=None, help="Time between two onsets of the coarse scan [s]")
+    parser.add_argument("--stride", type=int, default=1, help="Cells between two candidate locations")
+    parser.add_argument("--cache", default="Data/cache", help="Cache of the probe response libraries")
+    parser.add_argument("--out", default="data", help="Directory of the plot and the JSON results")
+    args = parser.parse_args(argv)
+
+    json_handler = JsonHandler()
+    if not json_handler.read_json_file(args.config):
+        sys.exit(1)
+    plate_params = json_handler.get_data()["plate"]
+    if args.trace:
+        trace = load_trace(args.trace)
+        plate_params = trace["plate"] or plate_params
+    kwargs = plate_kwargs(plate_params)
+    if args.simulate:
+        x, y, power, start, stop = (float(value) for value in args.simulate.split(","))
+        trace = synthesise(kwargs, (x, y), power, start, stop, kwargs["total_time"], args.period, args.noise)
+    elif not args.trace:
+        parser.error("give --trace or --simulate")
+
+    horizon = max(kwargs["total_time"], float(trace["time"][-1]))
+    begin = time.perf_counter()
+    library, hit = load_library(plate_params, horizon, args.period, ResultCache(args.cache))
+    print(f"[INFO] Probe responses {'read from the cache' if hit else 'computed'} in {time.perf_counter() - begin:.2f} s")
+
+    times, measured, model = residual_of(trace, library, kwargs)
+    residual = measured - model
+    result = locate(library, residual, args.stride, args.timing_step)
+    plate = Plate(**dict(kwargs, total_time=0))
+    print_report(result, plate, trace["truth"])
+
+    os.makedirs(args.out, exist_ok=True)
+    prefix = os.path.join(args.out, f"source_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    plot(result, plate, times, residual, prefix + ".png", trace["truth"])
+    _export(result, plate, trace["truth"], prefix + ".json")
+    print(f"[INFO] Results written to {prefix}.png and {prefix}.json")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
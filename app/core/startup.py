@@ -0,0 +1,214 @@
+import json
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+# Time to the first frame of each application [ms], checked by "python -m app.core.startup check"
+TARGETS_MS = {"simulator": 400.0, "monitor": 1500.0}
+
+
+class StartupClock:
+    """Milestones of the start of an application, measured from the import of this module.
+    Keep this module light (standard library only) and import it first so the clock starts with the process.
+    """
+    def __init__(self):
+        """Start the clock
+        """
+        self.start = time.perf_counter()
+        self.marks = {}
+
+    def mark(self, name):
+        """Record a milestone, only its first occurrence is kept
+
+        Args:
+            name (string): Milestone ("imports", "window", "shown", "port open")
+
+        Returns:
+            float: Time since the start [ms]
+        """
+        self.marks.setdefault(name, 1000 * (time.perf_counter() - self.start))
+        return self.marks[name]
+
+    def status_text(self):
+        """Short description of the milestones
+
+        Returns:
+            string: Each milestone and its time [ms]
+        """
+        return " | ".join(f"{name} {elapsed:.0f} ms" for name, elapsed in self.marks.items())
+
+
+clock = StartupClock()
+
+
+def parse_importtime(text):
+    """Read the output of python -X importtime
+
+    Args:
+        text (string): stderr of the interpreter
+
+    Returns:
+        list: (depth, module, self time [us], cumulative time [us]) in the order printed (children first)
+    """
+    entries = []
+    for line in text.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append((len(indent) // 2, module, int(self_us), int(cumulative_us)))
+    return entries
+
+
+def import_breakdown(entries, top=10):
+    """Import time per top level package, from the self time of all its modules
+
+    Args:
+        entries (list): Output of parse_importtime
+        top (int, optional): Number of packages kept. Defaults to 10.
+
+    Returns:
+        dict: Total import time [ms] and the heaviest packages (package -> ms)
+    """
+    packages = {}
+    for _, module, self_us, _ in entries:
+        package = module.split(".")[0]
+        packages[package] = packages.get(package, 0) + self_us / 1000
+    heaviest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {"total_ms": sum(packages.values()), "packages": dict(heaviest)}
+
+
+def _child_simulator(port=None):
+    """Start the simulator window and wait for its first frame
+
+    Args:
+        port (string, optional): Unused, the simulator has no port. Defaults to None.
+    """
+    from app.core.app_controller import AppController
+    clock.mark("imports")
+    controller = AppController()
+    clock.mark("window")
+    controller.show_main_window()
+    controller.app.processEvents()
+    clock.mark("shown")
+    controller.main_window.close()
+
+
+def _child_monitor(port="loop://"):
+    """Start the serial monitor, wait for its first frame and for the port
+
+    Args:
+        port (string, optional): Port opened by the monitor. Defaults to the pyserial loopback "loop://".
+    """
+    from PyQt5.QtWidgets import QApplication
+    import Serial_monitor
+    clock.mark("imports")
+    app = QApplication(sys.argv)
+    window = Serial_monitor.SerialMonitor(port=port)
+    clock.mark("window")
+    window.show()
+    app.processEvents()
+    clock.mark("shown")
+    end = time.perf_counter() + 5
+    while "port open" not in clock.marks and time.perf_counter() < end:
+        app.processEvents()
+        time.sleep(0.005)
+    window.close()
+
+
+CHILDREN = {"simulator": _child_simulator, "monitor": _child_monitor}
+
+
+def measure(name, port="loop://"):
+    """Start an application in a fresh interpreter on an offscreen display
+
+    Args:
+        name (string): "simulator" or "monitor"
+        port (string, optional): Port of the monitor. Defaults to "loop://".
+
+    Returns:
+        dict: Milestones [ms] and import breakdown
+    """
+    import shutil
+    import subprocess
+    import tempfile
+
+    env = dict(os.environ, QT_QPA_PLATFORM=os.environ.get("QT_QPA_PLATFORM", "offscreen"), PYTHONPATH=ROOT)
+    with tempfile.TemporaryDirectory() as directory:
+        # The applications write to their working directory (history, autosave of the config), it gets a copy of the configs
+        shutil.copytree(os.path.join(ROOT, "app", "Configs"), os.path.join(directory, "app", "Configs"))
+        process = subprocess.run([sys.executable, "-X", "importtime", "-m", "app.core.startup", "child", name, "--port", port],
+                                 cwd=directory, env=env, capture_output=True, text=True, timeout=120)
+    if process.returncode != 0:
+        raise RuntimeError(f"{name} did not start:\n{process.stderr[-2000:]}")
+    marks = json.loads(process.stdout.strip().splitlines()[-1])
+    return {"marks": marks, "imports": import_breakdown(parse_importtime(process.stderr))}
+
+
+def print_report(name, result, target=None):
+    """Print the milestones and the import breakdown of an application
+
+    Args:
+        name (string): Application
+        result (dict): Output of measure
+        target (float, optional): Budget of the first frame [ms]. Defaults to None.
+
+    Returns:
+        bool: True if the first frame is within the target
+    """
+    shown = result["marks"].get("shown", float("inf"))
+    within = target is None or shown <= target
+    print(f"{name}: " + " | ".join(f"{mark} {elapsed:.0f} ms" for mark, elapsed in result["marks"].items()))
+    print(f"  imports {result['imports']['total_ms']:.0f} ms: "
+          + ", ".join(f"{package} {ms:.0f}" for package, ms in result["imports"]["packages"].items()))
+    if target is not None:
+        print(f"[{'INFO' if within else 'WARN'}] {name}: first frame {shown:.0f} ms, target {target:.0f} ms")
+    return within
+
+
+def main(argv):
+    """Command line: report the start of the applications, or check it against the targets
+
+    Args:
+        argv (list): Command line arguments
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Start time of the simulator and the serial monitor")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for command in ("report", "check"):
+        sub = commands.add_parser(command)
+        sub.add_argument("apps", nargs="*", default=list(CHILDREN), help=f"Subset of {','.join(CHILDREN)}")
+        sub.add_argument("--runs", type=int, default=3, help="Starts per application, the fastest is kept")
+        sub.add_argument("--save", default=None, help="JSON file of the results")
+        sub.add_argument("--port", default="loop://", help="Port of the monitor, a board shows the time to its first data")
+    child = commands.add_parser("child")
+    child.add_argument("app", choices=list(CHILDREN))
+    child.add_argument("--port", default="loop://")
+    args = parser.parse_args(argv)
+
+    if args.command == "child":
+        CHILDREN[args.app](args.port)
+        print(json.dumps(clock.marks))
+        return
+
+    results = {}
+    within = True
+    for name in args.apps:
+        runs = [measure(name, args.port) for _ in range(args.runs)]
+        results[name] = min(runs, key=lambda run: run["marks"].get("shown", float("inf")))
+        within &= print_report(name, results[name], TARGETS_MS.get(name) if args.command == "check" else None)
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump(results, file, indent=4)
+        print(f"[INFO] Results written to {args.save}")
+    if args.command == "check":
+        sys.exit(0 if within else 1)
+
+
+if __name__ == "__main__":
+    # The applications import app.core.startup, they must get this module and its clock, not a second copy
+    sys.modules.setdefault("app.core.startup", sys.modules[__name__])
+    main(sys.argv[1:])
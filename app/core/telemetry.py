@@ -0,0 +1,275 @@
+import math
+import re
+import sys
+import time
+from typing import NamedTuple
+
+NAN = float("nan")
+
+
+class TelemetryRecord(NamedTuple):
+    """One telemetry line of the prototype. Missing optional values (consigne, t3_est, error) are NaN.
+    """
+    time: float
+    pwm: int
+    pwm_max: int
+    consigne: float
+    t1: float
+    t2: float
+    t3: float
+    t4: float
+    t3_est: float
+    error: float
+    control_on: bool
+
+
+# Whole firmware line in one match, optional fields are the ones missing when the control loop is off
+LINE_PATTERN = re.compile(
+    r"\s*([-\d.]+)\s*s\s*\|\s*PWM\s*:\s*(\d+)\s*/\s*(\d+)"
+    r"(?:\s*\|\s*consigne:\s*([-\d.]+))?"
+    r"\s*\|\s*t1:\s*([-\d.]+)\s*\|\s*t2:\s*([-\d.]+)\s*\|\s*t3:\s*([-\d.]+)"
+    r"(?:\s*\|\s*t3 est:\s*([-\d.]+))?"
+    r"\s*\|\s*t4:\s*([-\d.]+)"
+    r"(?:\s*\|\s*error:\s*([-\d.]+))?"
+)
+
+
+def _number(text):
+    """Read the number at the start of a field value ("25.000\\t Control OFF" -> 25.0)
+
+    Args:
+        text (string): Field value
+
+    Returns:
+        float: Value
+    """
+    return float(text.split(None, 1)[0])
+
+
+def parse_line(line):
+    """Parse a telemetry line with a single match of LINE_PATTERN, for example:
+    "12.0 s | PWM : 2047 / 4095 | consigne: 25.000 | t1: 24.1 | t2: 24.2 | t3: 24.3 | t3 est: 24.4 | t4: 24.5 | error: 0.6"
+    or "12.0 s | PWM : 2047 / 4095 | t1: ... | t4: 24.5\\t Control OFF"
+
+    Args:
+        line (string): Line received from the serial port
+
+    Returns:
+        TelemetryRecord: Parsed record, None if the line is not a telemetry line
+    """
+    m = LINE_PATTERN.match(line)
+    if m is None:
+        return _parse_fields(line)
+    time_s, pwm, pwm_max, consigne, t1, t2, t3, t3_est, t4, error = m.groups()
+    return TelemetryRecord(
+        float(time_s), int(pwm), int(pwm_max),
+        float(consigne) if consigne else NAN,
+        float(t1), float(t2), float(t3), float(t4),
+        float(t3_est) if t3_est else NAN,
+        float(error) if error else NAN,
+        "Control OFF" not in line,
+    )
+
+
+def _parse_fields(line):
+    """Slower parser splitting the line on its fields, used for lines whose fields are not in the firmware order
+
+    Args:
+        line (string): Line received from the serial port
+
+    Returns:
+        TelemetryRecord: Parsed record, None if the line is not a telemetry line
+    """
+    parts = line.split("|")
+    if len(parts) < 6:
+        return None
+    head = parts[0].strip()
+    if not head.endswith("s"):
+        return None
+    fields = {}
+    for part in parts[1:]:
+        key, sep, value = part.partition(":")
+        if sep:
+            fields[key.strip()] = value
+    try:
+        pwm, _, pwm_max = fields["PWM"].partition("/")
+        t4 = fields["t4"]
+        return TelemetryRecord(
+            float(head[:-1]),
+            int(pwm),
+            int(pwm_max),
+            _number(fields["consigne"]) if "consigne" in fields else NAN,
+            _number(fields["t1"]),
+            _number(fields["t2"]),
+            _number(fields["t3"]),
+            _number(t4),
+            _number(fields["t3 est"]) if "t3 est" in fields else NAN,
+            _number(fields["error"]) if "error" in fields else NAN,
+            "Control OFF" not in t4,
+        )
+    except (KeyError, ValueError, IndexError):
+        return None
+
+
+def format_line(record):
+    """Format a record exactly like the firmware prints it (Serial.print with 1 decimal for the time, 3 for the values)
+
+    Args:
+        record (TelemetryRecord): Record to format
+
+    Returns:
+        string: Telemetry line, without the line ending
+    """
+    head = f"{record.time:.1f} s | PWM : {record.pwm} / {record.pwm_max}"
+    if record.control_on:
+        return (f"{head} | consigne: {record.consigne:.3f} | t1: {record.t1:.3f} | t2: {record.t2:.3f}"
+                f" | t3: {record.t3:.3f} | t3 est: {record.t3_est:.3f} | t4: {record.t4:.3f} | error: {record.error:.3f}")
+    return (f"{head} | t1: {record.t1:.3f} | t2: {record.t2:.3f} | t3: {record.t3:.3f}"
+            f" | t3 est: {record.t3_est:.3f} | t4: {record.t4:.3f}\t Control OFF")
+
+
+def has_value(value):
+    """Tell if an optional value of a record is present
+
+    Args:
+        value (float): Optional value
+
+    Returns:
+        bool: False for NaN
+    """
+    return not math.isnan(value)
+
+
+def pwm_to_command(record):
+    """Command U of the record in percent, as plotted by the monitor (100 % at PWM 0, -100 % at full PWM)
+
+    Args:
+        record (TelemetryRecord): Record
+
+    Returns:
+        float: Command [%]
+    """
+    ratio = record.pwm / record.pwm_max if record.pwm_max else 0.0
+    return -ratio * 200 + 100
+
+
+class TelemetryDispatcher:
+    """Parse each line once and hand the record to every subscriber
+    """
+    def __init__(self):
+        self.subscribers = []
+        self.lines = 0
+        self.records = 0
+
+    def subscribe(self, callback):
+        """Register a consumer of the records
+
+        Args:
+            callback (function): Called with each TelemetryRecord
+        """
+        self.subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        """Remove a consumer
+
+        Args:
+            callback (function): Callback given to subscribe
+        """
+        if callback in self.subscribers:
+            self.subscribers.remove(callback)
+
+    def dispatch_line(self, line):
+        """Parse a line and dispatch its record
+
+        Args:
+            line (string): Line received from the serial port
+
+        Returns:
+            TelemetryRecord: Parsed record, None if the line is not a telemetry line
+        """
+        self.lines += 1
+        record = parse_line(line)
+        if record is not None:
+            self.dispatch(record)
+        return record
+
+    def dispatch(self, record):
+        """Hand a record to every subscriber
+
+        Args:
+            record (TelemetryRecord): Record to dispatch
+        """
+        self.records += 1
+        for callback in self.subscribers:
+            callback(record)
+
+
+def synthetic_lines(n, period=1.0, control_on=True):
+    """Generate telemetry lines in the firmware format, for benchmarks
+
+    Args:
+        n (int): Number of lines
+        period (float, optional): Time between two lines [s]. Defaults to 1.0.
+        control_on (bool, optional): Format of the control loop running. Defaults to True.
+
+    Returns:
+        list: Lines
+    """
+    lines = []
+    for k in range(n):
+        t = k * period
+        temp = 25 + 5 * (1 - math.exp(-t / 300)) + 0.05 * math.sin(t / 7)
+        lines.append(format_line(TelemetryRecord(
+            t, 2047 + (k * 37) % 400, 4095, 30.0, temp + 1.2, temp + 0.6, temp, 24.8, temp + 0.01, 30.0 - temp, control_on
+        )))
+    return lines
+
+
+def _legacy_parse(line, patterns):
+    """Previous parsing of a line: every consumer searched it with its own regexes (16 searches) and converted the values
+    """
+    values = []
+    for p in patterns:
+        m = p.search(line)
+        if m:
+            values.append(float(m.group(1)))
+    return values
+
+
+def benchmark_parser(n=100000):
+    """Measure the parse throughput
+
+    Args:
+        n (int, optional): Number of lines. Defaults to 100000.
+
+    Returns:
+        dict: Lines per second of the single pass parser (and of its field splitting fallback) and of the previous per consumer regex searches
+    """
+    lines = synthetic_lines(n)
+    start = time.perf_counter()
+    for line in lines:
+        parse_line(line)
+    single = n / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for line in lines:
+        _parse_fields(line)
+    fields = n / (time.perf_counter() - start)
+
+    patterns = [re.compile(p) for p in (
+        r"([\d\.]+)\s*s", r"t1:\s*([\d\.]+)", r"t2:\s*([\d\.]+)", r"t3:\s*([\d\.]+)", r"t4:\s*([\d\.]+)",
+        r"t3\s*est:\s*([\d\.]+)", r"consigne:\s*([\d\.]+)", r"([\d\.]+)\s*s", r"PWM\s*:\s*([\d]+)\s*/\s*([\d]+)",
+        r"t3\s*est:\s*([\d\.]+)", r"([\d\.]+)\s*s", r"PWM\s*:\s*([\d]+)\s*/\s*([\d]+)", r"t1:\s*([\d\.]+)",
+        r"t2:\s*([\d\.]+)", r"t3:\s*([\d\.]+)", r"t4:\s*([\d\.]+)"
+    )]
+    start = time.perf_counter()
+    for line in lines:
+        _legacy_parse(line, patterns)
+    legacy = n / (time.perf_counter() - start)
+    return {"single_pass_lines_per_s": single, "field_split_lines_per_s": fields, "legacy_regex_lines_per_s": legacy}
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    for name, value in benchmark_parser(n).items():
+        print(f"{name}: {value:,.0f}")
@@ -0,0 +1,150 @@
+import os
+import sys
+
+import numpy as np
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.figure import Figure
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import QApplication, QComboBox, QHBoxLayout, QLabel, QLineEdit, QPushButton, QVBoxLayout, QWidget
+
+from app.core.bench_monitor import BenchMonitor
+
+
+class BenchDashboard(QWidget):
+    """Live view of every bench of a BenchMonitor: one row of plots per bench on a shared time axis
+    (time of arrival on the computer, the firmware clocks of the benches are not synchronised),
+    with the control metrics of each bench and a command line sent to the selected bench.
+
+    Args:
+        QWidget (QWidget): QWidget class from the PyQt5 module.
+    """
+    def __init__(self, monitor, parent=None, window_s=600, redraw_hz=5):
+        """Initialize the dashboard
+
+        Args:
+            monitor (BenchMonitor): Monitor of the benches, started
+            parent (QWidget, optional): Parent widget. Defaults to None.
+            window_s (int, optional): Time shown on the plots [s]. Defaults to 600.
+            redraw_hz (int, optional): Redraw rate of the plots [Hz]. Defaults to 5.
+        """
+        super().__init__(parent)
+        self.setWindowTitle("Design 2 benches")
+        self.monitor = monitor
+        self.window_s = window_s
+        names = list(monitor.benches)
+
+        self.fig = Figure(figsize=(10, 3 * max(len(names), 1)))
+        axes = self.fig.subplots(max(len(names), 1), 1, sharex=True, squeeze=False)[:, 0]
+        self.canvas = FigureCanvas(self.fig)
+        self.lines = {}
+        for ax, name in zip(axes, names):
+            ax.set_title(name)
+            ax.set_ylabel("Temp [°C]")
+            ax.grid(True)
+            self.lines[name] = {
+                column: ax.plot([], [], label=label)[0]
+                for column, label in (("consigne", "Consigne"), ("t3", "T3"), ("t3_est", "T3_est"), ("t1", "T1"))
+            }
+            ax.legend(loc="upper left")
+        axes[-1].set_xlabel("Time [s]")
+        self.axes = dict(zip(names, axes))
+
+        layout = QVBoxLayout()
+        self.metric_labels = {}
+        for name in names:
+            label = QLabel(f"{name}: -")
+            self.metric_labels[name] = label
+            layout.addWidget(label)
+        self.lbl_stats = QLabel("RX: -")
+        layout.addWidget(self.lbl_stats)
+
+        command_layout = QHBoxLayout()
+        self.cb_bench = QComboBox()
+        self.cb_bench.addItems(names)
+        self.input_command = QLineEdit("PARAM C=30.0")
+        self.btn_send = QPushButton("Send")
+        self.btn_send.clicked.connect(self.send_command)
+        command_layout.addWidget(self.cb_bench)
+        command_layout.addWidget(self.input_command)
+        command_layout.addWidget(self.btn_send)
+        layout.addLayout(command_layout)
+        layout.addWidget(self.canvas)
+        self.setLayout(layout)
+
+        self.process_timer = QTimer(self)
+        self.process_timer.timeout.connect(self.monitor.process)
+        self.process_timer.start(50)
+        self.redraw_timer = QTimer(self)
+        self.redraw_timer.timeout.connect(self.redraw)
+        self.redraw_timer.start(int(1000 / redraw_hz))
+
+    def send_command(self):
+        """Send the command line to the selected bench
+        """
+        name = self.cb_bench.currentText()
+        if name in self.monitor.benches:
+            self.monitor.benches[name].send(self.input_command.text().strip())
+
+    def redraw(self):
+        """Update the lines, the shared time axis and the labels
+        """
+        now = self.monitor.now()
+        for name, bench in self.monitor.benches.items():
+            arrival = bench.values("arrival")
+            for column, line in self.lines[name].items():
+                line.set_data(arrival, bench.values(column))
+            ax = self.axes[name]
+            values = np.concatenate([bench.values(c) for c in ("consigne", "t3", "t3_est", "t1")])
+            values = values[~np.isnan(values)]
+            if len(values):
+                ax.set_ylim(values.min() - 1, values.max() + 1)
+            self.metric_labels[name].setText(f"{name}: {bench.metrics.status_text()}")
+        if self.axes:
+            next(iter(self.axes.values())).set_xlim(max(0.0, now - self.window_s), max(now, 10.0))
+
+        stats = self.monitor.stats()
+        received = sum(s["lines"] + s["frames"] for name, s in stats.items() if name in self.monitor.benches)
+        dropped = sum(s["dropped"] for name, s in stats.items() if name in self.monitor.benches)
+        self.lbl_stats.setText(f"RX: {received} lines/frames on {len(self.monitor.benches)} benches | dropped {dropped}"
+                               f" | I/O thread CPU {stats['io_thread']['cpu_time']:.2f} s")
+        self.canvas.draw_idle()
+
+    def closeEvent(self, event):
+        """Stop the monitor when the window closes
+
+        Args:
+            event (event): event object for the close event.
+        """
+        self.process_timer.stop()
+        self.redraw_timer.stop()
+        self.monitor.close()
+        event.accept()
+
+
+def main(argv):
+    """Open a dashboard on the ports given as arguments, "COM4 COM5" or "bench1=COM4 bench2=/dev/ttyACM0"
+
+    Args:
+        argv (list): Port arguments
+    """
+    if not argv:
+        print("usage: python -m app.ui.bench_dashboard [name=]port [[name=]port ...]")
+        sys.exit(1)
+    app = QApplication(sys.argv)
+    monitor = BenchMonitor(record_dir=os.path.join(os.getcwd(), "data", "History"))
+    for arg in argv:
+        name, _, url = arg.rpartition("=")
+        try:
+            monitor.open_bench(name or url, url)
+        except Exception as e:
+            print(f"[ERROR] Could not open port {url}: {e}")
+    if not monitor.benches:
+        sys.exit(1)
+    monitor.start()
+    window = BenchDashboard(monitor)
+    window.show()
+    sys.exit(app.exec_())
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,6 +1,6 @@
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QGridLayout, QLabel, QPlainTextEdit,
-    QPushButton, QComboBox, QSizePolicy, QMessageBox
+    QPushButton, QComboBox, QSizePolicy, QMessageBox, QCheckBox, QSlider
 )
 from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QFont
@@ -27,6 +27,7 @@ class MainWindow(QWidget):
         # === Layouts ===
         self.main_layout = QVBoxLayout()
         self.second_layout = QVBoxLayout()
+        self.replay_layout = QVBoxLayout()
         self.setLayout(self.main_layout)
 
         # Import dropdown
@@ -84,6 +85,13 @@ class MainWindow(QWidget):
         add_input("Conductivité thermique [W/m·K]:", 21, "zone_k", "350")
         add_input("Densité [kg/m³]:", 22, "zone_rho", "2333")
         add_input("Capacité thermique massique [J/kg·K]:", 23, "zone_cp", "896")
+        add_input("Intervalle des instantanés du champ [s] (vide = aucun):", 24, "zone_snapshot_interval", "")
+        add_input("Format des instantanés (float32, float16, delta):", 25, "zone_snapshot_format", "float16")
+        add_input("Solveur (explicit2d, implicit3d en couches):", 26, "zone_solver_mode", "explicit2d")
+        add_input("Couches en z (nombre, ou [(épaisseur mm, k, rho, cp), ...] du bas vers le haut):", 27, "zone_layers", "3")
+        add_input("Pas de temps du solveur implicite [s] (vide = pas de temps):", 28, "zone_solver_dt", "0.5")
+        add_input("Faces des thermistances 1, 2, 3 (top, bottom):", 29, "zone_thermistor_faces", "top, top, top")
+        add_input("Face de la source de chaleur (top, bottom):", 30, "zone_heater_face", "bottom")
 
 
 
@@ -92,11 +100,21 @@ class MainWindow(QWidget):
         self.save_btn.clicked.connect(self.controller.export_params)
         self.main_layout.addWidget(self.save_btn)
 
+        # === Cache ===
+        self.chk_cache = QCheckBox("Réutiliser le résultat d'une simulation identique (cache)")
+        self.chk_cache.setChecked(True)
+        self.main_layout.addWidget(self.chk_cache)
+
         # === Start Button ===
         self.start_btn = QPushButton("Démarrer la simulation")
         self.start_btn.clicked.connect(self.controller.start_simulation)
         self.main_layout.addWidget(self.start_btn)
 
+        # === Replay Button ===
+        self.replay_btn = QPushButton("Revoir un enregistrement")
+        self.replay_btn.clicked.connect(self.controller.open_replay)
+        self.main_layout.addWidget(self.replay_btn)
+
         # === Placeholder ===
         self.sim_canvas_container = QVBoxLayout()
         self.second_layout.addLayout(self.sim_canvas_container)
@@ -111,8 +129,46 @@ class MainWindow(QWidget):
         self.reset.clicked.connect(self.controller.reset_view)
         self.second_layout.addWidget(self.reset)
 
-    def set_secondary_layout(self):
-        """Allows to show the graphs and removes the texts fields #TODO refaire avec des stack layout pour pouvoir revenir au main menu...
+        # === Pacing ===
+        pacing_layout = QHBoxLayout()
+        pacing_layout.addWidget(QLabel("Facteur temps réel cible:"))
+        self.cb_rtf = QComboBox()
+        self.cb_rtf.addItems(["Pas fixe", "1x", "10x", "100x", "max"])
+        self.cb_rtf.currentTextChanged.connect(self.controller.set_target_rtf)
+        pacing_layout.addWidget(self.cb_rtf)
+        self.lbl_pacing = QLabel("Facteur temps réel: N/A")
+        pacing_layout.addWidget(self.lbl_pacing, 1)
+        self.second_layout.addLayout(pacing_layout)
+
+        # === Profiling ===
+        profiling_layout = QHBoxLayout()
+        self.chk_profiling = QCheckBox("Profilage (export à l'arrêt)")
+        self.chk_profiling.toggled.connect(self.controller.set_profiling)
+        profiling_layout.addWidget(self.chk_profiling)
+        self.chk_profiling_overlay = QCheckBox("Afficher le profilage sur le graphique")
+        self.chk_profiling_overlay.toggled.connect(self.controller.set_profiling_overlay)
+        profiling_layout.addWidget(self.chk_profiling_overlay)
+        self.chk_export_text = QCheckBox("Exporter aussi en .txt")
+        profiling_layout.addWidget(self.chk_export_text)
+        profiling_layout.addStretch(1)
+        self.second_layout.addLayout(profiling_layout)
+
+        # === Replay ===
+        replay_controls = QHBoxLayout()
+        self.replay_slider = QSlider(Qt.Horizontal)
+        self.replay_slider.setRange(0, 1000)
+        self.replay_slider.valueChanged.connect(self.controller.seek_replay)
+        replay_controls.addWidget(self.replay_slider, 1)
+        self.add_run_btn = QPushButton("Superposer un autre run")
+        self.add_run_btn.clicked.connect(self.controller.add_replay_run)
+        replay_controls.addWidget(self.add_run_btn)
+        self.replay_layout.addLayout(replay_controls)
+
+    def __swap_layout(self, layout):
+        """Remove the widgets of the current layout and show another one
+
+        Args:
+            layout (QLayout): Layout to show
         """
         self.main_layout = self.layout()
         if self.main_layout is not None:
@@ -124,7 +180,17 @@ class MainWindow(QWidget):
             
             QWidget().setLayout(self.main_layout)
 
-        self.setLayout(self.second_layout)
+        self.setLayout(layout)
+
+    def set_replay_layout(self):
+        """Show the replay slider instead of the text fields
+        """
+        self.__swap_layout(self.replay_layout)
+
+    def set_secondary_layout(self):
+        """Allows to show the graphs and removes the texts fields #TODO refaire avec des stack layout pour pouvoir revenir au main menu...
+        """
+        self.__swap_layout(self.second_layout)
 
     def closeEvent(self, event):
         """Manage what the app does on windows button close, in this case allows to prevent data loss
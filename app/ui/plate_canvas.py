@@ -4,6 +4,10 @@ from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 from matplotlib import cm
 import numpy as np
+import time
+
+from app.core.sim_pacer import SimulationPacer
+from app.core.profiler import Profiler
 
 class PlateCanvas(FigureCanvas):
     """Handle the 3D and 2D plots of the plate
@@ -11,7 +15,7 @@ class PlateCanvas(FigureCanvas):
     Args:
         FigureCanvas (FigureCanvas): Matplotlib to qt5 widget
     """
-    def __init__(self, controller=None, parent=None, step_sim_time=0.5):
+    def __init__(self, controller=None, parent=None, step_sim_time=0.5, profiler=None):
         self.fig = Figure(figsize=(10, 5))
         self.ax3d = self.fig.add_subplot(121, projection='3d')
         self.step_sim_time = step_sim_time 
@@ -27,6 +31,28 @@ class PlateCanvas(FigureCanvas):
         self.setParent(parent)
         self.timer = QTimer()
         self.timer.timeout.connect(self.update_plot)
+        self.target_rtf = None # None keeps the fixed number of steps per tick
+        self.pacer = None
+        self.profiler = profiler if profiler is not None else Profiler()
+        self.run_writer = None
+        self.profiler_text = self.fig.text(0.01, 0.01, "", family="monospace", fontsize=8, va="bottom")
+
+    def set_target_rtf(self, target_rtf):
+        """Select how the simulated time is paced.
+
+        Args:
+            target_rtf (float or str): Target real-time factor, SimulationPacer.MAX to go as fast as possible
+                or None to run a fixed step time per timer tick.
+        """
+        self.target_rtf = target_rtf
+        if not hasattr(self, "plate"):
+            return
+        if target_rtf is None:
+            self.pacer = None
+        elif self.pacer is None:
+            self.pacer = SimulationPacer(self.plate.dt, target_rtf)
+        else:
+            self.pacer.set_target(target_rtf)
 
     def start_simulation(self, plate):
         """Start the simulation
@@ -41,6 +67,9 @@ class PlateCanvas(FigureCanvas):
         self.t3 = []
         self.power = []
         self.perturbation = []
+        self.next_sample_time = 0.0
+        self.pacer = None
+        self.set_target_rtf(self.target_rtf)
 
         self.timer.start(1)
 
@@ -55,17 +84,113 @@ class PlateCanvas(FigureCanvas):
         self.fig.canvas.draw_idle()   
 
     def update_plot(self):
-        """Update the plot with new data.
-
+        """Advance the simulation for one timer tick and update the plot with new data.
+        Either a fixed step_sim_time is simulated per tick or the pacer decides how many steps to run
+        and whether this tick is rendered.
         """
         if self.controller.working == False:
             self.timer.timeout.disconnect(self.update_plot)
             return
 
-        steps = int(self.step_sim_time / self.plate.dt)
+        self.profiler.begin_frame()
+        if self.pacer is None:
+            with self.profiler.section("solver"):
+                self.advance(max(1, int(self.step_sim_time / self.plate.dt)))
+            self.record_sample()
+            render = True
+        else:
+            steps = self.pacer.plan_steps()
+            start = time.perf_counter()
+            with self.profiler.section("solver"):
+                self.advance(steps, sample=True)
+            self.pacer.record_steps(steps, time.perf_counter() - start)
+            render = self.pacer.should_render()
+            if render and self.controller is not None:
+                self.controller.show_pacing_status(self.pacer.status_text())
+
+        if render:
+            self.render()
+        self.profiler.end_frame()
+
+        if self.plate.current_time >= self.plate.total_time:
+            self.timer.stop()
+            if self.controller is not None:
+                self.controller.simulation_finished()
+
+    def show_result(self, plate, result):
+        """Show a finished run without simulating it, used when the result comes from the cache
+
+        Args:
+            plate (Plate): Plate of the run, only its geometry is used
+            result (dict): Arrays "time", "power", "perturbation", "t1", "t2", "t3" and the final field "temps"
+        """
+        self.plate = plate
+        self.times = list(result["time"])
+        self.t1 = list(result["t1"])
+        self.t2 = list(result["t2"])
+        self.t3 = list(result["t3"])
+        self.power = list(result["power"])
+        self.perturbation = list(result["perturbation"])
+        self.plate.temps[:] = result["temps"]
+        self.plate.current_time = float(result["time"][-1]) if len(result["time"]) else 0.0
+        self.ax3d.view_init(elev=25, azim=-45)
+        self.render()
+
+    def result_arrays(self):
+        """Arrays describing the run, as stored in the result cache
+
+        Returns:
+            dict: Thermistance traces, power, perturbation and final field
+        """
+        return {
+            "time": np.asarray(self.times), "power": np.asarray(self.power),
+            "perturbation": np.asarray(self.perturbation),
+            "t1": np.asarray(self.t1), "t2": np.asarray(self.t2), "t3": np.asarray(self.t3),
+            "temps": np.array(self.plate.temps),
+        }
+
+    def advance(self, steps, sample=False):
+        """Run the solver for a number of steps.
+
+        Args:
+            steps (int): Number of solver steps
+            sample (bool, optional): Record the thermistances every step_sim_time of simulated time. Defaults to False.
+        """
         for _ in range(steps):
+            if self.plate.current_time >= self.plate.total_time:
+                break
             self.plate.update_plate_with_numpy()
+            if sample and self.plate.current_time >= self.next_sample_time:
+                self.record_sample()
+                self.next_sample_time += self.step_sim_time
 
+    def record_sample(self):
+        """Store the current time, power and thermistance temperatures.
+        """
+        t1, t2, t3 = self.plate.read_thermistors()
+        self.times.append(self.plate.current_time)
+        self.t1.append(t1)
+        self.t2.append(t2)
+        self.t3.append(t3)
+        self.power.append(self.plate.current_power)
+        self.perturbation.append(self.plate.current_pert)
+        if self.run_writer is not None:
+            self.run_writer.append(self.plate.current_time, self.plate.current_power, self.plate.current_pert, t1, t2, t3)
+
+    def render(self):
+        """Redraw the 3D field and the thermistance curves.
+        """
+        with self.profiler.section("surface"):
+            self.render_surface()
+        with self.profiler.section("plot_2d"):
+            self.render_thermistors()
+        self.profiler_text.set_text(self.profiler.overlay_text() if self.profiler.enabled and self.profiler.overlay else "")
+        with self.profiler.section("draw"):
+            self.draw()
+
+    def render_surface(self):
+        """Redraw the 3D temperature field.
+        """
         self.ax3d.clear()
         self.ax3d.set_xlim(0, max([self.plate.lx*1000, self.plate.ly*1000]))
         self.ax3d.set_ylim(0, max([self.plate.lx*1000, self.plate.ly*1000]))
@@ -83,22 +208,9 @@ class PlateCanvas(FigureCanvas):
         self.ax3d.set_ylabel("Y [mm]")
         self.ax3d.set_zlabel("Temp [°C]")
 
-        post1 = (round(self.plate.thermistances_positions[0][0] / (1000*self.plate.dx)), round(self.plate.thermistances_positions[0][1] / (1000*self.plate.dy)))
-        post2 = (round(self.plate.thermistances_positions[1][0] / (1000*self.plate.dx)), round(self.plate.thermistances_positions[1][1] / (1000*self.plate.dy)))
-        post3 = (round(self.plate.thermistances_positions[2][0] / (1000*self.plate.dx)), round(self.plate.thermistances_positions[2][1] / (1000*self.plate.dy)))
-
-
-        t1 = self.plate.temps[post1] - 273
-        t2 = self.plate.temps[post2] - 273
-        t3 = self.plate.temps[post3] - 273
-
-        self.times.append(self.plate.current_time)
-        self.t1.append(t1)
-        self.t2.append(t2)
-        self.t3.append(t3)
-        self.power.append(self.plate.current_power)
-        self.perturbation.append(self.plate.current_pert)
-
+    def render_thermistors(self):
+        """Redraw the thermistance curves.
+        """
         self.ax2d1.clear()
         self.ax2d1.plot(self.times, self.t1, color='b', label="thermistance 1")
         self.ax2d1.plot(self.times, self.t2, color='y', label="thermistance 2")
@@ -110,8 +222,6 @@ class PlateCanvas(FigureCanvas):
 
         self.ax2d1.legend()
 
-        self.draw()
-
     def reset_view(self):
         """Set back the view to its initial state.
         """
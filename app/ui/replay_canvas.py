@@ -0,0 +1,123 @@
+import os
+
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.figure import Figure
+from matplotlib import cm
+import numpy as np
+
+from app.core.run_writer import read_run
+from app.core.field_recorder import FieldRecording
+
+
+class ReplayCanvas(FigureCanvas):
+    """Show a recorded run: the thermistance traces of one or several runs and the field snapshots of the first one.
+    Files are mapped in memory, seeking reads one snapshot and renders it, nothing is recomputed.
+
+    Args:
+        FigureCanvas (FigureCanvas): Matplotlib to qt5 widget
+    """
+    colors = ['b', 'y', 'r']
+    styles = ['-', '--', ':', '-.']
+    max_plot_points = 5000
+
+    def __init__(self, controller=None, parent=None):
+        self.fig = Figure(figsize=(10, 5))
+        self.ax3d = self.fig.add_subplot(121, projection='3d')
+        self.ax2d1 = self.fig.add_subplot(122)
+        self.fig.subplots_adjust(
+            left=0.1, right=0.9,
+            top=0.9, bottom=0.1,
+            wspace=0.4, hspace=0.4
+        )
+        super().__init__(self.fig)
+        self.controller = controller
+        self.setParent(parent)
+        self.runs = []
+        self.cursor = self.ax2d1.axvline(0, color='k', linewidth=1)
+        self.ax2d1.set_title("thermistances")
+        self.ax2d1.set_xlabel("Temps[s]")
+        self.ax2d1.set_ylabel("Temp [°C]")
+        self.ax2d1.grid(True)
+
+    def add_run(self, file_path):
+        """Open a run file and overlay its thermistance traces
+
+        Args:
+            file_path (string): Path of the .d2run file
+        """
+        header, data = read_run(file_path)
+        field = None
+        field_dir = header.get("params", {}).get("field_snapshots")
+        if field_dir:
+            field_dir = os.path.join(os.path.dirname(file_path), field_dir)
+            if os.path.exists(os.path.join(field_dir, "field.json")):
+                field = FieldRecording(field_dir)
+
+        columns = header["columns"]
+        run = {
+            "path": file_path,
+            "name": os.path.basename(file_path),
+            "header": header,
+            "times": data[:, columns.index("time")],
+            "probes": [data[:, columns.index(name)] for name in ("t1", "t2", "t3")],
+            "field": field,
+        }
+        self.runs.append(run)
+
+        # Long runs are decimated for display only, the full data stays on disk
+        stride = max(1, len(run["times"]) // self.max_plot_points)
+        style = self.styles[(len(self.runs) - 1) % len(self.styles)]
+        for i, probe in enumerate(run["probes"]):
+            label = f"thermistance {i+1}" if len(self.runs) == 1 else f"{run['name']} t{i+1}"
+            self.ax2d1.plot(run["times"][::stride], probe[::stride], color=self.colors[i], linestyle=style, label=label)
+        self.ax2d1.relim()
+        self.ax2d1.autoscale_view()
+        self.ax2d1.legend(fontsize=8)
+        self.draw_idle()
+
+    def duration(self):
+        """Length of the longest opened run
+
+        Returns:
+            float: Last recorded time [s]
+        """
+        ends = [float(run["times"][-1]) for run in self.runs if len(run["times"])]
+        return max(ends) if ends else 0.0
+
+    def seek(self, time):
+        """Show the state of the runs at a given time
+
+        Args:
+            time (float): Simulated time [s]
+        """
+        if not self.runs:
+            return
+        self.cursor.set_xdata([time, time])
+        run = self.runs[0]
+        values = ""
+        if len(run["times"]):
+            i = max(0, int(np.searchsorted(run["times"], time, side="right")) - 1)
+            values = " | ".join(f"t{k+1}: {probe[i]:.2f}" for k, probe in enumerate(run["probes"]))
+
+        self.ax3d.clear()
+        field = run["field"]
+        if field is not None and len(field):
+            index = field.index_at(time)
+            temps_c = field[index] - 273
+            nx, ny = temps_c.shape
+            lx = run["header"]["params"]["plate"]["Length X [mm]:"]
+            ly = run["header"]["params"]["plate"]["Length Y [mm]:"]
+            x = np.arange(nx) * float(lx) / nx
+            y = np.arange(ny) * float(ly) / ny
+            Y, X = np.meshgrid(y, x)
+            self.ax3d.set_xlim(0, max(float(lx), float(ly)))
+            self.ax3d.set_ylim(0, max(float(lx), float(ly)))
+            self.ax3d.plot_surface(X, Y, temps_c, cmap=cm.plasma)
+            self.ax3d.set_title(f"Instantané: {field.times[index]:.1f}s")
+        else:
+            self.ax3d.set_title("Aucun instantané du champ")
+        self.ax3d.set_xlabel("X [mm]")
+        self.ax3d.set_ylabel("Y [mm]")
+        self.ax3d.set_zlabel("Temp [°C]")
+        self.ax2d1.set_title(f"{time:.1f}s  {values}", fontsize=9)
+        self.draw_idle()
@@ -40,10 +40,31 @@ int time_counter = 0;
 
 const float dt = 1/DESIRED_ADC_UPDATE_FREQ; 
 
+// Binary telemetry (command "B", "A" goes back to text lines).
+// One 32 byte frame per sample instead of ~150 characters, decoded by app/core/binary_telemetry.py.
+// At 115200 baud this allows ~360 samples/s, raise the baud rate for 1 kHz.
+#define FRAME_SYNC0 0xA5
+#define FRAME_SYNC1 0x5A
+bool binaryTelemetry = false;
+
+struct __attribute__((packed)) TelemetryFrame {
+    uint8_t sync[2];
+    uint8_t length;      // bytes between length and crc
+    float time;
+    uint16_t adc[4];     // raw ADC0..3: t2, t4, t1, t3
+    uint16_t pwm;
+    float consigne;
+    float t3_est;
+    float error;
+    uint8_t flags;       // bit 0: control loop on
+    uint16_t crc;        // CRC-16/CCITT-FALSE of length..flags
+};
+
 
 void handleLine(const String &line);
 void parseParameters(const String &line);
 float voltage_to_temp(float volt);
+void sendBinaryTelemetry(float time, const uint16_t *adc, uint16_t pwm, float t3Est, float error);
 
 //
 // Timer3 Compare Match A ISR
@@ -123,6 +144,7 @@ void setup() {
     Serial.println("  p    -> start control loop");
     Serial.println("  S    -> stop control loop");
     Serial.println("  R    -> reset and new parameters");
+    Serial.println("  B    -> binary telemetry, A -> text telemetry");
     Serial.println("  PARAM C=2.5 F=1.0  -> set parameters (C = setpoint, F = frequency)");
 }
 
@@ -135,6 +157,7 @@ void loop() {
     float currSamplet4 = adcRawValues[1] * (5.0 / 1023.0);
     float currSamplet1 = adcRawValues[2] * (5.0 / 1023.0);
     float currSamplet3 = adcRawValues[3] * (5.0 / 1023.0); 
+    uint16_t rawSample[4] = {adcRawValues[0], adcRawValues[1], adcRawValues[2], adcRawValues[3]};
     uint32_t updateCountSnapshot = adcUpdateCount;
     
 
@@ -202,6 +225,10 @@ void loop() {
             uint16_t pwmValue = (uint16_t) control;
             OCR1A = pwmValue;
 
+            if (binaryTelemetry) {
+                sendBinaryTelemetry(trueTime, rawSample, pwmValue, estimated_tempt3, error);
+                return;
+            }
             Serial.print(trueTime * 1, 1); 
             Serial.print(" s | PWM : ");
             Serial.print(pwmValue);
@@ -221,9 +248,13 @@ void loop() {
             Serial.print(voltage_to_tempt3(currSamplet4), 3);
             Serial.print(" | error: ");
             Serial.println(error, 3);
-
+        }
         else {
             OCR1A = PWM_TOP/2;
+            if (binaryTelemetry) {
+                sendBinaryTelemetry(trueTime, rawSample, PWM_TOP / 2, estimated_tempt3, 0);
+                return;
+            }
             Serial.print(trueTime * 1, 1);
             Serial.print(" s | PWM : ");
             Serial.print(PWM_TOP / 2);
@@ -258,10 +289,16 @@ void handleLine(const String &line) {
         Serial.println("Control loop OFF");
     } else if (line.equalsIgnoreCase("R")) {
         running = false;
-        previousControl = 0;
+        previous_control = 0;
         Time = CurrentTime + Time;
         CurrentTime = 0;
 
+    } else if (line.equals("B")) {
+        binaryTelemetry = true;
+        Serial.println("Binary telemetry ON");
+    } else if (line.equals("A")) {
+        binaryTelemetry = false;
+        Serial.println("Binary telemetry OFF");
     } else if (line.startsWith("PARAM")) {
         parseParameters(line);
     } else {
@@ -313,6 +350,36 @@ void parseParameters(const String &line) {
     Serial.println(consigne);
 }
 
+//
+// Binary telemetry
+uint16_t crc16(const uint8_t *data, uint8_t length) {
+    uint16_t crc = 0xFFFF;
+    for (uint8_t i = 0; i < length; i++) {
+        crc ^= (uint16_t)data[i] << 8;
+        for (uint8_t b = 0; b < 8; b++) {
+            crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : (crc << 1);
+        }
+    }
+    return crc;
+}
+
+void sendBinaryTelemetry(float time, const uint16_t *adc, uint16_t pwm, float t3Est, float error) {
+    TelemetryFrame frame;
+    frame.sync[0] = FRAME_SYNC0;
+    frame.sync[1] = FRAME_SYNC1;
+    frame.length = sizeof(TelemetryFrame) - 5;
+    frame.time = time;
+    for (uint8_t i = 0; i < 4; i++) {
+        frame.adc[i] = adc[i];
+    }
+    frame.pwm = pwm;
+    frame.consigne = consigne;
+    frame.t3_est = t3Est;
+    frame.error = error;
+    frame.flags = running ? 1 : 0;
+    frame.crc = crc16(&frame.length, sizeof(TelemetryFrame) - 4);
+    Serial.write((const uint8_t *)&frame, sizeof(TelemetryFrame));
+}
 
 // Function to convert voltage to temperature for T2 sensor
 /// This function is used to convert the voltage reading from the T2 sensor to temperature in Celsius using Steinhart-Hart equation.
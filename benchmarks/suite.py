@@ -0,0 +1,427 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+BASELINE_DIR = os.path.join(ROOT, "benchmarks", "baselines")
+TEMPLATE = os.path.join(ROOT, "app", "assets", "data.xlsx")
+# Plate of the ensemble benchmarks: defaults of Plate with the heater on from the start
+PLATE_KWARGS = {"start_heat_time": 0, "k": 350, "rho": 2333, "cp": 896, "h_convection": 13.5,
+                "power_transfer": -1.3, "thickness": 1.82e-3, "position_heat_source": (16, 31)}
+
+
+def _best_rate(function, count, repeat, min_time=1.0):
+    """Run function() at least `repeat` times and for at least `min_time` seconds, and keep the fastest call.
+    The fastest call is the one least disturbed by the rest of the machine.
+
+    Args:
+        function (function): Work to time
+        count (int): Items done by one call
+        repeat (int): Minimum number of calls
+        min_time (float, optional): Minimum total time of the calls [s]. Defaults to 1.0.
+
+    Returns:
+        float: Items per second of the fastest call
+    """
+    best = float("inf")
+    calls = 0
+    total = 0.0
+    while calls < repeat or total < min_time:
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = min(best, elapsed)
+        total += elapsed
+        calls += 1
+    return count / best
+
+
+def bench_solver(sizes=(20, 40, 60, 117), steps=400, repeat=3):
+    """Solver steps per second over a grid of N, for update_plate_with_numpy and Plate.advance
+
+    Args:
+        sizes (tuple, optional): Values of N. Defaults to (20, 40, 60, 117).
+        steps (int, optional): Steps per measure. Defaults to 400.
+        repeat (int, optional): Measures, the fastest is kept. Defaults to 3.
+
+    Returns:
+        dict: Metrics
+    """
+    from app.core.plate_transmission import Plate
+
+    results = {}
+    for n in sizes:
+        plate = Plate(n=n, start_heat_time=0)
+
+        def numpy_steps():
+            for _ in range(steps):
+                plate.update_plate_with_numpy()
+
+        rate = _best_rate(numpy_steps, steps, repeat)
+        results[f"solver.n{n}.steps_per_s"] = rate
+        results[f"solver.n{n}.sim_s_per_s"] = rate * plate.dt
+        results[f"solver.n{n}.advance_steps_per_s"] = _best_rate(lambda: plate.advance(steps * plate.dt), steps, repeat)
+    return results
+
+
+def bench_layered(layers=(1, 3, 6), n=60, dt=0.5, duration=20.0, repeat=3):
+    """Layered 3D implicit solver: simulated seconds per second over a number of layers, heater on
+
+    Args:
+        layers (tuple, optional): Numbers of layers. Defaults to (1, 3, 6).
+        n (int, optional): N of the plate. Defaults to 60.
+        dt (float, optional): Time step [s]. Defaults to 0.5.
+        duration (float, optional): Simulated time per measure [s]. Defaults to 20.0.
+        repeat (int, optional): Measures, the fastest is kept. Defaults to 3.
+
+    Returns:
+        dict: Metrics
+    """
+    from app.core.layered_plate import LayeredPlate
+
+    results = {}
+    for nz in layers:
+        plate = LayeredPlate(layers=nz, dt=dt, n=n, start_heat_time=0)
+        plate.advance(duration)
+        results[f"layered.nz{nz}.sim_s_per_s"] = _best_rate(lambda: plate.advance(duration), duration, repeat)
+    return results
+
+
+def bench_sensitivity(n=30, duration=20.0, repeat=3):
+    """Sensitivity ensemble (app.core.sensitivity): simulated seconds per second of the reference and one member per parameter
+
+    Args:
+        n (int, optional): N of the plate. Defaults to 30.
+        duration (float, optional): Simulated time per measure [s]. Defaults to 20.0.
+        repeat (int, optional): Measures, the fastest is kept. Defaults to 3.
+
+    Returns:
+        dict: Metrics
+    """
+    from app.core.sensitivity import PlateEnsemble, PARAMETERS, _perturb
+
+    kwargs = dict(PLATE_KWARGS, n=n)
+    ensemble = PlateEnsemble(kwargs, [{}] + [_perturb(kwargs, name)[0] for name in PARAMETERS])
+    ensemble.advance(duration)
+    return {"sensitivity.sim_s_per_s": _best_rate(lambda: ensemble.advance(duration), duration, repeat)}
+
+
+def bench_locator(n=30, duration=900.0, repeat=3):
+    """Source locator (app.core.source_locator): time of one fit of location, power and timing over every cell
+
+    Args:
+        n (int, optional): N of the plate. Defaults to 30.
+        duration (float, optional): Length of the trace [s]. Defaults to 900.0.
+        repeat (int, optional): Measures, the fastest is kept. Defaults to 3.
+
+    Returns:
+        dict: Metrics
+    """
+    from app.core.source_locator import build_library, locate, synthesise
+
+    kwargs = dict(PLATE_KWARGS, n=n)
+    library = build_library(kwargs, duration)
+    measured = synthesise(kwargs, (60, 40), 2.0, 100, 400, duration, noise=0.02)["readings"]
+    model = synthesise(kwargs, (60, 40), 0.0, 100, 400, duration)["readings"]
+    return {"locator.fit_ms": 1000.0 / _best_rate(lambda: locate(library, measured - model), 1, repeat)}
+
+
+def bench_canvas(frames=10, repeat=3):
+    """Frame time of PlateCanvas.render (3D surface, thermistor curves and draw) on an offscreen Qt platform with Agg
+
+    Args:
+        frames (int, optional): Frames per measure. Defaults to 10.
+        repeat (int, optional): Measures, the fastest is kept. Defaults to 3.
+
+    Returns:
+        dict: Metrics
+    """
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+    from app.core.plate_transmission import Plate
+    from app.ui.plate_canvas import PlateCanvas
+
+    app = QApplication.instance() or QApplication([])
+    canvas = PlateCanvas()
+    canvas.resize(1000, 500)
+    plate = Plate(n=60, start_heat_time=0)
+    canvas.start_simulation(plate)
+    canvas.timer.stop()
+    for _ in range(40):
+        canvas.advance(int(canvas.step_sim_time / plate.dt))
+        canvas.record_sample()
+
+    def render():
+        for _ in range(frames):
+            canvas.render()
+
+    rate = _best_rate(render, frames, repeat)
+    canvas.close()
+    app.processEvents()
+    return {"canvas.frame_ms": 1000.0 / rate}
+
+
+def bench_monitor(n=5000, redraw_every=50, repeat=3):
+    """Monitor pipeline: parse, both live plots and the recorder, with a redraw every `redraw_every` lines (20 Hz at 1000 lines/s)
+
+    Args:
+        n (int, optional): Synthetic telemetry lines. Defaults to 5000.
+        redraw_every (int, optional): Lines between two redraws of the plots. Defaults to 50.
+        repeat (int, optional): Measures, the fastest is kept. Defaults to 3.
+
+    Returns:
+        dict: Metrics
+    """
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+    import Serial_monitor as monitor
+    from app.core.telemetry import parse_line, synthetic_lines
+
+    app = QApplication.instance() or QApplication([])
+    lines = synthetic_lines(n)
+    temp_plot = monitor.TempPlotWidget()
+    cmd_plot = monitor.CommandPlotWidget()
+    for plot in (temp_plot, cmd_plot):
+        plot.redraw_timer.stop()
+        plot.resize(800, 400)
+    recorder = monitor.ExcelRecorder(TEMPLATE)
+
+    with tempfile.TemporaryDirectory() as directory:
+        def pipeline():
+            recorder.create_copy_and_open(os.path.join(directory, "bench.xlsx"))
+            temp_plot.reset_plot()
+            cmd_plot.reset_plot()
+            for k, line in enumerate(lines):
+                record = parse_line(line)
+                temp_plot.update_record(record)
+                cmd_plot.update_record(record)
+                recorder.write_record(record)
+                if k % redraw_every == 0:
+                    temp_plot.redraw()
+                    cmd_plot.redraw()
+            recorder.writer.close()
+            recorder.writer = None
+
+        rate = _best_rate(pipeline, n, repeat)
+    temp_plot.close()
+    cmd_plot.close()
+    app.processEvents()
+    return {"monitor.lines_per_s": rate}
+
+
+def bench_recorder(n=20000, repeat=3):
+    """Recorder: rows streamed to the run file while recording, and rows converted to Excel at stop
+
+    Args:
+        n (int, optional): Rows. Defaults to 20000.
+        repeat (int, optional): Measures, the fastest is kept. Defaults to 3.
+
+    Returns:
+        dict: Metrics
+    """
+    from Serial_monitor import ExcelRecorder, run_to_excel
+    from app.core.telemetry import parse_line, synthetic_lines
+
+    records = [parse_line(line) for line in synthetic_lines(n)]
+    recorder = ExcelRecorder(TEMPLATE)
+    with tempfile.TemporaryDirectory() as directory:
+        xlsx = os.path.join(directory, "bench.xlsx")
+
+        def stream():
+            recorder.create_copy_and_open(xlsx)
+            for record in records:
+                recorder.write_record(record)
+            recorder.writer.close()
+            recorder.writer = None
+
+        stream_rate = _best_rate(stream, n, repeat)
+        excel_rate = _best_rate(lambda: run_to_excel(recorder.run_path, TEMPLATE, xlsx), n, 1, min_time=0)
+    return {"recorder.stream_rows_per_s": stream_rate, "recorder.excel_rows_per_s": excel_rate}
+
+
+def bench_parser(n=100000):
+    """Telemetry parser lines per second (app.core.telemetry.benchmark_parser)
+
+    Args:
+        n (int, optional): Lines. Defaults to 100000.
+
+    Returns:
+        dict: Metrics
+    """
+    from app.core.telemetry import benchmark_parser
+
+    result = benchmark_parser(n)
+    return {"parser.lines_per_s": result["single_pass_lines_per_s"]}
+
+
+def bench_startup(runs=3):
+    """Time to the first frame of the simulator and the monitor, in fresh interpreters (app.core.startup)
+
+    Args:
+        runs (int, optional): Starts per application, the fastest is kept. Defaults to 3.
+
+    Returns:
+        dict: Metrics
+    """
+    from app.core.startup import CHILDREN, measure
+
+    results = {}
+    for name in CHILDREN:
+        shown = min(measure(name)["marks"]["shown"] for _ in range(runs))
+        results[f"startup.{name}.shown_ms"] = shown
+    return results
+
+
+BENCHMARKS = {
+    "solver": bench_solver,
+    "layered": bench_layered,
+    "sensitivity": bench_sensitivity,
+    "locator": bench_locator,
+    "canvas": bench_canvas,
+    "monitor": bench_monitor,
+    "recorder": bench_recorder,
+    "parser": bench_parser,
+    "startup": bench_startup,
+}
+
+
+def run(names=None):
+    """Run benchmarks
+
+    Args:
+        names (list, optional): Benchmarks to run, keys of BENCHMARKS. Defaults to all of them.
+
+    Returns:
+        dict: Result with the machine description and the metrics
+    """
+    metrics = {}
+    for name in names or BENCHMARKS:
+        start = time.perf_counter()
+        metrics.update(BENCHMARKS[name]())
+        print(f"[INFO] {name} done in {time.perf_counter() - start:.1f} s")
+    return {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "machine": {
+            "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(),
+            "cpus": os.cpu_count(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+        },
+        "metrics": metrics,
+    }
+
+
+def higher_is_better(metric):
+    """Direction of a metric: rates (*_per_s) should go up, times (*_ms) down
+    """
+    return not metric.endswith("_ms")
+
+
+def compare(current, baseline, threshold=0.15):
+    """Compare results with a baseline
+
+    Args:
+        current (dict): Result of run
+        baseline (dict): Stored result
+        threshold (float, optional): Relative loss counted as a regression. Defaults to 0.15.
+
+    Returns:
+        list: (metric, baseline value, current value, relative change, regression) for the metrics of both
+    """
+    rows = []
+    for metric, base in baseline["metrics"].items():
+        if metric not in current["metrics"] or not base:
+            continue
+        value = current["metrics"][metric]
+        change = (value - base) / base
+        loss = -change if higher_is_better(metric) else change
+        rows.append((metric, base, value, change, loss > threshold))
+    return rows
+
+
+def print_comparison(rows):
+    """Print the comparison table
+
+    Args:
+        rows (list): Output of compare
+
+    Returns:
+        int: Number of regressions
+    """
+    width = max([len(row[0]) for row in rows] + [6])
+    print(f"{'metric':<{width}}  {'baseline':>14}  {'current':>14}  {'change':>8}")
+    for metric, base, value, change, regression in rows:
+        flag = "  REGRESSION" if regression else ""
+        print(f"{metric:<{width}}  {base:>14,.2f}  {value:>14,.2f}  {100 * change:>+7.1f}%{flag}")
+    regressions = sum(row[4] for row in rows)
+    print(f"{regressions} regression(s) out of {len(rows)} metrics")
+    return regressions
+
+
+def _load(path):
+    """Read a result file, a bare name is looked up in the baseline directory
+    """
+    if not os.path.exists(path) and not path.endswith(".json"):
+        path = os.path.join(BASELINE_DIR, path + ".json")
+    with open(path) as file:
+        return json.load(file)
+
+
+def _save(result, path):
+    """Write a result file, a bare name goes to the baseline directory
+    """
+    if os.path.dirname(path) == "" and not path.endswith(".json"):
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        path = os.path.join(BASELINE_DIR, path + ".json")
+    with open(path, "w") as file:
+        json.dump(result, file, indent=4)
+    print(f"[INFO] Results written to {path}")
+
+
+def main(argv):
+    """Command line: run, compare or check (run then compare)
+
+    Args:
+        argv (list): Command line arguments
+    """
+    parser = argparse.ArgumentParser(description="Benchmarks of the simulator and the serial monitor")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="Run the benchmarks")
+    run_parser.add_argument("--only", default=None, help=f"Comma separated subset of {','.join(BENCHMARKS)}")
+    run_parser.add_argument("--save", default=None, help="Result file, or baseline name stored in benchmarks/baselines")
+    compare_parser = commands.add_parser("compare", help="Compare a result file with a baseline")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.15)
+    check_parser = commands.add_parser("check", help="Run the benchmarks and compare them with a baseline")
+    check_parser.add_argument("baseline", nargs="?", default="reference")
+    check_parser.add_argument("--only", default=None)
+    check_parser.add_argument("--threshold", type=float, default=0.15)
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        regressions = print_comparison(compare(_load(args.current), _load(args.baseline), args.threshold))
+        sys.exit(1 if regressions else 0)
+
+    result = run(args.only.split(",") if args.only else None)
+    if args.command == "run":
+        for metric, value in result["metrics"].items():
+            print(f"{metric}: {value:,.2f}")
+        if args.save:
+            _save(result, args.save)
+    else:
+        regressions = print_comparison(compare(result, _load(args.baseline), args.threshold))
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,9 +1,13 @@
 import sys
+from app.core.startup import clock # first import, the start clock runs from here
 from app.core.app_controller import AppController
 
 def main():
+    clock.mark("imports")
     ac = AppController()
     ac.show_main_window()
+    clock.mark("shown")
+    print(f"[INFO] Started: {clock.status_text()}")
     sys.exit(ac.app.exec_())
 
 if __name__ == "__main__":